@@ -0,0 +1,99 @@
+import argparse
+import random
+import time
+from datetime import date
+import sys
+import os
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/../')
+
+from orgchart.as_of import TemporalIndex, as_ordinal, FOREVER
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def linear_stab(intervals, point):
+    """Baseline: scan every relationship for the date, as an unindexed query would."""
+    return [value for start, end, value in intervals if start <= point < end]
+
+
+def report(name, samples):
+    print(f"{name:<28} n={len(samples):<6} mean={sum(samples) / len(samples) * 1e6:9.1f}us "
+          f"p50={percentile(samples, 0.5) * 1e6:9.1f}us p99={percentile(samples, 0.99) * 1e6:9.1f}us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark as-of-date lookups against a linear scan.")
+    parser.add_argument("--snapshot", default="../data/2015-09-21", help="Gazette snapshot directory")
+    parser.add_argument("--amendments", nargs="*", default=["../data/2015-10-15_2"], help="Amendment directories to replay")
+    parser.add_argument("--neo4j", action="store_true", help="Build the index from the database instead of the CSVs")
+    parser.add_argument("--dates", type=int, default=1000, help="Number of random dates to query")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.neo4j:
+        from neo4j_util.neo4j_interface import Neo4jInterface
+        with Neo4jInterface() as neo4j_interface:
+            index = TemporalIndex.from_neo4j(neo4j_interface)
+        relationships = None
+    else:
+        from orgchart.org_engine import OrgGraph
+        from orgchart.update_orgchart import load_transactions
+        graph = OrgGraph().load_snapshot(args.snapshot)
+        for folder in args.amendments:
+            graph.replay(load_transactions(folder))
+        relationships = [rel for rel in graph.relationships() if rel[0] in ("HAS_MINISTER", "HAS_DEPARTMENT")]
+        index = TemporalIndex(relationships, {node_id: name for _, node_id, name in graph.nodes()})
+    print(f"Index built in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    # Query dates spread over the span of the data, plus a year on either side
+    first, last = index.span or (date.today().toordinal(), date.today().toordinal())
+    low, high = first - 365, last + 365
+    rng = random.Random(args.seed)
+    days = [date.fromordinal(rng.randint(low, high)) for _ in range(args.dates)]
+
+    samples = []
+    for day in days:
+        start = time.perf_counter()
+        index.as_of(day)
+        samples.append(time.perf_counter() - start)
+    report("as_of (full tree)", samples)
+
+    minister_ids = index.holders("HAS_DEPARTMENT")
+    if minister_ids:
+        samples = []
+        for day in days:
+            minister_id = rng.choice(minister_ids)
+            start = time.perf_counter()
+            index.departments_of(minister_id, day)
+            samples.append(time.perf_counter() - start)
+        report("departments_of (entity)", samples)
+
+    if relationships is not None:
+        # Same lookup without the index, over relationships already converted to ordinals
+        intervals = [
+            (as_ordinal(start_date), as_ordinal(end_date) if end_date is not None else FOREVER, (source, target))
+            for _, source, target, start_date, end_date in relationships
+        ]
+        samples = []
+        for day in days:
+            start = time.perf_counter()
+            index.trees["HAS_DEPARTMENT"].stab(day.toordinal())
+            index.trees["HAS_MINISTER"].stab(day.toordinal())
+            samples.append(time.perf_counter() - start)
+        report("interval index (stab)", samples)
+
+        samples = []
+        for day in days:
+            start = time.perf_counter()
+            linear_stab(intervals, day.toordinal())
+            samples.append(time.perf_counter() - start)
+        report("linear scan (baseline)", samples)
+
+if __name__ == "__main__":
+    main()
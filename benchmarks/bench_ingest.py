@@ -0,0 +1,345 @@
+import argparse
+import csv
+import json
+import resource
+import subprocess
+import tempfile
+import time
+import sys
+import os
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/../')
+
+from benchmarks.bench_as_of import percentile
+from benchmarks.generate_gazette import generate_gazettes
+from neo4j_util.metrics import configure_logging
+from orgchart.backfill import discover_gazettes, stream_transactions
+from orgchart.org_engine import OrgGraph, to_ordinal
+
+NODE_STAGES = [("government", "government.csv"), ("minister", "minister.csv"), ("department", "department.csv")]
+RELATIONSHIP_STAGES = [
+    ("HAS_MINISTER", "gov-min.csv", "gov_id", "min_id"),
+    ("HAS_DEPARTMENT", "min-dep.csv", "min_id", "dep_id"),
+]
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KB on Linux and in bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _read_csv(path):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        yield from csv.DictReader(f)
+
+
+def transaction_kind(transaction):
+    """Name of the amendment type, e.g. "Merge minister" or "Add department"."""
+    return f"{transaction['file_type']} {transaction.get('type') or transaction.get('child_type')}"
+
+
+class Stage:
+    """Timings of one loader stage or amendment type."""
+
+    def __init__(self, name):
+        self.name = name
+        self.rows = 0
+        self.seconds = 0.0
+        self.round_trips = 0
+        self.samples = []  # seconds per operation (one row, or one batch of rows)
+
+    def record(self, rows, seconds, round_trips=0):
+        self.rows += rows
+        self.seconds += seconds
+        self.round_trips += round_trips
+        self.samples.append(seconds)
+
+    def result(self):
+        return {
+            "stage": self.name,
+            "rows": self.rows,
+            "seconds": self.seconds,
+            "rows_per_sec": self.rows / self.seconds if self.seconds > 0 else None,
+            "round_trips": self.round_trips,
+            "p50_ms": percentile(self.samples, 0.5) * 1000 if self.samples else None,
+            "p99_ms": percentile(self.samples, 0.99) * 1000 if self.samples else None,
+            "peak_rss_mb": peak_rss_mb(),
+        }
+
+
+# Stand-in backend: the in-memory engine, which applies the same semantics without a server
+
+class EngineBackend:
+    name = "engine"
+
+    def __init__(self, args):
+        self.graph = OrgGraph()
+
+    def load_nodes(self, stage, label, rows):
+        for row in rows:
+            start = time.perf_counter()
+            self.graph.add_node(label, row["id"], row["name"])
+            stage.record(1, time.perf_counter() - start)
+
+    def load_relationships(self, stage, rel_type, start_column, end_column, rows):
+        for row in rows:
+            start = time.perf_counter()
+            source = self.graph.by_id.get(row[start_column])
+            target = self.graph.by_id.get(row[end_column])
+            if source is not None and target is not None:
+                self.graph.add_relationship(rel_type, source, target, to_ordinal(row["start_date"]), to_ordinal(row["end_date"]))
+            stage.record(1, time.perf_counter() - start)
+
+    def apply_gazette(self, stages, transactions):
+        entity_counters = {"minister": 0, "department": 0}
+        for transaction in transactions:
+            stage = stages(transaction_kind(transaction))
+            start = time.perf_counter()
+            self.graph.apply(transaction, entity_counters)
+            stage.record(1, time.perf_counter() - start)
+
+    def close(self):
+        pass
+
+
+# Neo4j backend: the real loaders and handlers, with every statement counted
+
+class _CountingTransaction:
+    def __init__(self, tx, counter):
+        self._tx = tx
+        self._counter = counter
+
+    def run(self, query, parameters=None, **kwargs):
+        self._counter.count += 1
+        return self._tx.run(query, parameters, **kwargs)
+
+    def commit(self):
+        self._counter.count += 1
+        return self._tx.commit()
+
+    def __getattr__(self, name):
+        return getattr(self._tx, name)
+
+
+class _CountingSession:
+    def __init__(self, session, counter):
+        self._session = session
+        self._counter = counter
+
+    def run(self, query, parameters=None, **kwargs):
+        self._counter.count += 1
+        return self._session.run(query, parameters, **kwargs)
+
+    def begin_transaction(self, *args, **kwargs):
+        self._counter.count += 1
+        return _CountingTransaction(self._session.begin_transaction(*args, **kwargs), self._counter)
+
+    def _counted(self, work):
+        def counted_work(tx, *args, **kwargs):
+            return work(_CountingTransaction(tx, self._counter), *args, **kwargs)
+        return counted_work
+
+    def execute_read(self, work, *args, **kwargs):
+        return self._session.execute_read(self._counted(work), *args, **kwargs)
+
+    def execute_write(self, work, *args, **kwargs):
+        return self._session.execute_write(self._counted(work), *args, **kwargs)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._session.close()
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+
+class Neo4jBackend:
+    name = "neo4j"
+
+    def __init__(self, args):
+        from neo4j_util.neo4j_interface import Neo4jInterface
+        from orgchart.ingestion import iso_date, parameter_batches
+        from orgchart.schema import apply_schema
+        from orgchart.setup_db import NODE_BATCH_QUERY, GOV_MIN_BATCH_QUERY, MIN_DEP_BATCH_QUERY
+        from orgchart.update_orgchart import apply_transaction
+        from orgchart.entity_registry import EntityRegistry
+
+        class CountingInterface(Neo4jInterface):
+            """Counts the statements, transaction begins and commits sent to the server."""
+            count = 0
+
+            def new_session(self):
+                return _CountingSession(super().new_session(), self)
+
+        self.driver = CountingInterface()
+        self.parameter_batches = parameter_batches
+        self.batch_size = args.batch_size
+        self.node_query = NODE_BATCH_QUERY
+        self.relationship_queries = {"HAS_MINISTER": GOV_MIN_BATCH_QUERY, "HAS_DEPARTMENT": MIN_DEP_BATCH_QUERY}
+        self.iso_date = iso_date
+        self.apply_transaction = apply_transaction
+        self.registry_class = EntityRegistry
+
+        if args.wipe:
+            self.driver.execute_query("MATCH (n) CALL { WITH n DETACH DELETE n } IN TRANSACTIONS OF 10000 ROWS")
+        apply_schema(self.driver)
+
+    def _send(self, stage, query, rows):
+        for batch in self.parameter_batches(rows, self.batch_size):
+            before = self.driver.count
+            start = time.perf_counter()
+            self.driver.execute_many(query, batch, self.batch_size)
+            stage.record(len(batch), time.perf_counter() - start, self.driver.count - before)
+
+    def load_nodes(self, stage, label, rows):
+        rows = ({"id": row["id"], "name": row["name"]} for row in rows)
+        self._send(stage, self.node_query.format(label=label), rows)
+
+    def load_relationships(self, stage, rel_type, start_column, end_column, rows):
+        rows = (
+            {start_column: row[start_column], end_column: row[end_column],
+             "start_date": self.iso_date(row["start_date"]), "end_date": self.iso_date(row["end_date"])}
+            for row in rows
+        )
+        self._send(stage, self.relationship_queries[rel_type], rows)
+
+    def apply_gazette(self, stages, transactions):
+        # One transaction per gazette, as execute_transactions does
+        transactions = list(transactions)
+        before = self.driver.count
+        start = time.perf_counter()
+        registry = self.registry_class(self.driver).load()
+        stages("entity registry").record(0, time.perf_counter() - start, self.driver.count - before)
+        entity_counters = registry.counters(transactions[0]["transaction_id"]) if transactions else {}
+
+        with self.driver.transaction() as tx:
+            for transaction in transactions:
+                before = self.driver.count
+                start = time.perf_counter()
+                self.apply_transaction(tx, transaction, entity_counters, registry)
+                stages(transaction_kind(transaction)).record(1, time.perf_counter() - start, self.driver.count - before)
+            # The commit happens when the block exits
+            before = self.driver.count
+            start = time.perf_counter()
+        stages("commit").record(0, time.perf_counter() - start, self.driver.count - before)
+
+    def close(self):
+        self.driver.close()
+
+
+BACKENDS = {"engine": EngineBackend, "neo4j": Neo4jBackend}
+
+
+def run_benchmark(backend, gazettes):
+    """Load the snapshot and apply every amendment gazette, returning one Stage per loader stage and amendment type."""
+    stages = {}
+
+    def stage_for(name):
+        if name not in stages:
+            stages[name] = Stage(name)
+        return stages[name]
+
+    snapshot = next(gazette for gazette in gazettes if gazette.kind == "snapshot")
+    for label, file_name in NODE_STAGES:
+        rows = _read_csv(os.path.join(snapshot.path, file_name))
+        backend.load_nodes(stage_for(f"load {label} nodes"), label, rows)
+    for rel_type, file_name, start_column, end_column in RELATIONSHIP_STAGES:
+        rows = _read_csv(os.path.join(snapshot.path, file_name))
+        backend.load_relationships(stage_for(f"load {rel_type}"), rel_type, start_column, end_column, rows)
+
+    for gazette in gazettes:
+        if gazette.kind == "amendment":
+            backend.apply_gazette(stage_for, stream_transactions(gazette.path))
+    return list(stages.values())
+
+
+def print_results(results):
+    print(f"{'stage':<28} {'rows':>9} {'rows/sec':>11} {'round trips':>12} {'p50 ms':>9} {'p99 ms':>9} {'peak RSS MB':>12}")
+    for result in results:
+        rate = f"{result['rows_per_sec']:.0f}" if result["rows_per_sec"] else "-"
+        p50 = f"{result['p50_ms']:.3f}" if result["p50_ms"] is not None else "-"
+        p99 = f"{result['p99_ms']:.3f}" if result["p99_ms"] is not None else "-"
+        print(f"{result['stage']:<28} {result['rows']:>9} {rate:>11} {result['round_trips']:>12} "
+              f"{p50:>9} {p99:>9} {result['peak_rss_mb']:>12.1f}")
+
+
+def compare_results(baseline, results):
+    """Print the change in throughput and p99 latency of every stage against a saved run."""
+    print(f"Compared with {baseline.get('commit') or 'baseline'} ({baseline['backend']}):")
+    previous = {result["stage"]: result for result in baseline["stages"]}
+    for result in results:
+        old = previous.get(result["stage"])
+        if old is None or not old["rows_per_sec"] or not result["rows_per_sec"]:
+            continue
+        speedup = result["rows_per_sec"] / old["rows_per_sec"]
+        p99_change = result["p99_ms"] - old["p99_ms"]
+        print(f"{result['stage']:<28} {speedup:6.2f}x rows/sec  p99 {p99_change:+.3f}ms  "
+              f"round trips {old['round_trips']} -> {result['round_trips']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark snapshot loading and amendment throughput.")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="engine",
+                        help="engine: in-memory stand-in; neo4j: the database configured by NEO4J_URI")
+    parser.add_argument("--data", help="Existing directory of gazettes to use instead of generating one")
+    parser.add_argument("--ministers", type=int, default=1000)
+    parser.add_argument("--departments", type=int, default=50000)
+    parser.add_argument("--amendments", type=int, default=5000, help="Transactions per amendment gazette")
+    parser.add_argument("--gazettes", type=int, default=1, help="Number of amendment gazettes to generate")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--batch-size", type=int, default=1000, help="Rows per UNWIND batch for the neo4j loader stages")
+    parser.add_argument("--wipe", action="store_true", help="Delete everything in the neo4j database first")
+    parser.add_argument("--verbose", action="store_true", help="Log every statement the handlers run")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON results of an earlier run (e.g. another commit) to compare against")
+    args = parser.parse_args()
+    configure_logging("DEBUG" if args.verbose else "WARNING")
+
+    with tempfile.TemporaryDirectory() as generated:
+        data_dir = args.data
+        if data_dir is None:
+            start = time.perf_counter()
+            generate_gazettes(generated, args.ministers, args.departments, args.amendments, args.gazettes, args.seed)
+            print(f"Generated {args.ministers} ministers, {args.departments} departments and "
+                  f"{args.gazettes} x {args.amendments} amendments in {time.perf_counter() - start:.1f}s")
+            data_dir = generated
+        gazettes = discover_gazettes(data_dir)
+
+        backend = BACKENDS[args.backend](args)
+        try:
+            results = [stage.result() for stage in run_benchmark(backend, gazettes)]
+        finally:
+            backend.close()
+
+    print_results(results)
+    report = {
+        "commit": git_commit(),
+        "backend": args.backend,
+        "sizes": {"ministers": args.ministers, "departments": args.departments, "amendments": args.amendments,
+                  "gazettes": args.gazettes, "seed": args.seed, "data": args.data},
+        "stages": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare_results(json.load(f), results)
+
+
+if __name__ == "__main__":
+    main()
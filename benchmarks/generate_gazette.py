@@ -0,0 +1,303 @@
+import argparse
+import csv
+import json
+import random
+from datetime import date, timedelta
+import sys
+import os
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/../')
+
+from orgchart.ingestion import AMENDMENT_COLUMNS
+from orgchart.snapshot_diff import load_active_structure
+
+GOVERNMENT_NAME = "Government of Sri Lanka"
+
+# Relative frequency of each amendment kind, roughly following the real gazettes
+DEFAULT_MIX = {
+    "add_minister": 5,
+    "add_department": 25,
+    "move_department": 30,
+    "terminate_department": 15,
+    "terminate_minister": 3,
+    "rename_minister": 10,
+    "merge_ministers": 4,
+    "merge_departments": 8,
+}
+
+# Words the synthetic names are built from; some include commas and ampersands, like the real ones
+SUBJECTS = ["Defence", "Finance", "Health", "Education", "Transport", "Ports, Shipping & Aviation",
+            "Lands", "Agriculture", "Fisheries", "Highways", "Irrigation", "Sports", "Tourism",
+            "Industry & Commerce", "Justice", "Labour", "Power & Energy", "Housing", "Mass Media"]
+BODIES = ["Department", "Authority", "Board", "Corporation", "Institute", "Commission", "Bureau", "Council"]
+
+
+class _Pool:
+    """A set with O(1) add, remove and random choice."""
+
+    def __init__(self, items=()):
+        self.items = []
+        self.positions = {}
+        for item in items:
+            self.add(item)
+
+    def add(self, item):
+        self.positions[item] = len(self.items)
+        self.items.append(item)
+
+    def remove(self, item):
+        position = self.positions.pop(item)
+        last = self.items.pop()
+        if position < len(self.items):
+            self.items[position] = last
+            self.positions[last] = position
+
+    def choice(self, rng):
+        return self.items[rng.randrange(len(self.items))]
+
+    def __contains__(self, item):
+        return item in self.positions
+
+    def __len__(self):
+        return len(self.items)
+
+
+def minister_name(rng, number):
+    return f"Minister of {rng.choice(SUBJECTS)} {number}"
+
+
+def department_name(rng, number):
+    return f"{rng.choice(SUBJECTS)} {rng.choice(BODIES)} {number}"
+
+
+def _write_csv(path, columns, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        writer.writerows(rows)
+
+
+def generate_snapshot(output_dir, ministers, departments, prefix="9001/01", day=date(2015, 9, 21),
+                      history=0.1, seed=0):
+    """Write a full gazette snapshot with the given number of ministers and departments.
+
+    Every department is attached to one active minister. A `history` fraction of
+    departments also gets an ended relationship to another minister, and as many
+    ministers get an ended government relationship, so date filters have work to do.
+    """
+    rng = random.Random(seed)
+    os.makedirs(output_dir, exist_ok=True)
+    government_id = f"{prefix}_gov_1"
+    minister_ids = [f"{prefix}_min_{number}" for number in range(1, ministers + 1)]
+    ended_on = str(day - timedelta(days=1))
+    started_on = str(day - timedelta(days=365))
+
+    _write_csv(os.path.join(output_dir, "government.csv"), ["id", "name"], [(government_id, GOVERNMENT_NAME)])
+    _write_csv(os.path.join(output_dir, "minister.csv"), ["id", "name"],
+               ((minister_id, minister_name(rng, number)) for number, minister_id in enumerate(minister_ids, start=1)))
+    _write_csv(os.path.join(output_dir, "department.csv"), ["id", "name"],
+               ((f"{prefix}_dep_{number}", department_name(rng, number)) for number in range(1, departments + 1)))
+
+    gov_min = [(government_id, minister_id, str(day), "-1", "TRUE") for minister_id in minister_ids]
+    for minister_id in rng.sample(minister_ids, int(history * ministers)):
+        gov_min.append((government_id, minister_id, started_on, ended_on, "FALSE"))
+    _write_csv(os.path.join(output_dir, "gov-min.csv"), ["gov_id", "min_id", "start_date", "end_date", "active"], gov_min)
+
+    def min_dep_rows():
+        for number in range(1, departments + 1):
+            department_id = f"{prefix}_dep_{number}"
+            yield rng.choice(minister_ids), department_id, str(day), "-1", "TRUE"
+            if rng.random() < history:
+                yield rng.choice(minister_ids), department_id, started_on, ended_on, "FALSE"
+    _write_csv(os.path.join(output_dir, "min-dep.csv"), ["min_id", "dep_id", "start_date", "end_date", "active"],
+               min_dep_rows())
+
+
+class AmendmentGenerator:
+    """Generates amendment transactions that are valid against the evolving org chart.
+
+    Starts from the active structure of a snapshot and applies each generated
+    transaction to its own copy of that structure, so every Rename/Move/Terminate/Merge
+    refers to entities and relationships that are active at that point.
+    """
+
+    def __init__(self, snapshot_dir, seed=0, mix=None):
+        self.rng = random.Random(seed)
+        self.mix = mix or DEFAULT_MIX
+        ministers, departments = load_active_structure(snapshot_dir)
+        self.ministers = _Pool(minister for _, minister in sorted(ministers))
+        self.departments = _Pool()
+        self.department_minister = {}
+        self.minister_departments = {}
+        for minister, department in sorted(departments):
+            if department in self.department_minister:
+                continue  # departments shared by two ministers are left alone
+            self.departments.add(department)
+            self.department_minister[department] = minister
+            self.minister_departments.setdefault(minister, set()).add(department)
+        self.names = {name for pair in ministers | departments for name in pair}
+        self.serial = 0
+
+    def _new_name(self, make):
+        while True:
+            self.serial += 1
+            name = make(self.rng, f"S{self.serial}")
+            if name not in self.names:
+                self.names.add(name)
+                return name
+
+    def _attach(self, minister, department):
+        self.department_minister[department] = minister
+        self.minister_departments.setdefault(minister, set()).add(department)
+
+    def _detach(self, department):
+        minister = self.department_minister.pop(department)
+        self.minister_departments[minister].discard(department)
+        return minister
+
+    def _hand_over(self, old, new):
+        # Handlers move every active department of `old` under `new`
+        for department in self.minister_departments.pop(old, set()):
+            self._attach(new, department)
+        self.ministers.remove(old)
+
+    def add_minister(self):
+        minister = self._new_name(minister_name)
+        self.ministers.add(minister)
+        return {"file_type": "Add", "parent": GOVERNMENT_NAME, "parent_type": "government", "child": minister,
+                "child_type": "minister", "rel_type": "HAS_MINISTER"}
+
+    def add_department(self):
+        minister = self.ministers.choice(self.rng)
+        department = self._new_name(department_name)
+        self.departments.add(department)
+        self._attach(minister, department)
+        return {"file_type": "Add", "parent": minister, "parent_type": "minister", "child": department,
+                "child_type": "department", "rel_type": "HAS_DEPARTMENT"}
+
+    def move_department(self):
+        if not len(self.departments) or len(self.ministers) < 2:
+            return None
+        department = self.departments.choice(self.rng)
+        new_parent = self.ministers.choice(self.rng)
+        if new_parent == self.department_minister[department]:
+            return None
+        old_parent = self._detach(department)
+        self._attach(new_parent, department)
+        return {"file_type": "Move", "old_parent": old_parent, "new_parent": new_parent, "child": department,
+                "type": "department"}
+
+    def terminate_department(self):
+        if not len(self.departments):
+            return None
+        department = self.departments.choice(self.rng)
+        self.departments.remove(department)
+        minister = self._detach(department)
+        return {"file_type": "Terminate", "parent": minister, "parent_type": "minister", "child": department,
+                "child_type": "department", "rel_type": "HAS_DEPARTMENT"}
+
+    def terminate_minister(self):
+        # Only ministers without departments, as gazettes detach departments first
+        minister = self.ministers.choice(self.rng)
+        if self.minister_departments.get(minister) or len(self.ministers) < 2:
+            return None
+        self.ministers.remove(minister)
+        return {"file_type": "Terminate", "parent": GOVERNMENT_NAME, "parent_type": "government", "child": minister,
+                "child_type": "minister", "rel_type": "HAS_MINISTER"}
+
+    def rename_minister(self):
+        old = self.ministers.choice(self.rng)
+        new = self._new_name(minister_name)
+        self.ministers.add(new)
+        self._hand_over(old, new)
+        return {"file_type": "Rename", "old": old, "new": new, "type": "minister"}
+
+    def merge_ministers(self):
+        if len(self.ministers) < 3:
+            return None
+        old = [self.ministers.choice(self.rng), self.ministers.choice(self.rng)]
+        if old[0] == old[1]:
+            return None
+        new = self._new_name(minister_name)
+        self.ministers.add(new)
+        for minister in old:
+            self._hand_over(minister, new)
+        return {"file_type": "Merge", "old": json.dumps(old, separators=(",", ":"), ensure_ascii=False),
+                "new": new, "type": "minister"}
+
+    def merge_departments(self):
+        if len(self.departments) < 2:
+            return None
+        old = [self.departments.choice(self.rng), self.departments.choice(self.rng)]
+        if old[0] == old[1]:
+            return None
+        # The merged department goes to the minister of the first one
+        minister = self.department_minister[old[0]]
+        for department in old:
+            self.departments.remove(department)
+            self._detach(department)
+        new = self._new_name(department_name)
+        self.departments.add(new)
+        self._attach(minister, new)
+        return {"file_type": "Merge", "old": json.dumps(old, separators=(",", ":"), ensure_ascii=False),
+                "new": new, "type": "department"}
+
+    def generate(self, count, prefix="9002/01", day=date(2015, 10, 15)):
+        """Return count transactions in the load_transactions format, in transaction_id order."""
+        kinds = list(self.mix)
+        weights = [self.mix[kind] for kind in kinds]
+        width = max(2, len(str(count)))
+        transactions = []
+        while len(transactions) < count:
+            transaction = getattr(self, self.rng.choices(kinds, weights)[0])()
+            if transaction is None:
+                continue  # not applicable to the current structure; draw again
+            transaction["transaction_id"] = f"{prefix}_tr_{len(transactions) + 1:0{width}d}"
+            transaction["date"] = str(day)
+            transactions.append(transaction)
+        return transactions
+
+
+def write_amendments(transactions, output_dir):
+    """Write transactions as RENAME/MOVE/ADD/TERMINATE/MERGE.csv."""
+    os.makedirs(output_dir, exist_ok=True)
+    for file_type, (file_name, columns) in AMENDMENT_COLUMNS.items():
+        _write_csv(os.path.join(output_dir, file_name), columns,
+                   ([transaction[column] for column in columns]
+                    for transaction in transactions if transaction["file_type"] == file_type))
+
+
+def generate_gazettes(output_dir, ministers, departments, amendments, gazettes=1, seed=0, history=0.1,
+                      day=date(2015, 9, 21)):
+    """Write a snapshot and `gazettes` amendment gazettes under output_dir, named the way backfill.py expects.
+
+    Returns the list of directories written, in the order they apply.
+    """
+    snapshot_dir = os.path.join(output_dir, str(day))
+    generate_snapshot(snapshot_dir, ministers, departments, prefix="9001/01", day=day, history=history, seed=seed)
+    directories = [snapshot_dir]
+    generator = AmendmentGenerator(snapshot_dir, seed=seed)
+    for number in range(1, gazettes + 1):
+        amendment_day = day + timedelta(days=number)
+        amendment_dir = os.path.join(output_dir, f"{amendment_day}_1")
+        transactions = generator.generate(amendments, prefix=f"{9001 + number}/01", day=amendment_day)
+        write_amendments(transactions, amendment_dir)
+        directories.append(amendment_dir)
+    return directories
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic gazette snapshot and amendment gazettes.")
+    parser.add_argument("output_dir", help="Directory to write the gazette directories to")
+    parser.add_argument("--ministers", type=int, default=10000)
+    parser.add_argument("--departments", type=int, default=1000000)
+    parser.add_argument("--amendments", type=int, default=100000, help="Transactions per amendment gazette")
+    parser.add_argument("--gazettes", type=int, default=1, help="Number of amendment gazettes")
+    parser.add_argument("--history", type=float, default=0.1, help="Fraction of entities with an ended relationship")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for directory in generate_gazettes(args.output_dir, args.ministers, args.departments, args.amendments,
+                                       args.gazettes, args.seed, args.history):
+        print(f"Wrote {directory}")
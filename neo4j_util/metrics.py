@@ -0,0 +1,314 @@
+import bisect
+import hashlib
+import heapq
+import itertools
+import json
+import logging
+import re
+import threading
+import time
+from neo4j.exceptions import Neo4jError
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the latency histogram buckets
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Update counters reported by the server for every statement
+COUNTER_FIELDS = ("nodes_created", "nodes_deleted", "relationships_created", "relationships_deleted", "properties_set")
+
+# Statements that cannot run inside an explicit transaction: batched CALL { } IN TRANSACTIONS,
+# schema changes and index waits. capture_profiles skips them.
+UNPROFILABLE = re.compile(
+    r"\bIN\s+TRANSACTIONS\b|^\s*(CREATE|DROP)\s+(CONSTRAINT|(RANGE\s+|TEXT\s+|POINT\s+|LOOKUP\s+|FULLTEXT\s+)?INDEX)\b"
+    r"|\bdb\.awaitIndex(es)?\b",
+    re.IGNORECASE)
+
+
+def normalize_query(query):
+    """Collapse whitespace so the same statement always gets the same id."""
+    return " ".join(query.split())
+
+
+def query_id(query):
+    """Short stable id of a statement, used as its label in exports."""
+    return hashlib.sha1(normalize_query(query).encode("utf-8")).hexdigest()[:10]
+
+
+class Histogram:
+    """Bucketed latency histogram with a running count, sum and max."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last bucket is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, fraction):
+        """Upper bound of the bucket holding the given quantile (the max for the +Inf bucket)."""
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        seen = 0
+        for position, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return self.buckets[position] if position < len(self.buckets) else self.max
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+            "buckets": dict(zip([str(bound) for bound in self.buckets] + ["+Inf"], self.counts)),
+        }
+
+
+class QueryStats:
+    def __init__(self, query):
+        self.query = normalize_query(query)
+        self.wall = Histogram()
+        self.server = Histogram()
+        self.rows = dict.fromkeys(COUNTER_FIELDS, 0)
+
+
+class Metrics:
+    """Per-statement and per-transaction-type timings, update counts and retries.
+
+    Statements are recorded when their result is consumed, with the wall time
+    since they were sent and the time the server reports (available + consumed).
+    With profile_slowest=N the N slowest statements are kept so their PROFILE
+    plans can be captured with capture_profiles().
+    """
+
+    def __init__(self, profile_slowest=0):
+        self.queries = {}       # query id -> QueryStats
+        self.transactions = {}  # transaction type -> Histogram
+        self.retries = {}       # unit of work -> retries
+        self.profile_slowest = profile_slowest
+        self.slowest = []       # min-heap of (seconds, sequence, query, parameters)
+        self.profiles = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    def record_query(self, query, parameters, seconds, summary=None):
+        key = query_id(query)
+        with self._lock:
+            stats = self.queries.get(key)
+            if stats is None:
+                stats = self.queries[key] = QueryStats(query)
+            stats.wall.observe(seconds)
+            if summary is not None:
+                server_ms = (summary.result_available_after or 0) + (summary.result_consumed_after or 0)
+                stats.server.observe(server_ms / 1000)
+                counters = summary.counters
+                for field in COUNTER_FIELDS:
+                    stats.rows[field] += getattr(counters, field)
+            if self.profile_slowest:
+                entry = (seconds, next(self._sequence), query, parameters)
+                if len(self.slowest) < self.profile_slowest:
+                    heapq.heappush(self.slowest, entry)
+                elif seconds > self.slowest[0][0]:
+                    heapq.heapreplace(self.slowest, entry)
+
+    def record_retries(self, operation, retries):
+        with self._lock:
+            self.retries[operation] = self.retries.get(operation, 0) + retries
+
+    def record_transaction(self, transaction_type, seconds):
+        with self._lock:
+            histogram = self.transactions.get(transaction_type)
+            if histogram is None:
+                histogram = self.transactions[transaction_type] = Histogram()
+            histogram.observe(seconds)
+
+    def capture_profiles(self, driver):
+        """Re-run the slowest statements with PROFILE and keep their plans.
+
+        Each statement runs in its own transaction that is rolled back, so writes
+        are not applied twice. The plan reflects the data at capture time. Statements
+        that only run in auto-commit transactions (see UNPROFILABLE) are skipped, and a
+        statement that fails to profile is logged and skipped.
+        """
+        self.profiles = []
+        for seconds, _, query, parameters in sorted(self.slowest, reverse=True):
+            if UNPROFILABLE.search(query):
+                logger.info("Not profiling %s: it cannot run in an explicit transaction", query_id(query))
+                continue
+            try:
+                with driver.new_session() as session:
+                    tx = session.begin_transaction()
+                    try:
+                        summary = tx.run("PROFILE " + query, parameters).consume()
+                    finally:
+                        tx.rollback()
+            except Neo4jError as e:
+                logger.warning("Could not profile %s: %s", query_id(query), e)
+                continue
+            self.profiles.append({
+                "query_id": query_id(query),
+                "query": normalize_query(query),
+                "seconds": seconds,
+                "parameters": parameters,
+                "plan": summary.profile,
+            })
+        return self.profiles
+
+    def to_json(self):
+        with self._lock:
+            return {
+                "queries": {
+                    key: {"query": stats.query, "wall_seconds": stats.wall.to_dict(),
+                          "server_seconds": stats.server.to_dict(), "rows": dict(stats.rows)}
+                    for key, stats in self.queries.items()
+                },
+                "transactions": {name: histogram.to_dict() for name, histogram in self.transactions.items()},
+                "retries": dict(self.retries),
+                "profiles": list(self.profiles),
+            }
+
+    def to_prometheus(self, prefix="orgchart"):
+        """Render the metrics in the Prometheus text exposition format."""
+        lines = []
+
+        def histogram(name, help_text, label, histograms):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} histogram")
+            for value, item in histograms:
+                cumulative = 0
+                for bound, count in zip([str(bound) for bound in item.buckets] + ["+Inf"], item.counts):
+                    cumulative += count
+                    lines.append(f'{prefix}_{name}_bucket{{{label}="{_escape(value)}",le="{bound}"}} {cumulative}')
+                lines.append(f'{prefix}_{name}_sum{{{label}="{_escape(value)}"}} {item.sum}')
+                lines.append(f'{prefix}_{name}_count{{{label}="{_escape(value)}"}} {item.count}')
+
+        with self._lock:
+            lines.append(f"# HELP {prefix}_query_info Statement text of each query id")
+            lines.append(f"# TYPE {prefix}_query_info gauge")
+            for key, stats in self.queries.items():
+                lines.append(f'{prefix}_query_info{{query="{key}",text="{_escape(stats.query)}"}} 1')
+            histogram("query_seconds", "Wall time per statement, from send to consumed result", "query",
+                      [(key, stats.wall) for key, stats in self.queries.items()])
+            histogram("query_server_seconds", "Server-reported time per statement", "query",
+                      [(key, stats.server) for key, stats in self.queries.items()])
+            lines.append(f"# HELP {prefix}_query_rows_total Entities and properties changed by each statement")
+            lines.append(f"# TYPE {prefix}_query_rows_total counter")
+            for key, stats in self.queries.items():
+                for field, count in stats.rows.items():
+                    lines.append(f'{prefix}_query_rows_total{{query="{key}",kind="{field}"}} {count}')
+            histogram("transaction_seconds", "Wall time per amendment transaction type", "type",
+                      list(self.transactions.items()))
+            lines.append(f"# HELP {prefix}_retries_total Retries of managed transactions after transient errors")
+            lines.append(f"# TYPE {prefix}_retries_total counter")
+            for operation, retries in self.retries.items():
+                lines.append(f'{prefix}_retries_total{{operation="{_escape(operation)}"}} {retries}')
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Write the metrics to path: Prometheus text for .prom/.txt files, JSON otherwise."""
+        with open(path, "w", encoding="utf-8") as f:
+            if path.endswith((".prom", ".txt")):
+                f.write(self.to_prometheus())
+            else:
+                json.dump(self.to_json(), f, indent=2, default=str)
+
+    def summary_lines(self, limit=10):
+        """One line per statement, slowest total wall time first."""
+        with self._lock:
+            ranked = sorted(self.queries.items(), key=lambda item: item[1].wall.sum, reverse=True)[:limit]
+            return [
+                f"{key} n={stats.wall.count} total={stats.wall.sum:.3f}s p50<={stats.wall.quantile(0.5)}s "
+                f"p99<={stats.wall.quantile(0.99)}s {stats.query[:80]}"
+                for key, stats in ranked
+            ]
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class InstrumentedResult:
+    """Wraps a driver Result and records the statement in Metrics once it is consumed."""
+
+    def __init__(self, result, metrics, query, parameters, start):
+        self._result = result
+        self._metrics = metrics
+        self._query = query
+        self._parameters = parameters
+        self._start = start
+        self._summary = None
+
+    def consume(self):
+        if self._summary is None:
+            self._summary = self._result.consume()
+            self._metrics.record_query(self._query, self._parameters, time.perf_counter() - self._start, self._summary)
+        return self._summary
+
+    def __iter__(self):
+        yield from self._result
+        self.consume()
+
+    def single(self, *args, **kwargs):
+        record = self._result.single(*args, **kwargs)
+        self.consume()
+        return record
+
+    def data(self, *args, **kwargs):
+        data = self._result.data(*args, **kwargs)
+        self.consume()
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self._result, name)
+
+
+class InstrumentedTransaction:
+    """Wraps a driver transaction so that every tx.run is recorded in Metrics."""
+
+    def __init__(self, tx, metrics):
+        self._tx = tx
+        self.metrics = metrics
+
+    def run(self, query, parameters=None, **kwargs):
+        start = time.perf_counter()
+        result = self._tx.run(query, parameters, **kwargs)
+        return InstrumentedResult(result, self.metrics, query, dict(parameters or {}, **kwargs), start)
+
+    def __getattr__(self, name):
+        return getattr(self._tx, name)
+
+
+# Command line helpers shared by the scripts
+
+def add_instrumentation_arguments(parser):
+    parser.add_argument("--log-level", default="INFO", help="DEBUG shows every statement's update counts")
+    parser.add_argument("--metrics", help="Write query and transaction metrics to this file (.prom/.txt for Prometheus, else JSON)")
+    parser.add_argument("--profile-slowest", type=int, default=0, metavar="N",
+                        help="Capture PROFILE plans of the N slowest statements into the metrics")
+
+
+def configure_logging(level="INFO"):
+    logging.basicConfig(level=getattr(logging, str(level).upper()), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+
+def report_metrics(driver, args):
+    """Capture PROFILE plans and write the metrics of driver, as requested on the command line."""
+    metrics = driver.metrics
+    if args.profile_slowest:
+        metrics.capture_profiles(driver)
+    for line in metrics.summary_lines():
+        logger.info("%s", line)
+    if args.metrics:
+        metrics.write(args.metrics)
+        logger.info("Metrics written to %s", args.metrics)
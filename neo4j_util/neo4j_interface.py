@@ -1,23 +1,180 @@
-import os
-from neo4j import GraphDatabase
-
-class Neo4jInterface:
-    def __init__(self, uri=None, user=None, password=None):
-        uri = uri or os.getenv('NEO4J_URI')
-        user = user or os.getenv('NEO4J_USER')
-        password = password or os.getenv('NEO4J_PASSWORD')
-        self.driver = GraphDatabase.driver(uri, auth=(user, password))
-
-    def close(self):
-        self.driver.close()
-
-    def execute_query(self, query, parameters=None):
-        with self.driver.session() as session:
-            result = session.run(query, parameters)
-            return [record for record in result]
-
-    def __enter__(self):
-        return self
-
-    def __exit__(self, exc_type, exc_value, traceback):
-        self.close()
+import os
+import time
+from contextlib import contextmanager
+from itertools import islice
+from neo4j import GraphDatabase
+
+from neo4j_util.metrics import Metrics, InstrumentedResult, InstrumentedTransaction
+
+DEFAULT_MAX_POOL_SIZE = 100
+DEFAULT_FETCH_SIZE = 1000
+DEFAULT_MAX_RETRY_TIME = 30.0  # seconds spent retrying transient errors in managed transactions
+DEFAULT_BATCH_SIZE = 1000
+
+
+def batched(rows, batch_size):
+    """Yield lists of at most batch_size items from any iterable."""
+    iterator = iter(rows)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def _run_batch(tx, query, batch):
+    return tx.run(query, rows=batch).consume()
+
+
+class Neo4jInterface:
+    def __init__(self, uri=None, user=None, password=None, database=None,
+                 max_pool_size=None, fetch_size=None, max_retry_time=None, metrics=None):
+        self.uri = uri or os.getenv('NEO4J_URI')
+        self.user = user or os.getenv('NEO4J_USER')
+        self.password = password or os.getenv('NEO4J_PASSWORD')
+        self.database = database or os.getenv('NEO4J_DATABASE')  # None selects the server default
+        self.max_pool_size = int(max_pool_size or os.getenv('NEO4J_MAX_POOL_SIZE', DEFAULT_MAX_POOL_SIZE))
+        self.fetch_size = int(fetch_size or os.getenv('NEO4J_FETCH_SIZE', DEFAULT_FETCH_SIZE))
+        self.max_retry_time = float(max_retry_time or os.getenv('NEO4J_MAX_RETRY_TIME', DEFAULT_MAX_RETRY_TIME))
+        # Timings, update counts and retries of every statement run through this interface
+        self.metrics = metrics if metrics is not None else Metrics()
+        self._driver = None
+        self._session = None
+        self._tx = None
+
+    @property
+    def driver(self):
+        # Created on first use, so importing a script does not require a configured server
+        if self._driver is None:
+            self._driver = GraphDatabase.driver(
+                self.uri,
+                auth=(self.user, self.password),
+                max_connection_pool_size=self.max_pool_size,
+                max_transaction_retry_time=self.max_retry_time
+            )
+        return self._driver
+
+    def close(self):
+        if self._driver is not None:
+            self._driver.close()
+            self._driver = None
+
+    def new_session(self):
+        """Open a new session with the configured database and fetch size. The caller closes it."""
+        return self.driver.session(database=self.database, fetch_size=self.fetch_size)
+
+    @contextmanager
+    def session(self):
+        """Reuse a single session for every call made on this interface inside the block."""
+        if self._session is not None:
+            yield self._session
+            return
+        self._session = self.new_session()
+        try:
+            yield self._session
+        finally:
+            self._session.close()
+            self._session = None
+
+    @contextmanager
+    def transaction(self):
+        """Run every call made on this interface inside the block in one explicit transaction.
+
+        The transaction commits when the block exits normally (unless it was already
+        committed or rolled back) and rolls back if the block raises.
+        """
+        if self._tx is not None:
+            yield self._tx
+            return
+        with self.session() as session:
+            tx = InstrumentedTransaction(session.begin_transaction(), self.metrics)
+            self._tx = tx
+            try:
+                yield tx
+                if not tx.closed():
+                    tx.commit()
+            except BaseException:
+                if not tx.closed():
+                    tx.rollback()
+                raise
+            finally:
+                self._tx = None
+
+    def _run(self, runner, query, parameters):
+        # Session runs are wrapped here; transaction runs are already instrumented
+        if isinstance(runner, InstrumentedTransaction):
+            return runner.run(query, parameters)
+        start = time.perf_counter()
+        return InstrumentedResult(runner.run(query, parameters), self.metrics, query, parameters, start)
+
+    def execute_query(self, query, parameters=None):
+        if self._tx is not None:
+            return [record for record in self._run(self._tx, query, parameters)]
+        if self._session is not None:
+            return [record for record in self._run(self._session, query, parameters)]
+        with self.new_session() as session:
+            result = self._run(session, query, parameters)
+            return [record for record in result]
+
+    def stream_query(self, query, parameters=None):
+        """Yield records as they arrive, pulling fetch_size records per round trip instead of buffering the result."""
+        if self._tx is not None:
+            yield from self._run(self._tx, query, parameters)
+        elif self._session is not None:
+            yield from self._run(self._session, query, parameters)
+        else:
+            with self.new_session() as session:
+                yield from self._run(session, query, parameters)
+
+    def execute_many(self, query, rows, batch_size=DEFAULT_BATCH_SIZE, session=None):
+        """Run an `UNWIND $rows AS row ...` query over rows in batches.
+
+        Each batch runs in its own retried write transaction, or in the open
+        transaction when called inside `transaction()`. Pass a session to use it
+        instead of the interface's own (e.g. one per worker thread). Returns the number of rows sent.
+        """
+        count = 0
+        for batch in batched(rows, batch_size):
+            if session is not None:
+                self._managed(session.execute_write, _run_batch, (query, batch), {})
+            elif self._tx is not None:
+                _run_batch(self._tx, query, batch)
+            else:
+                self.write(_run_batch, query, batch)
+            count += len(batch)
+        return count
+
+    def _managed(self, execute, work, args, kwargs):
+        # Every call of work after the first is a retry by the driver
+        attempts = 0
+
+        def instrumented_work(tx, *args, **kwargs):
+            nonlocal attempts
+            attempts += 1
+            return work(InstrumentedTransaction(tx, self.metrics), *args, **kwargs)
+
+        try:
+            return execute(instrumented_work, *args, **kwargs)
+        finally:
+            if attempts > 1:
+                self.metrics.record_retries(getattr(work, "__name__", repr(work)), attempts - 1)
+
+    def read(self, work, *args, **kwargs):
+        """Call work(tx, ...) in a managed read transaction, retried on transient errors."""
+        if self._tx is not None:
+            return work(self._tx, *args, **kwargs)
+        with self.session() as session:
+            return self._managed(session.execute_read, work, args, kwargs)
+
+    def write(self, work, *args, **kwargs):
+        """Call work(tx, ...) in a managed write transaction, retried on transient errors."""
+        if self._tx is not None:
+            return work(self._tx, *args, **kwargs)
+        with self.session() as session:
+            return self._managed(session.execute_write, work, args, kwargs)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,338 @@
+import argparse
+import logging
+import time
+from collections import namedtuple
+import sys
+import os
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/../')
+
+from orgchart.org_engine import GOVERNMENT_ROOT
+from orgchart.ingestion import iso_date, parse_name_list
+from orgchart.current_view import refresh_current, touched_entities
+from orgchart.lineage import RECORD_QUERIES
+from orgchart.schema import NODE_LABELS
+
+logger = logging.getLogger(__name__)
+
+RELATIONSHIP_TYPES = ("HAS_MINISTER", "HAS_DEPARTMENT")
+
+# Sentinel key: merge_departments reads which minister holds a department, which a
+# rename or merge of that (unnamed) minister changes, so those kinds must stay ordered.
+MINISTER_DEPARTMENTS = ("*", "minister departments")
+
+Batch = namedtuple("Batch", ["level", "kind", "group", "rows"])
+
+
+def transaction_kind(transaction):
+    """Map a transaction to its handler kind, as execute_transactions dispatches it."""
+    file_type = transaction["file_type"]
+    if file_type == "Rename" and transaction["type"] == "minister":
+        return "rename_minister"
+    if file_type == "Move" and transaction["type"] == "department":
+        return "move_department"
+    if file_type == "Add":
+        return "add_entity"
+    if file_type == "Terminate":
+        return "terminate_entity"
+    if file_type == "Merge" and transaction["type"] == "minister":
+        return "merge_ministers"
+    if file_type == "Merge" and transaction["type"] == "department":
+        return "merge_departments"
+    return None
+
+
+def access_keys(kind, transaction):
+    """Return (exclusive, shared) entity keys a transaction touches.
+
+    Exclusive keys are entities whose relationships the transaction rewrites
+    wholesale or creates; shared keys are entities it only attaches a single
+    relationship to. Two transactions conflict when they share a key and at
+    least one of them holds it exclusively.
+    """
+    if kind == "add_entity":
+        return {transaction["child"]}, {transaction["parent"]}
+    if kind == "terminate_entity":
+        return {transaction["child"]}, {transaction["parent"]}
+    if kind == "move_department":
+        return {transaction["child"]}, {transaction["old_parent"], transaction["new_parent"]}
+    if kind == "rename_minister":
+        return {transaction["old"], transaction["new"]}, {GOVERNMENT_ROOT, MINISTER_DEPARTMENTS}
+    if kind == "merge_ministers":
+        return set(parse_name_list(transaction["old"])) | {transaction["new"]}, {GOVERNMENT_ROOT, MINISTER_DEPARTMENTS}
+    if kind == "merge_departments":
+        return set(parse_name_list(transaction["old"])) | {transaction["new"], MINISTER_DEPARTMENTS}, set()
+    return set(), set()
+
+
+def _check_identifier(value, allowed):
+    # Labels and relationship types are interpolated into the Cypher, so only known ones are accepted
+    if value not in allowed:
+        raise ValueError(f"Unknown label or relationship type: {value}")
+    return value
+
+
+class AmendmentPlan:
+    """Transactions grouped into levels of independent, same-kind batches.
+
+    Every transaction is placed one level after the latest earlier transaction it
+    conflicts with, so conflicting transactions keep their transaction_id order
+    and everything within a level can run in any order.
+    """
+
+    def __init__(self, transactions, entity_counters=None):
+        self.entity_counters = dict(entity_counters or {"minister": 0, "department": 0})
+        self.dependencies = {}  # transaction_id -> transaction_ids it must follow
+        self.batches = []
+        self.skipped = []
+        self.touched = (set(), set())  # minister and department names whose current view must be refreshed
+
+        last_exclusive = {}  # key -> (level, transaction_id) of the latest exclusive holder
+        readers = {}         # key -> [(level, transaction_id)] of shared holders since then
+        groups = {}          # (level, kind, group) -> rows
+
+        for transaction in transactions:
+            kind = transaction_kind(transaction)
+            if kind is None:
+                self.skipped.append(transaction["transaction_id"])
+                continue
+            exclusive, shared = access_keys(kind, transaction)
+            transaction_id = transaction["transaction_id"]
+
+            predecessors = []
+            for key in exclusive:
+                if key in last_exclusive:
+                    predecessors.append(last_exclusive[key])
+                predecessors.extend(readers.get(key, []))
+            for key in shared - exclusive:
+                if key in last_exclusive:
+                    predecessors.append(last_exclusive[key])
+            level = max((pred_level + 1 for pred_level, _ in predecessors), default=0)
+            self.dependencies[transaction_id] = sorted({pred_id for _, pred_id in predecessors})
+
+            for key in exclusive:
+                last_exclusive[key] = (level, transaction_id)
+                readers[key] = []
+            for key in shared - exclusive:
+                readers.setdefault(key, []).append((level, transaction_id))
+
+            for group, row in self._rows(kind, transaction):
+                groups.setdefault((level, kind, group), []).append(row)
+            for touched, names in zip(self.touched, touched_entities(transaction)):
+                touched |= names
+
+        for (level, kind, group), rows in sorted(groups.items(), key=lambda item: item[0][0]):
+            self.batches.append(Batch(level, kind, group, rows))
+
+    def _allocate_id(self, transaction_id, child_type):
+        # Same numbering as add_entity: the counter advances for every created-or-matched entity
+        if child_type not in self.entity_counters:
+            raise ValueError(f"Unknown child type: {child_type}")
+        self.entity_counters[child_type] += 1
+        return f"{transaction_id[:7]}_{child_type[:3].lower()}_{self.entity_counters[child_type]}"
+
+    def _rows(self, kind, transaction):
+        """Yield (group, row) parameter rows for a transaction, allocating ids in transaction order."""
+        transaction_id = transaction["transaction_id"]
+        day = iso_date(transaction["date"])
+        if kind == "add_entity":
+            group = (_check_identifier(transaction["parent_type"], NODE_LABELS),
+                     _check_identifier(transaction["child_type"], NODE_LABELS),
+                     _check_identifier(transaction["rel_type"], RELATIONSHIP_TYPES))
+            entity_id = self._allocate_id(transaction_id, transaction["child_type"])
+            yield group, {"parent": transaction["parent"], "child": transaction["child"],
+                          "entity_id": entity_id, "date": day, "transaction_id": transaction_id}
+        elif kind == "terminate_entity":
+            group = (_check_identifier(transaction["parent_type"], NODE_LABELS),
+                     _check_identifier(transaction["child_type"], NODE_LABELS),
+                     _check_identifier(transaction["rel_type"], RELATIONSHIP_TYPES))
+            yield group, {"parent": transaction["parent"], "child": transaction["child"], "date": day,
+                          "transaction_id": transaction_id}
+        elif kind == "move_department":
+            yield None, {"old_parent": transaction["old_parent"], "new_parent": transaction["new_parent"],
+                         "child": transaction["child"], "date": day, "transaction_id": transaction_id}
+        elif kind == "rename_minister":
+            entity_id = self._allocate_id(transaction_id, "minister")
+            yield None, {"old": transaction["old"], "new": transaction["new"], "entity_id": entity_id, "date": day,
+                         "transaction_id": transaction_id}
+        elif kind == "merge_ministers":
+            entity_id = self._allocate_id(transaction_id, "minister")
+            yield None, {"old": parse_name_list(transaction["old"]), "new": transaction["new"],
+                         "entity_id": entity_id, "date": day, "transaction_id": transaction_id}
+        elif kind == "merge_departments":
+            entity_id = self._allocate_id(transaction_id, "department")
+            yield None, {"old": parse_name_list(transaction["old"]), "new": transaction["new"],
+                         "entity_id": entity_id, "date": day, "transaction_id": transaction_id}
+
+    def levels(self):
+        return 1 + max((batch.level for batch in self.batches), default=-1)
+
+    def statement_count(self):
+        refresh = 1 if any(self.touched) else 0
+        return refresh + sum(len(statements_for(batch.kind, batch.group)) for batch in self.batches)
+
+
+# Batched statements per kind, run in order for each batch. Each mirrors the tx.run calls of
+# the matching handler in update_orgchart.py, with the per-row parameters moved into $rows.
+
+def _terminate_statement(parent_type, child_type, rel_type, parent="row.parent", child="row.child"):
+    return f"""
+    UNWIND $rows AS row
+    MATCH (parent:{parent_type} {{name: {parent}}})-[rel:{rel_type}]-(child:{child_type} {{name: {child}}})
+    WHERE rel.end_date IS NULL
+    SET rel.end_date = date(row.date), rel.end_transaction_id = row.transaction_id
+    """
+
+
+CREATE_MINISTER = """
+UNWIND $rows AS row
+MERGE (new:minister {name: row.new})
+ON CREATE SET new.id = row.entity_id
+WITH row, new
+MATCH (gov:government {name: $government})
+MERGE (gov)-[r:HAS_MINISTER {start_date: date(row.date)}]->(new)
+ON CREATE SET r.transaction_id = row.transaction_id
+"""
+
+# Rename and minister merge steps take one row per (old, new) pair
+PAIR_STATEMENTS = [
+    # Transfer the old minister's open departments to the new minister
+    """
+    UNWIND $rows AS row
+    MATCH (old:minister {name: row.old})-[r:HAS_DEPARTMENT]->(d)
+    WHERE r.end_date IS NULL
+    MATCH (new:minister {name: row.new})
+    MERGE (new)-[r_new:HAS_DEPARTMENT {start_date: date(row.date)}]->(d)
+    ON CREATE SET r_new.transaction_id = row.transaction_id
+    """,
+    # Terminate the government -> old minister relationship
+    _terminate_statement("government", "minister", "HAS_MINISTER", parent="$government", child="row.old"),
+    # Terminate the old minister's department relationships
+    """
+    UNWIND $rows AS row
+    MATCH (old:minister {name: row.old})-[r:HAS_DEPARTMENT]->(d)
+    WHERE r.end_date IS NULL
+    SET r.end_date = date(row.date), r.end_transaction_id = row.transaction_id
+    """,
+]
+
+
+def _lineage_statement(rel_type):
+    return f"""
+    UNWIND $rows AS row
+    MATCH (old:minister {{name: row.old}}), (new:minister {{name: row.new}})
+    MERGE (old)-[r:{rel_type} {{date: date(row.date)}}]->(new)
+    ON CREATE SET r.transaction_id = row.transaction_id
+    """
+
+
+MERGE_DEPARTMENT_STATEMENTS = [
+    # Create the new department
+    """
+    UNWIND $rows AS row
+    MERGE (new:department {name: row.new})
+    ON CREATE SET new.id = row.entity_id
+    """,
+    # The minister(s) of the first old department take the new department
+    """
+    UNWIND $rows AS row
+    MATCH (minister:minister)-[rel:HAS_DEPARTMENT]->(old:department {name: row.old[0]})
+    WHERE rel.end_date IS NULL
+    WITH row, minister
+    MATCH (new:department {name: row.new})
+    MERGE (minister)-[r:HAS_DEPARTMENT {start_date: date(row.date)}]->(new)
+    ON CREATE SET r.transaction_id = row.transaction_id
+    """,
+    # Terminate the relationships to every old department and link it to the new one
+    """
+    UNWIND $rows AS row
+    UNWIND row.old AS old_name
+    MATCH (minister:minister)-[rel:HAS_DEPARTMENT]->(old:department {name: old_name})
+    WHERE rel.end_date IS NULL
+    SET rel.end_date = date(row.date), rel.end_transaction_id = row.transaction_id
+    """,
+    """
+    UNWIND $rows AS row
+    UNWIND row.old AS old_name
+    MATCH (old:department {name: old_name}), (new:department {name: row.new})
+    MERGE (old)-[r:MERGED_INTO {date: date(row.date)}]->(new)
+    ON CREATE SET r.transaction_id = row.transaction_id
+    """,
+]
+
+
+def _pairs(rows):
+    return [{"old": old, "new": row["new"], "date": row["date"], "transaction_id": row["transaction_id"]}
+            for row in rows for old in row["old"]]
+
+
+def statements_for(kind, group):
+    """Return [(query, row transform)] for a batch of the given kind and group."""
+    if kind == "add_entity":
+        parent_type, child_type, rel_type = group
+        return [(f"""
+        UNWIND $rows AS row
+        MERGE (child:{child_type} {{name: row.child}})
+        ON CREATE SET child.id = row.entity_id
+        WITH row, child
+        MATCH (parent:{parent_type} {{name: row.parent}})
+        MERGE (parent)-[r:{rel_type} {{start_date: date(row.date)}}]->(child)
+        ON CREATE SET r.transaction_id = row.transaction_id
+        """, None)]
+    if kind == "terminate_entity":
+        return [(_terminate_statement(*group), None)]
+    if kind == "move_department":
+        return [
+            ("""
+            UNWIND $rows AS row
+            MATCH (new_parent:minister {name: row.new_parent}), (child:department {name: row.child})
+            MERGE (new_parent)-[r:HAS_DEPARTMENT {start_date: date(row.date)}]->(child)
+            ON CREATE SET r.transaction_id = row.transaction_id
+            """, None),
+            (_terminate_statement("minister", "department", "HAS_DEPARTMENT", parent="row.old_parent"), None),
+        ]
+    if kind == "rename_minister":
+        return ([(CREATE_MINISTER, None)]
+                + [(query, None) for query in PAIR_STATEMENTS]
+                + [(_lineage_statement("RENAMED_TO"), None), (RECORD_QUERIES["minister"], None)])
+    if kind == "merge_ministers":
+        return ([(CREATE_MINISTER, None)]
+                + [(query, _pairs) for query in PAIR_STATEMENTS]
+                + [(_lineage_statement("MERGED_INTO"), _pairs), (RECORD_QUERIES["minister"], _pairs)])
+    if kind == "merge_departments":
+        return [(query, None) for query in MERGE_DEPARTMENT_STATEMENTS] + [(RECORD_QUERIES["department"], _pairs)]
+    raise ValueError(f"Unknown transaction kind: {kind}")
+
+
+def execute_plan(tx, plan: AmendmentPlan):
+    """Run every batch of a plan inside an open transaction, then refresh the current view of what it touched."""
+    for batch in plan.batches:
+        start = time.perf_counter()
+        for query, transform in statements_for(batch.kind, batch.group):
+            rows = transform(batch.rows) if transform else batch.rows
+            result = tx.run(query, rows=rows, government=GOVERNMENT_ROOT)
+            counters = result.consume().counters
+            logger.debug("Level %s %s (%d row(s)): %d node(s) created, %d relationship(s) created, %d property(ies) set",
+                         batch.level, batch.kind, len(batch.rows), counters.nodes_created,
+                         counters.relationships_created, counters.properties_set)
+        # Per batch kind timings, when running in an instrumented transaction
+        metrics = getattr(tx, "metrics", None)
+        if metrics is not None:
+            metrics.record_transaction(f"planned {batch.kind}", time.perf_counter() - start)
+    refresh_current(tx, *plan.touched)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show how an amendment gazette would be batched.")
+    parser.add_argument("amendment_dir", nargs="?", default="../data/2015-10-15_2", help="Amendment gazette directory")
+    args = parser.parse_args()
+
+    from orgchart.update_orgchart import load_transactions
+
+    transactions = load_transactions(args.amendment_dir)
+    plan = AmendmentPlan(transactions)
+    for batch in plan.batches:
+        print(f"Level {batch.level}: {batch.kind} {batch.group or ''} x{len(batch.rows)}")
+    print(f"{len(transactions)} transaction(s) -> {plan.levels()} level(s), {len(plan.batches)} batch(es), "
+          f"{plan.statement_count()} statement(s)")
@@ -0,0 +1,205 @@
+import argparse
+import json
+from bisect import bisect_right
+from datetime import date
+import sys
+import os
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/../')
+
+from neo4j_util.neo4j_interface import Neo4jInterface
+from orgchart.ingestion import parse_date
+
+FOREVER = date.max.toordinal() + 1  # end of an interval without an end_date
+
+TEMPORAL_TYPES = ("HAS_MINISTER", "HAS_DEPARTMENT")
+
+
+def as_ordinal(day):
+    # Same parsing (and cache) as the loaders; an end date marker is not a point in time
+    parsed = parse_date(day)
+    if parsed is None:
+        raise ValueError(f"Not a date: {day!r}")
+    return parsed.toordinal()
+
+
+class IntervalTree:
+    """Static centered interval tree answering "which intervals contain this point" queries.
+
+    Intervals are half-open [start, end): a relationship ended on a date is no
+    longer active on that date, which is when its successor starts. A query costs
+    O(log n + k) for k matches.
+    """
+
+    def __init__(self, intervals):
+        # intervals: list of (start ordinal, end ordinal, value); empty intervals contain no point
+        self.root = self._build([interval for interval in intervals if interval[0] < interval[1]])
+
+    def _build(self, intervals):
+        if not intervals:
+            return None
+        endpoints = sorted({start for start, _, _ in intervals} | {end for _, end, _ in intervals})
+        center = endpoints[(len(endpoints) - 1) // 2]
+        left, right, here = [], [], []
+        for interval in intervals:
+            if interval[1] <= center:
+                left.append(interval)
+            elif interval[0] > center:
+                right.append(interval)
+            else:
+                here.append(interval)
+        by_start = sorted(here, key=lambda interval: interval[0])
+        by_end = sorted(here, key=lambda interval: interval[1])
+        return (
+            center,
+            [interval[0] for interval in by_start], [interval[2] for interval in by_start],
+            [interval[1] for interval in by_end], [interval[2] for interval in by_end],
+            self._build(left), self._build(right)
+        )
+
+    def stab(self, point):
+        """Return the values of every interval containing point."""
+        found = []
+        node = self.root
+        while node is not None:
+            center, starts, start_values, ends, end_values, left, right = node
+            if point < center:
+                # Every interval here ends after center > point; keep those starting at or before point
+                found.extend(start_values[:bisect_right(starts, point)])
+                node = left
+            else:
+                # Every interval here starts at or before center <= point; keep those ending after point
+                found.extend(end_values[bisect_right(ends, point):])
+                node = right
+        return found
+
+
+class TemporalIndex:
+    """Point-in-time view of the org chart built once from the temporal relationships."""
+
+    def __init__(self, relationships, names):
+        # relationships: iterable of (type, source id, target id, start date, end date or None)
+        # names: id -> name for every node
+        self.names = names
+        by_type = {rel_type: [] for rel_type in TEMPORAL_TYPES}
+        outgoing = {}
+        incoming = {}
+        dates = []
+        for rel_type, source, target, start_date, end_date in relationships:
+            if rel_type not in by_type:
+                continue
+            start = as_ordinal(start_date)
+            end = as_ordinal(end_date) if end_date is not None else FOREVER
+            dates.extend((start, end) if end != FOREVER else (start,))
+            by_type[rel_type].append((start, end, (source, target)))
+            outgoing.setdefault((rel_type, source), []).append((start, end, target))
+            incoming.setdefault((rel_type, target), []).append((start, end, source))
+        self.trees = {rel_type: IntervalTree(intervals) for rel_type, intervals in by_type.items()}
+        self._outgoing = outgoing
+        self._incoming = incoming
+        self._entity_trees = {}
+        # First and last relationship dates as ordinals
+        self.span = (min(dates), max(dates)) if dates else None
+
+    @classmethod
+    def from_graph(cls, graph):
+        """Build from an in-memory OrgGraph (org_engine.py)."""
+        names = {node_id: name for _, node_id, name in graph.nodes()}
+        return cls(graph.relationships(), names)
+
+    @classmethod
+    def from_binary(cls, snapshot):
+        """Build from an open BinarySnapshot (binary_snapshot.py)."""
+        return cls(snapshot.relationships(), snapshot.names())
+
+    @classmethod
+    def from_neo4j(cls, driver: Neo4jInterface):
+        """Build from the database with two streamed queries."""
+        names = {
+            record["id"]: record["name"]
+            for record in driver.stream_query(
+                "MATCH (n) WHERE n:government OR n:minister OR n:department RETURN n.id AS id, n.name AS name")
+        }
+        query = """
+        MATCH (a)-[r:HAS_MINISTER|HAS_DEPARTMENT]->(b)
+        RETURN type(r) AS type, a.id AS source, b.id AS target, r.start_date AS start_date, r.end_date AS end_date
+        """
+        relationships = (
+            (record["type"], record["source"], record["target"],
+             record["start_date"].to_native(), record["end_date"].to_native() if record["end_date"] else None)
+            for record in driver.stream_query(query)
+        )
+        return cls(relationships, names)
+
+    def _entity_tree(self, key, edges):
+        # Per-entity trees are built lazily on first lookup
+        tree = self._entity_trees.get(key)
+        if tree is None:
+            tree = self._entity_trees[key] = IntervalTree(edges.get(key, []))
+        return tree
+
+    def _node(self, node_id):
+        return {"id": node_id, "name": self.names.get(node_id)}
+
+    def as_of(self, day):
+        """Return the government -> minister -> department tree active on the given date."""
+        point = as_ordinal(day)
+        departments = {}
+        for minister, department in self.trees["HAS_DEPARTMENT"].stab(point):
+            departments.setdefault(minister, []).append(department)
+        governments = {}
+        for government, minister in self.trees["HAS_MINISTER"].stab(point):
+            governments.setdefault(government, []).append(minister)
+
+        tree = []
+        for government in sorted(governments):
+            ministers = []
+            for minister in sorted(governments[government]):
+                node = self._node(minister)
+                node["departments"] = [self._node(department) for department in sorted(departments.get(minister, []))]
+                ministers.append(node)
+            node = self._node(government)
+            node["ministers"] = ministers
+            tree.append(node)
+        return tree
+
+    def holders(self, rel_type):
+        """Return the ids of every entity with outgoing relationships of the given type."""
+        return sorted(source for key_type, source in self._outgoing if key_type == rel_type)
+
+    def departments_of(self, minister_id, day):
+        """Return the departments a minister held on the given date."""
+        tree = self._entity_tree(("HAS_DEPARTMENT", minister_id), self._outgoing)
+        return [self._node(department) for department in sorted(tree.stab(as_ordinal(day)))]
+
+    def ministers_of(self, government_id, day):
+        """Return the ministers of a government on the given date."""
+        tree = self._entity_tree(("HAS_MINISTER", government_id), self._outgoing)
+        return [self._node(minister) for minister in sorted(tree.stab(as_ordinal(day)))]
+
+    def minister_of(self, department_id, day):
+        """Return the minister(s) holding a department on the given date."""
+        tree = self._entity_tree(("HAS_DEPARTMENT", department_id), self._incoming)
+        return [self._node(minister) for minister in sorted(tree.stab(as_ordinal(day)))]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Print the org chart as of a date.")
+    parser.add_argument("date", help="Date in YYYY-MM-DD format")
+    parser.add_argument("--minister", help="Only print the departments of this minister id")
+    parser.add_argument("--binary", metavar="PATH", help="Build from this binary snapshot instead of the database")
+    args = parser.parse_args()
+
+    if args.binary:
+        from orgchart.binary_snapshot import BinarySnapshot
+
+        with BinarySnapshot(args.binary) as snapshot:
+            index = TemporalIndex.from_binary(snapshot)
+    else:
+        with Neo4jInterface() as neo4j_interface:
+            index = TemporalIndex.from_neo4j(neo4j_interface)
+    if args.minister:
+        print(json.dumps(index.departments_of(args.minister, args.date), indent=2))
+    else:
+        print(json.dumps(index.as_of(args.date), indent=2))
@@ -0,0 +1,318 @@
+import argparse
+import heapq
+import logging
+import re
+from collections import namedtuple
+from datetime import datetime
+import sys
+import os
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/../')
+
+from neo4j_util.neo4j_interface import Neo4jInterface, DEFAULT_BATCH_SIZE, batched
+from neo4j_util.metrics import add_instrumentation_arguments, configure_logging, report_metrics
+from orgchart.schema import apply_schema
+from orgchart.update_orgchart import apply_transaction, prepare_transactions
+from orgchart.amendment_planner import AmendmentPlan, execute_plan
+from orgchart.entity_registry import EntityRegistry
+from orgchart.ingestion import AMENDMENT_FILES, node_rows, read_amendment_file, relationship_rows
+from orgchart.current_view import rebuild_current_view
+from orgchart.name_index import NameIndex
+from orgchart.preflight import load_current_graph
+from orgchart.read_service import earliest_date, record_gazette_commit
+from orgchart.snapshot_diff import diff_structures, gazette_prefix, graph_structure, load_active_structure
+
+logger = logging.getLogger(__name__)
+
+GAZETTE_DIR_PATTERN = re.compile(r"^(\d{4}-\d{2}-\d{2})(?:_(\d+))?$")
+
+SNAPSHOT_FILES = ["government.csv", "minister.csv", "department.csv", "gov-min.csv", "min-dep.csv"]
+
+DEFAULT_PIPELINE = "default"
+
+DEFAULT_CHUNK_SIZE = 1000  # amendment rows per committed chunk
+
+Gazette = namedtuple("Gazette", ["name", "date", "sequence", "kind", "path"])
+
+
+def gazette_kind(path):
+    """Classify a gazette directory as a full snapshot, an amendment set, or neither."""
+    files = set(os.listdir(path))
+    if all(name in files for name in SNAPSHOT_FILES):
+        return "snapshot"
+    if any(name in files for name in AMENDMENT_FILES.values()):
+        return "amendment"
+    return None
+
+
+def discover_gazettes(data_dir):
+    """Return the snapshot and amendment gazettes under data_dir, ordered by date and suffix."""
+    gazettes = []
+    for name in os.listdir(data_dir):
+        path = os.path.join(data_dir, name)
+        match = GAZETTE_DIR_PATTERN.match(name)
+        if not match or not os.path.isdir(path):
+            continue
+        kind = gazette_kind(path)
+        if kind is None:
+            logger.info("Skipping %s: no snapshot or amendment files", name)
+            continue
+        day = datetime.strptime(match.group(1), "%Y-%m-%d").date()
+        gazettes.append(Gazette(name, day, int(match.group(2) or 0), kind, path))
+    gazettes.sort(key=lambda gazette: (gazette.date, gazette.sequence))
+    return gazettes
+
+
+def stream_transactions(folder):
+    """Yield the transactions of an amendment gazette in transaction_id order.
+
+    Yields the same records as update_orgchart.load_transactions. Each per-type file
+    is sorted on its own (the gazettes do not guarantee an order) and the files are
+    merged on the fly instead of being concatenated and sorted as one list.
+    """
+    streams = [
+        sorted(read_amendment_file(os.path.join(folder, file_name), file_type),
+               key=lambda row: row["transaction_id"])
+        for file_type, file_name in AMENDMENT_FILES.items()
+        if os.path.exists(os.path.join(folder, file_name))
+    ]
+    return heapq.merge(*streams, key=lambda row: row["transaction_id"])
+
+
+# Checkpoints are stored in the graph and written in the same transaction as the rows they record
+
+def read_checkpoint(driver: Neo4jInterface, pipeline=DEFAULT_PIPELINE):
+    """Return the stored checkpoint as a dict, or None if nothing was applied yet."""
+    records = driver.execute_query("""
+    MATCH (c:IngestCheckpoint {pipeline: $pipeline})
+    RETURN c.gazette AS gazette, c.transaction_id AS transaction_id, c.complete AS complete
+    """, {"pipeline": pipeline})
+    return dict(records[0]) if records else None
+
+
+def write_checkpoint(tx, gazette, transaction_id, complete, pipeline=DEFAULT_PIPELINE):
+    """Record the position reached in a gazette, and whether the gazette is complete.
+
+    For amendments the position is the last transaction_id applied; for a snapshot
+    load it is "<stage>:<rows loaded>" (see load_snapshot).
+    """
+    tx.run("""
+    MERGE (c:IngestCheckpoint {pipeline: $pipeline})
+    SET c.gazette = $gazette, c.transaction_id = $transaction_id, c.complete = $complete,
+        c.updated_at = datetime()
+    """, pipeline=pipeline, gazette=gazette, transaction_id=transaction_id, complete=complete).consume()
+
+
+def pending_gazettes(gazettes, checkpoint):
+    """Yield (gazette, position to resume after or None) for every gazette still to apply."""
+    start = 0
+    resume_after = None
+    if checkpoint:
+        names = [gazette.name for gazette in gazettes]
+        if checkpoint["gazette"] not in names:
+            raise ValueError(f"Checkpoint gazette {checkpoint['gazette']} not found under the data directory")
+        start = names.index(checkpoint["gazette"])
+        if checkpoint["complete"]:
+            start += 1
+        else:
+            resume_after = checkpoint["transaction_id"]
+    for position, gazette in enumerate(gazettes[start:]):
+        yield gazette, resume_after if position == 0 else None
+
+
+# The first snapshot is loaded with MERGE, so a batch replayed after a crash finds its rows already there
+NODE_MERGE_QUERY = """
+UNWIND $rows AS row
+MERGE (n:{label} {{id: row.id}})
+ON CREATE SET n.name = row.name
+"""
+
+GOV_MIN_MERGE_QUERY = """
+UNWIND $rows AS row
+MATCH (gov:government {id: row.gov_id}), (min:minister {id: row.min_id})
+MERGE (gov)-[r:HAS_MINISTER {start_date: date(row.start_date)}]->(min)
+SET r.end_date = date(row.end_date)
+"""
+
+MIN_DEP_MERGE_QUERY = """
+UNWIND $rows AS row
+MATCH (min:minister {id: row.min_id}), (dep:department {id: row.dep_id})
+MERGE (min)-[r:HAS_DEPARTMENT {start_date: date(row.start_date)}]->(dep)
+SET r.end_date = date(row.end_date)
+"""
+
+# (stage, query, file, relationship id columns or None for a node file), in load order
+SNAPSHOT_STAGES = [
+    ("government", NODE_MERGE_QUERY.format(label="government"), "government.csv", None),
+    ("minister", NODE_MERGE_QUERY.format(label="minister"), "minister.csv", None),
+    ("department", NODE_MERGE_QUERY.format(label="department"), "department.csv", None),
+    ("HAS_MINISTER", GOV_MIN_MERGE_QUERY, "gov-min.csv", ("gov_id", "min_id")),
+    ("HAS_DEPARTMENT", MIN_DEP_MERGE_QUERY, "min-dep.csv", ("min_id", "dep_id")),
+]
+
+
+def _snapshot_position(resume_after):
+    # "<stage>:<rows loaded>" -> (stage number, rows loaded)
+    if resume_after is None:
+        return 0, 0
+    stage, rows = resume_after.rsplit(":", 1)
+    stages = [name for name, _, _, _ in SNAPSHOT_STAGES]
+    if stage not in stages:
+        raise ValueError(f"Unknown snapshot checkpoint position {resume_after}")
+    return stages.index(stage), int(rows)
+
+
+def load_snapshot(driver: Neo4jInterface, gazette, resume_after=None, pipeline=DEFAULT_PIPELINE,
+                  batch_size=DEFAULT_BATCH_SIZE):
+    """Load a full snapshot in batches, each committed with a checkpoint of the rows loaded so far."""
+    first_stage, skip = _snapshot_position(resume_after)
+    for number, (stage, query, file_name, columns) in enumerate(SNAPSHOT_STAGES):
+        if number < first_stage:
+            continue
+        path = os.path.join(gazette.path, file_name)
+        rows = node_rows(path) if columns is None else relationship_rows(path, *columns)
+        offset = skip if number == first_stage else 0
+        if offset:
+            logger.info("%s: resuming after %d of %d row(s)", stage, offset, len(rows))
+        for start in range(offset, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            with driver.transaction() as tx:
+                tx.run(query, rows=batch).consume()
+                write_checkpoint(tx, gazette.name, f"{stage}:{start + len(batch)}", False, pipeline)
+        logger.info("%s: %d row(s) loaded", stage, len(rows))
+
+    rebuild_current_view(driver)
+    with driver.transaction() as tx:
+        # A snapshot can change any date: read services drop every cached result
+        record_gazette_commit(tx, gazette.path)
+        write_checkpoint(tx, gazette.name, None, True, pipeline)
+
+
+def _apply_in_chunks(driver: Neo4jInterface, gazette, transactions, pipeline, planned, chunk_size):
+    # Each chunk commits with its GazetteCommit and the checkpoint of its last row; the last one marks the gazette complete
+    registry = EntityRegistry(driver).load()
+    entity_counters = registry.counters(transactions[0]["transaction_id"])
+    chunks = list(batched(transactions, chunk_size))
+    for number, chunk in enumerate(chunks, start=1):
+        with driver.transaction() as tx:
+            if planned:
+                plan = AmendmentPlan(chunk, entity_counters)
+                execute_plan(tx, plan)
+                entity_counters = plan.entity_counters
+            else:
+                for transaction in chunk:
+                    apply_transaction(tx, transaction, entity_counters, registry)
+            record_gazette_commit(tx, gazette.name, earliest_date(chunk), gazette.name,
+                                  [transaction["transaction_id"] for transaction in chunk])
+            write_checkpoint(tx, gazette.name, chunk[-1]["transaction_id"], number == len(chunks), pipeline)
+        logger.info("Committed %s..%s (%d row(s))", chunk[0]["transaction_id"], chunk[-1]["transaction_id"], len(chunk))
+    return len(transactions)
+
+
+def _mark_complete(driver: Neo4jInterface, gazette, transaction_id, pipeline):
+    with driver.transaction() as tx:
+        write_checkpoint(tx, gazette.name, transaction_id, True, pipeline)
+
+
+def apply_amendment_gazette(driver: Neo4jInterface, gazette, resume_after=None, pipeline=DEFAULT_PIPELINE,
+                            planned=False, chunk_size=DEFAULT_CHUNK_SIZE, validate=True):
+    """Apply one amendment gazette in chunks of chunk_size rows. Returns the row count, or None if it was refused.
+
+    The rows go through update_orgchart.prepare_transactions like any other apply:
+    rows an earlier commit of the gazette applied are skipped, names are resolved and,
+    with validate, the gazette is checked first (nothing is written if it fails).
+    """
+    transactions = list(stream_transactions(gazette.path))
+    if resume_after is not None:
+        transactions = [transaction for transaction in transactions if transaction["transaction_id"] > resume_after]
+    transactions = prepare_transactions(driver, transactions, gazette.name, validate=validate)
+    if transactions is None:
+        return None
+    if not transactions:
+        _mark_complete(driver, gazette, resume_after, pipeline)
+        return 0
+    return _apply_in_chunks(driver, gazette, transactions, pipeline, planned, chunk_size)
+
+
+def apply_snapshot_diff(driver: Neo4jInterface, gazette, pipeline=DEFAULT_PIPELINE, planned=False, validate=True):
+    """Apply a later full snapshot as the Add/Move/Terminate rows that turn the database into it (see snapshot_diff.py).
+
+    Returns the row count, or None if it was refused. The diff is taken against the
+    current state, so it commits in one transaction: after a crash it is simply
+    computed again, and every row of it runs (its ids are renumbered on each diff).
+    """
+    graph = load_current_graph(driver)
+    transactions = diff_structures(graph_structure(graph), load_active_structure(gazette.path),
+                                   gazette_prefix(gazette.path), gazette.date.isoformat())
+    transactions = prepare_transactions(driver, transactions, gazette.name, reapply=True, validate=validate,
+                                        name_index=NameIndex.from_graph(graph))
+    if transactions is None:
+        return None
+    if not transactions:
+        _mark_complete(driver, gazette, None, pipeline)
+        return 0
+    return _apply_in_chunks(driver, gazette, transactions, pipeline, planned, len(transactions))
+
+
+def run_backfill(driver: Neo4jInterface, data_dir="../data", pipeline=DEFAULT_PIPELINE, planned=False,
+                 batch_size=DEFAULT_BATCH_SIZE, chunk_size=DEFAULT_CHUNK_SIZE, validate=True):
+    """Apply every pending gazette under data_dir in date order, resuming from the stored checkpoint.
+
+    The first snapshot is loaded as is; later snapshots are applied as their diff
+    against the database. Returns False if a gazette was refused (the backfill stops there).
+    """
+    apply_schema(driver)
+    gazettes = discover_gazettes(data_dir)
+    first_snapshot = next((gazette.name for gazette in gazettes if gazette.kind == "snapshot"), None)
+    checkpoint = read_checkpoint(driver, pipeline)
+    if checkpoint:
+        logger.info("Resuming after checkpoint: %s", checkpoint)
+
+    for gazette, resume_after in pending_gazettes(gazettes, checkpoint):
+        if resume_after:
+            logger.info("Applying %s %s after %s", gazette.kind, gazette.name, resume_after)
+        else:
+            logger.info("Applying %s %s", gazette.kind, gazette.name)
+        if gazette.name == first_snapshot:
+            load_snapshot(driver, gazette, resume_after, pipeline, batch_size)
+            continue
+        if gazette.kind == "snapshot":
+            count = apply_snapshot_diff(driver, gazette, pipeline, planned, validate)
+        else:
+            count = apply_amendment_gazette(driver, gazette, resume_after, pipeline, planned, chunk_size, validate)
+        if count is None:
+            logger.error("Backfill stopped at %s: nothing from it was written", gazette.name)
+            return False
+        logger.info("Applied %s transaction(s) from %s", count, gazette.name)
+    logger.info("Backfill complete")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply every gazette under the data directory in date order.")
+    parser.add_argument("data_dir", nargs="?", default="../data", help="Directory containing the gazette directories")
+    parser.add_argument("--pipeline", default=DEFAULT_PIPELINE, help="Checkpoint name, for running separate backfills")
+    parser.add_argument("--planned", action="store_true", help="Apply amendments through the batched planner")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="Load the first snapshot in UNWIND batches of this size, checkpointing each batch")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="Commit amendments (with a checkpoint) every this many rows")
+    parser.add_argument("--no-validate", dest="validate", action="store_false",
+                        help="Skip the pre-flight check of each gazette (see preflight.py)")
+    parser.add_argument("--list", action="store_true", help="Only list the discovered gazettes")
+    add_instrumentation_arguments(parser)
+    args = parser.parse_args()
+    configure_logging(args.log_level)
+
+    if args.list:
+        for gazette in discover_gazettes(args.data_dir):
+            print(f"{gazette.name}: {gazette.kind}")
+    else:
+        with Neo4jInterface() as neo4j_interface:
+            neo4j_interface.metrics.profile_slowest = args.profile_slowest
+            completed = run_backfill(neo4j_interface, args.data_dir, args.pipeline, args.planned, args.batch_size,
+                                     args.chunk_size, args.validate)
+            report_metrics(neo4j_interface, args)
+        if not completed:
+            sys.exit(1)
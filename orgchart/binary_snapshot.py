@@ -0,0 +1,319 @@
+import argparse
+import json
+import mmap
+import struct
+import time
+from array import array
+from bisect import bisect_left
+import sys
+import os
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/../')
+
+from neo4j_util.neo4j_interface import Neo4jInterface
+from orgchart.org_engine import NODE_LABELS, OPEN, RELATIONSHIP_TYPES, from_ordinal, to_ordinal
+
+MAGIC = b"ORGSNAP1"
+ALIGNMENT = 8
+
+# Column sections: name -> array typecode. Node and relationship numbers index the columns,
+# strings are stored once in a shared table and referenced by number.
+SECTIONS = {
+    "string_offsets": "q",  # string number -> byte offset in string_data (one extra entry for the end)
+    "string_data": "B",     # UTF-8 bytes of every distinct id and name
+    "node_label": "b",      # index into NODE_LABELS
+    "node_id": "I",         # string number
+    "node_name": "I",       # string number
+    "id_order": "I",        # node numbers sorted by id
+    "name_order": "I",      # node numbers sorted by (label, name)
+    "label_offsets": "I",   # label -> first position in name_order (one extra entry for the end)
+    "rel_type": "b",        # index into RELATIONSHIP_TYPES
+    "rel_source": "I",      # node number
+    "rel_target": "I",      # node number
+    "rel_start": "i",       # date ordinal (the RENAMED_TO/MERGED_INTO date)
+    "rel_end": "i",         # date ordinal, OPEN for no end_date
+    "out_offsets": "I",     # node -> first position in out_rels (one extra entry for the end)
+    "out_rels": "I",        # relationship numbers grouped by source
+    "in_offsets": "I",      # node -> first position in in_rels (one extra entry for the end)
+    "in_rels": "I",         # relationship numbers grouped by target
+}
+
+
+def _adjacency(node_count, ends):
+    """Group relationship numbers by node (CSR): returns (offsets, relationship numbers)."""
+    counts = [0] * (node_count + 1)
+    for node in ends:
+        counts[node + 1] += 1
+    for node in range(node_count):
+        counts[node + 1] += counts[node]
+    offsets = array("I", counts)
+    positions = counts[:-1]
+    rels = array("I", bytes(4 * len(ends)))
+    for rel, node in enumerate(ends):
+        rels[positions[node]] = rel
+        positions[node] += 1
+    return offsets, rels
+
+
+def write_binary_snapshot(path, nodes, relationships):
+    """Write a binary snapshot of nodes and relationships to path.
+
+    nodes: iterable of (label, id, name); relationships: iterable of
+    (type, source id, target id, start date, end date or None), as yielded by
+    OrgGraph.nodes() and OrgGraph.relationships(). The file is written next to
+    path and renamed over it, so processes that have the old file mapped keep
+    reading a consistent copy.
+    """
+    strings = {}
+    string_offsets = array("q", [0])
+    string_data = bytearray()
+
+    def intern(value):
+        number = strings.get(value)
+        if number is None:
+            number = strings[value] = len(strings)
+            string_data.extend(value.encode("utf-8"))
+            string_offsets.append(len(string_data))
+        return number
+
+    columns = {name: array(typecode) for name, typecode in SECTIONS.items()}
+    node_numbers = {}
+    id_keys = []
+    name_keys = []
+    for label, node_id, name in nodes:
+        node = len(node_numbers)
+        node_numbers[node_id] = node
+        columns["node_label"].append(NODE_LABELS.index(label))
+        columns["node_id"].append(intern(node_id))
+        columns["node_name"].append(intern(name))
+        id_keys.append(node_id)
+        name_keys.append((NODE_LABELS.index(label), name))
+
+    for rel_type, source, target, start_date, end_date in relationships:
+        if source not in node_numbers or target not in node_numbers:
+            continue
+        columns["rel_type"].append(RELATIONSHIP_TYPES.index(rel_type))
+        columns["rel_source"].append(node_numbers[source])
+        columns["rel_target"].append(node_numbers[target])
+        columns["rel_start"].append(to_ordinal(start_date))
+        columns["rel_end"].append(to_ordinal(end_date) if end_date is not None else OPEN)
+
+    node_count = len(node_numbers)
+    columns["string_offsets"] = string_offsets
+    columns["string_data"] = array("B", string_data)
+    columns["id_order"] = array("I", sorted(range(node_count), key=id_keys.__getitem__))
+    name_order = sorted(range(node_count), key=name_keys.__getitem__)
+    columns["name_order"] = array("I", name_order)
+    label_offsets = [0] * (len(NODE_LABELS) + 1)
+    for label, _ in name_keys:
+        label_offsets[label + 1] += 1
+    for label in range(len(NODE_LABELS)):
+        label_offsets[label + 1] += label_offsets[label]
+    columns["label_offsets"] = array("I", label_offsets)
+    columns["out_offsets"], columns["out_rels"] = _adjacency(node_count, columns["rel_source"])
+    columns["in_offsets"], columns["in_rels"] = _adjacency(node_count, columns["rel_target"])
+
+    # Header: magic, header length, JSON section table; every section starts 8-byte aligned
+    sections = {}
+    offset = 0
+    for name in SECTIONS:
+        size = len(columns[name]) * columns[name].itemsize
+        sections[name] = [offset, size]
+        offset += size + (-size % ALIGNMENT)
+    header = json.dumps({"byteorder": sys.byteorder, "nodes": node_count, "relationships": len(columns["rel_type"]),
+                         "labels": list(NODE_LABELS), "types": list(RELATIONSHIP_TYPES), "sections": sections}).encode()
+    header += b" " * (-(len(MAGIC) + 4 + len(header)) % ALIGNMENT)
+    base = len(MAGIC) + 4 + len(header)
+
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(header)))
+        f.write(header)
+        for name in SECTIONS:
+            column = columns[name]
+            column.tofile(f)
+            f.write(b"\0" * (-(len(column) * column.itemsize) % ALIGNMENT))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+    return {"nodes": node_count, "relationships": len(columns["rel_type"]), "strings": len(strings),
+            "bytes": base + offset}
+
+
+class _Keys:
+    # A read-only sequence of sort keys over an order column, for bisect
+    def __init__(self, order, key, start=0, stop=None):
+        self.order, self.key, self.start = order, key, start
+        self.stop = len(order) if stop is None else stop
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __getitem__(self, position):
+        return self.key(self.order[self.start + position])
+
+
+class BinarySnapshot:
+    """A memory-mapped binary snapshot. Columns are views on the mapped file, not copies.
+
+    Opening reads only the header; pages are loaded when they are first touched and
+    are shared by every process mapping the same file. Ids and names are decoded on
+    access, and lookups by id or name are binary searches over the sorted order columns.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+        if bytes(view[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f"Not an org chart binary snapshot: {path}")
+        (header_length,) = struct.unpack_from("<I", view, len(MAGIC))
+        base = len(MAGIC) + 4 + header_length
+        self.header = json.loads(bytes(view[len(MAGIC) + 4:base]))
+        if self.header["byteorder"] != sys.byteorder:
+            raise ValueError(f"Snapshot written on a {self.header['byteorder']}-endian machine: {path}")
+        if self.header["labels"] != list(NODE_LABELS) or self.header["types"] != list(RELATIONSHIP_TYPES):
+            raise ValueError(f"Snapshot written with different labels or relationship types: {path}")
+        self._views = [view]
+        for name, typecode in SECTIONS.items():
+            offset, size = self.header["sections"][name]
+            column = view[base + offset:base + offset + size].cast(typecode)
+            self._views.append(column)
+            setattr(self, name, column)
+        self.node_count = self.header["nodes"]
+        self.relationship_count = self.header["relationships"]
+
+    def close(self):
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    # Strings and nodes
+
+    def string(self, number):
+        return bytes(self.string_data[self.string_offsets[number]:self.string_offsets[number + 1]]).decode("utf-8")
+
+    def node(self, node):
+        """Return (label, id, name) of a node number."""
+        return NODE_LABELS[self.node_label[node]], self.string(self.node_id[node]), self.string(self.node_name[node])
+
+    def find_id(self, node_id):
+        """Return the node number with the given id, or None."""
+        keys = _Keys(self.id_order, lambda node: self.string(self.node_id[node]))
+        position = bisect_left(keys, node_id)
+        if position < len(keys) and keys[position] == node_id:
+            return self.id_order[position]
+        return None
+
+    def find_name(self, label, name):
+        """Return the node number of the named entity of a label, or None."""
+        label_code = NODE_LABELS.index(label)
+        keys = _Keys(self.name_order, lambda node: self.string(self.node_name[node]),
+                     self.label_offsets[label_code], self.label_offsets[label_code + 1])
+        position = bisect_left(keys, name)
+        if position < len(keys) and keys[position] == name:
+            return self.name_order[keys.start + position]
+        return None
+
+    # Relationships
+
+    def relationship(self, rel):
+        """Return (type, source id, target id, start date, end date or None) of a relationship number."""
+        return (RELATIONSHIP_TYPES[self.rel_type[rel]],
+                self.string(self.node_id[self.rel_source[rel]]),
+                self.string(self.node_id[self.rel_target[rel]]),
+                from_ordinal(self.rel_start[rel]),
+                from_ordinal(self.rel_end[rel]))
+
+    def outgoing(self, node):
+        """Return the relationship numbers starting at a node."""
+        return self.out_rels[self.out_offsets[node]:self.out_offsets[node + 1]]
+
+    def incoming(self, node):
+        """Return the relationship numbers ending at a node."""
+        return self.in_rels[self.in_offsets[node]:self.in_offsets[node + 1]]
+
+    def nodes(self):
+        """Yield (label, id, name) for every node, like OrgGraph.nodes()."""
+        for node in range(self.node_count):
+            yield self.node(node)
+
+    def relationships(self):
+        """Yield every relationship like OrgGraph.relationships()."""
+        for rel in range(self.relationship_count):
+            yield self.relationship(rel)
+
+    def names(self):
+        """Return id -> name for every node (decodes every string)."""
+        return {self.string(self.node_id[node]): self.string(self.node_name[node]) for node in range(self.node_count)}
+
+
+# Producers
+
+def write_from_graph(graph, path):
+    """Write the state of an in-memory OrgGraph (org_engine.py)."""
+    return write_binary_snapshot(path, graph.nodes(), graph.relationships())
+
+
+def write_from_neo4j(driver: Neo4jInterface, path):
+    """Write every entity and relationship in the database, read with two streamed queries."""
+    nodes = (
+        (next(label for label in record["labels"] if label in NODE_LABELS), record["id"], record["name"])
+        for record in driver.stream_query("""
+        MATCH (n)
+        WHERE n:government OR n:minister OR n:department
+        RETURN labels(n) AS labels, n.id AS id, n.name AS name
+        """)
+    )
+    relationships = (
+        (record["type"], record["source"], record["target"], record["start_date"], record["end_date"])
+        for record in driver.stream_query("""
+        MATCH (a)-[r:HAS_MINISTER|HAS_DEPARTMENT|RENAMED_TO|MERGED_INTO]->(b)
+        RETURN type(r) AS type, a.id AS source, b.id AS target,
+               toString(coalesce(r.start_date, r.date)) AS start_date, toString(r.end_date) AS end_date
+        """)
+    )
+    return write_binary_snapshot(path, nodes, relationships)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write or inspect a binary org chart snapshot.")
+    parser.add_argument("path", help="Binary snapshot file")
+    parser.add_argument("--from-snapshot", metavar="DIR", help="Build from a gazette snapshot directory instead of the database")
+    parser.add_argument("--amendments", nargs="*", default=[], metavar="DIR",
+                        help="With --from-snapshot, amendment gazettes to replay on it first")
+    parser.add_argument("--write", action="store_true", help="Write the snapshot (otherwise only open it and print its size)")
+    args = parser.parse_args()
+
+    if args.write:
+        start = time.perf_counter()
+        if args.from_snapshot:
+            from orgchart.org_engine import OrgGraph
+            from orgchart.ingestion import read_amendments
+
+            graph = OrgGraph().load_snapshot(args.from_snapshot)
+            entity_counters = None
+            for amendment_dir in args.amendments:
+                entity_counters = graph.replay(read_amendments(amendment_dir), entity_counters)
+            stats = write_from_graph(graph, args.path)
+        else:
+            with Neo4jInterface() as neo4j_interface:
+                stats = write_from_neo4j(neo4j_interface, args.path)
+        print(f"Wrote {args.path} in {time.perf_counter() - start:.2f}s: {stats}")
+
+    start = time.perf_counter()
+    with BinarySnapshot(args.path) as snapshot:
+        elapsed = time.perf_counter() - start
+        print(f"Opened {args.path} in {elapsed * 1000:.2f}ms: "
+              f"{snapshot.node_count} node(s), {snapshot.relationship_count} relationship(s)")
@@ -0,0 +1,175 @@
+import argparse
+import csv
+import logging
+from collections import Counter
+from datetime import datetime
+import sys
+import os
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/../')
+
+from neo4j_util.neo4j_interface import Neo4jInterface
+from neo4j_util.metrics import configure_logging
+from orgchart.current_view import CURRENT_RELATIONSHIPS
+
+logger = logging.getLogger(__name__)
+
+# Gazette snapshot files converted to neo4j-admin import files.
+# Every id in a snapshot carries its type prefix (e.g. 2610/11_min_1), so one global ID space is enough.
+NODE_FILES = [
+    ("government", "government.csv"),
+    ("minister", "minister.csv"),
+    ("department", "department.csv"),
+]
+
+RELATIONSHIP_FILES = [
+    # (type, snapshot file, start id column, end id column)
+    ("HAS_MINISTER", "gov-min.csv", "gov_id", "min_id"),
+    ("HAS_DEPARTMENT", "min-dep.csv", "min_id", "dep_id"),
+]
+
+NODE_HEADER = ["id:ID", "name"]
+RELATIONSHIP_HEADER = [":START_ID", ":END_ID", "start_date:date", "end_date:date"]
+CURRENT_HEADER = [":START_ID", ":END_ID", "since:date"]
+
+
+def import_date(value):
+    """Convert a snapshot date cell to an ISO date, or an empty field (absent property) for -1."""
+    value = value.strip()
+    if value in ("-1", ""):
+        return ""
+    return datetime.strptime(value, "%Y-%m-%d").date().isoformat()
+
+
+def _write_header(path, header):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerow(header)
+
+
+def _convert(source, target, convert_row, keep_row=None):
+    """Stream rows from a snapshot CSV into an import CSV. Returns the number of rows written."""
+    count = 0
+    with open(source, newline="", encoding="utf-8-sig") as src, open(target, "w", newline="", encoding="utf-8") as dst:
+        writer = csv.writer(dst)
+        for row in csv.DictReader(src):
+            if keep_row is not None and not keep_row(row):
+                continue
+            writer.writerow(convert_row(row))
+            count += 1
+    return count
+
+
+def export_snapshot(snapshot_dir: str, output_dir: str):
+    """Convert a gazette snapshot directory into neo4j-admin import files.
+
+    Writes one header file and one data file per label and relationship type
+    into output_dir and returns the matching `neo4j-admin database import` arguments.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    arguments = []
+
+    for label, file_name in NODE_FILES:
+        header = os.path.join(output_dir, f"{label}-header.csv")
+        data = os.path.join(output_dir, f"{label}.csv")
+        _write_header(header, NODE_HEADER)
+        count = _convert(os.path.join(snapshot_dir, file_name), data,
+                         lambda row: [row["id"], row["name"]])
+        arguments.append(f"--nodes={label}={header},{data}")
+        logger.info("Exported %d %s node(s)", count, label)
+
+    for rel_type, file_name, start_column, end_column in RELATIONSHIP_FILES:
+        header = os.path.join(output_dir, f"{rel_type.lower()}-header.csv")
+        data = os.path.join(output_dir, f"{rel_type.lower()}.csv")
+        _write_header(header, RELATIONSHIP_HEADER)
+        count = _convert(os.path.join(snapshot_dir, file_name), data,
+                         lambda row: [row[start_column], row[end_column],
+                                      import_date(row["start_date"]), import_date(row["end_date"])])
+        arguments.append(f"--relationships={rel_type}={header},{data}")
+        logger.info("Exported %d %s relationship(s)", count, rel_type)
+
+        # The open relationships again, as the current view (see current_view.py)
+        current_type = CURRENT_RELATIONSHIPS[rel_type]
+        header = os.path.join(output_dir, f"{current_type.lower()}-header.csv")
+        data = os.path.join(output_dir, f"{current_type.lower()}.csv")
+        _write_header(header, CURRENT_HEADER)
+        count = _convert(os.path.join(snapshot_dir, file_name), data,
+                         lambda row: [row[start_column], row[end_column], import_date(row["start_date"])],
+                         keep_row=lambda row: import_date(row["end_date"]) == "")
+        arguments.append(f"--relationships={current_type}={header},{data}")
+        logger.info("Exported %d %s relationship(s)", count, current_type)
+
+    return arguments
+
+
+# Parity check against a database loaded through the Cypher loader (setup_db.py)
+
+def exported_fingerprint(output_dir: str):
+    """Count every node and relationship described by the exported import files."""
+    nodes = Counter()
+    relationships = Counter()
+    for label, _ in NODE_FILES:
+        with open(os.path.join(output_dir, f"{label}.csv"), newline="", encoding="utf-8") as f:
+            for node_id, name in csv.reader(f):
+                nodes[(label, node_id, name)] += 1
+    for rel_type, *_ in RELATIONSHIP_FILES:
+        with open(os.path.join(output_dir, f"{rel_type.lower()}.csv"), newline="", encoding="utf-8") as f:
+            for start_id, end_id, start_date, end_date in csv.reader(f):
+                relationships[(rel_type, start_id, end_id, start_date, end_date or None)] += 1
+    return nodes, relationships
+
+
+def database_fingerprint(driver: Neo4jInterface):
+    """Count every snapshot node and relationship currently in the database."""
+    nodes = Counter()
+    relationships = Counter()
+    for label, _ in NODE_FILES:
+        query = f"MATCH (n:{label}) RETURN n.id AS id, n.name AS name"
+        for record in driver.stream_query(query):
+            nodes[(label, record["id"], record["name"])] += 1
+    for rel_type, *_ in RELATIONSHIP_FILES:
+        query = f"""
+        MATCH (a)-[r:{rel_type}]->(b)
+        RETURN a.id AS start_id, b.id AS end_id, toString(r.start_date) AS start_date, toString(r.end_date) AS end_date
+        """
+        for record in driver.stream_query(query):
+            relationships[(rel_type, record["start_id"], record["end_id"], record["start_date"], record["end_date"])] += 1
+    return nodes, relationships
+
+
+def check_parity(driver: Neo4jInterface, output_dir: str, limit: int = 10):
+    """Compare the exported files with the graph built by the Cypher loader. Returns True when they match."""
+    matches = True
+    for kind, exported, loaded in zip(("node", "relationship"), exported_fingerprint(output_dir), database_fingerprint(driver)):
+        missing = exported - loaded
+        extra = loaded - exported
+        for item in list(missing)[:limit]:
+            logger.warning("Only in export: %s %s", kind, item)
+        for item in list(extra)[:limit]:
+            logger.warning("Only in database: %s %s", kind, item)
+        if missing or extra:
+            matches = False
+        logger.info("%s parity: %d only in export, %d only in database",
+                    kind.capitalize(), sum(missing.values()), sum(extra.values()))
+    return matches
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a gazette snapshot into neo4j-admin bulk import files.")
+    parser.add_argument("snapshot_dir", nargs="?", default="../data/2015-09-21", help="Gazette snapshot directory")
+    parser.add_argument("output_dir", nargs="?", default="../import", help="Directory for the import files")
+    parser.add_argument("--database", default="neo4j", help="Database name used in the printed import command")
+    parser.add_argument("--check-parity", action="store_true",
+                        help="Compare the export with a database loaded by setup_db.py from the same snapshot")
+    parser.add_argument("--log-level", default="INFO")
+    args = parser.parse_args()
+    configure_logging(args.log_level)
+
+    arguments = export_snapshot(args.snapshot_dir, args.output_dir)
+    print("Import with (server stopped, database empty):")
+    print("neo4j-admin database import full \\\n    " + " \\\n    ".join(arguments) + f" \\\n    {args.database}")
+    print("Then start the server and run `python schema.py` to create the constraints and indexes.")
+
+    if args.check_parity:
+        with Neo4jInterface() as neo4j_interface:
+            sys.exit(0 if check_parity(neo4j_interface, args.output_dir) else 1)
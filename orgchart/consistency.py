@@ -0,0 +1,133 @@
+import argparse
+import json
+import logging
+import time
+import sys
+import os
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/../')
+
+from neo4j_util.neo4j_interface import Neo4jInterface
+from neo4j_util.metrics import configure_logging
+from orgchart.current_view import rebuild_current_view
+
+logger = logging.getLogger(__name__)
+
+COLLAPSE_BATCH_SIZE = 10000
+
+# Every amendment commit records its gazette and the transaction_ids it applied on its
+# GazetteCommit node (see read_service.record_gazette_commit), whether or not the rows'
+# MERGEs created anything. transaction_ids are only unique within a gazette, so applied
+# rows are looked up by (gazette, transaction_id) through the GazetteCommit gazette index.
+APPLIED_QUERY = """
+MATCH (c:GazetteCommit {gazette: $gazette})
+UNWIND c.transaction_ids AS transaction_id
+WITH DISTINCT transaction_id
+WHERE transaction_id IN $transaction_ids
+RETURN transaction_id
+"""
+
+# Parallel relationships of a type between the same two entities are duplicates when
+# they share this date property
+DATE_PROPERTIES = {
+    "HAS_MINISTER": "start_date",
+    "HAS_DEPARTMENT": "start_date",
+    "RENAMED_TO": "date",
+    "MERGED_INTO": "date",
+}
+TEMPORAL_TYPES = ("HAS_MINISTER", "HAS_DEPARTMENT")
+
+
+def applied_transactions(driver: Neo4jInterface, gazette, transaction_ids):
+    """Return the subset of a gazette's transaction_ids that an earlier commit already applied."""
+    records = driver.execute_query(APPLIED_QUERY, {"gazette": gazette, "transaction_ids": sorted(set(transaction_ids))})
+    return {record["transaction_id"] for record in records}
+
+
+def _duplicates_query(rel_type):
+    return f"""
+    MATCH (a)-[r:{rel_type}]->(b)
+    WITH a, b, r.{DATE_PROPERTIES[rel_type]} AS day, count(r) AS copies
+    WHERE copies > 1
+    RETURN count(*) AS groups, coalesce(sum(copies - 1), 0) AS duplicates
+    """
+
+
+def _overlaps_query(rel_type):
+    # Open relationships between the same two entities that started on different dates
+    return f"""
+    MATCH (a)-[r:{rel_type}]->(b)
+    WHERE r.end_date IS NULL
+    WITH a, b, count(DISTINCT r.start_date) AS starts
+    WHERE starts > 1
+    RETURN count(*) AS pairs
+    """
+
+
+def _collapse_query(rel_type):
+    # Keep one relationship per group. A temporal one ends at the earliest end_date of
+    # the group (open only if every copy was open); the creating transaction_id is kept.
+    if rel_type in TEMPORAL_TYPES:
+        ending = """
+        WITH keep, extra, reduce(earliest = null, x IN rels |
+            CASE WHEN x.end_date IS NOT NULL AND (earliest IS NULL OR x.end_date < earliest.end_date) THEN x ELSE earliest END) AS ended
+        SET keep.end_date = ended.end_date, keep.end_transaction_id = ended.end_transaction_id
+        """
+    else:
+        ending = ""
+    return f"""
+    MATCH (a)-[r:{rel_type}]->(b)
+    WITH a, b, r.{DATE_PROPERTIES[rel_type]} AS day, collect(r) AS rels
+    WHERE size(rels) > 1
+    CALL {{
+        WITH rels
+        WITH rels, head(rels) AS keep, tail(rels) AS extra
+        SET keep.transaction_id = coalesce(keep.transaction_id,
+                                           head([x IN extra WHERE x.transaction_id IS NOT NULL | x.transaction_id]))
+        {ending}
+        FOREACH (x IN extra | DELETE x)
+    }} IN TRANSACTIONS OF {COLLAPSE_BATCH_SIZE} ROWS
+    """
+
+
+def check_consistency(driver: Neo4jInterface):
+    """Return {type: {groups, duplicates[, overlapping_open]}} for every relationship type."""
+    report = {}
+    for rel_type in DATE_PROPERTIES:
+        record = driver.execute_query(_duplicates_query(rel_type))[0]
+        report[rel_type] = {"groups": record["groups"], "duplicates": record["duplicates"]}
+        if rel_type in TEMPORAL_TYPES:
+            report[rel_type]["overlapping_open"] = driver.execute_query(_overlaps_query(rel_type))[0]["pairs"]
+    return report
+
+
+def collapse_duplicates(driver: Neo4jInterface):
+    """Collapse every group of duplicate relationships into one, then rebuild the current view. Returns the report found."""
+    start = time.perf_counter()
+    report = check_consistency(driver)
+    collapsed = False
+    for rel_type, counts in report.items():
+        if counts["duplicates"]:
+            driver.execute_query(_collapse_query(rel_type))
+            logger.info("Collapsed %d duplicate %s relationship(s) in %d group(s)",
+                        counts["duplicates"], rel_type, counts["groups"])
+            collapsed = True
+    if collapsed:
+        rebuild_current_view(driver)
+    logger.info("Consistency fix finished in %.2fs", time.perf_counter() - start)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find (and collapse) duplicate relationships in the org chart.")
+    parser.add_argument("--fix", action="store_true", help="Collapse every duplicate group into one relationship")
+    parser.add_argument("--log-level", default="INFO")
+    args = parser.parse_args()
+    configure_logging(args.log_level)
+
+    with Neo4jInterface() as neo4j_interface:
+        report = collapse_duplicates(neo4j_interface) if args.fix else check_consistency(neo4j_interface)
+    print(json.dumps(report, indent=2))
+    duplicates = sum(counts["duplicates"] for counts in report.values())
+    sys.exit(1 if duplicates and not args.fix else 0)
@@ -0,0 +1,165 @@
+import argparse
+import json
+import logging
+import time
+import sys
+import os
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/../')
+
+from neo4j_util.neo4j_interface import Neo4jInterface
+from neo4j_util.metrics import configure_logging
+from orgchart.ingestion import parse_name_list
+
+logger = logging.getLogger(__name__)
+
+# Every open (end_date IS NULL) relationship has a current counterpart without dates
+CURRENT_RELATIONSHIPS = {
+    "HAS_MINISTER": "HAS_CURRENT_MINISTER",
+    "HAS_DEPARTMENT": "HAS_CURRENT_DEPARTMENT",
+}
+
+REBUILD_BATCH_SIZE = 10000
+
+# Recompute the incoming current relationships of the named entities, and of every
+# department the named ministers hold before or after the change. `since` keeps the
+# start_date of the open relationship (the earliest one if there are several).
+REFRESH_QUERY = """
+CALL {
+    UNWIND $ministers AS name
+    MATCH (m:minister {name: name})
+    RETURN collect(m) AS ministers
+}
+CALL {
+    WITH ministers
+    UNWIND ministers AS m
+    MATCH (m)-[r:HAS_DEPARTMENT|HAS_CURRENT_DEPARTMENT]->(d:department)
+    WHERE r.end_date IS NULL
+    RETURN collect(d) AS held
+}
+CALL {
+    UNWIND $departments AS name
+    MATCH (d:department {name: name})
+    RETURN collect(d) AS named
+}
+UNWIND ministers + held + named AS n
+WITH DISTINCT n
+OPTIONAL MATCH (n)<-[stale:HAS_CURRENT_MINISTER|HAS_CURRENT_DEPARTMENT]-()
+DELETE stale
+WITH DISTINCT n
+MATCH (parent)-[r:HAS_MINISTER|HAS_DEPARTMENT]->(n)
+WHERE r.end_date IS NULL
+FOREACH (_ IN CASE WHEN type(r) = 'HAS_MINISTER' THEN [1] ELSE [] END |
+    MERGE (parent)-[c:HAS_CURRENT_MINISTER]->(n)
+    SET c.since = CASE WHEN c.since IS NULL OR r.start_date < c.since THEN r.start_date ELSE c.since END)
+FOREACH (_ IN CASE WHEN type(r) = 'HAS_DEPARTMENT' THEN [1] ELSE [] END |
+    MERGE (parent)-[c:HAS_CURRENT_DEPARTMENT]->(n)
+    SET c.since = CASE WHEN c.since IS NULL OR r.start_date < c.since THEN r.start_date ELSE c.since END)
+"""
+
+CLEAR_QUERY = f"""
+MATCH ()-[c:HAS_CURRENT_MINISTER|HAS_CURRENT_DEPARTMENT]->()
+CALL {{ WITH c DELETE c }} IN TRANSACTIONS OF {REBUILD_BATCH_SIZE} ROWS
+"""
+
+
+def _rebuild_query(rel_type):
+    return f"""
+    MATCH (parent)-[r:{rel_type}]->(child)
+    WHERE r.end_date IS NULL
+    CALL {{
+        WITH parent, r, child
+        MERGE (parent)-[c:{CURRENT_RELATIONSHIPS[rel_type]}]->(child)
+        SET c.since = CASE WHEN c.since IS NULL OR r.start_date < c.since THEN r.start_date ELSE c.since END
+    }} IN TRANSACTIONS OF {REBUILD_BATCH_SIZE} ROWS
+    """
+
+
+CURRENT_ORG_CHART_QUERY = """
+MATCH (g:government)
+OPTIONAL MATCH (g)-[:HAS_CURRENT_MINISTER]->(m:minister)
+OPTIONAL MATCH (m)-[:HAS_CURRENT_DEPARTMENT]->(d:department)
+RETURN g.id AS government_id, g.name AS government_name, m.id AS minister_id, m.name AS minister_name,
+       collect(CASE WHEN d IS NULL THEN NULL ELSE {id: d.id, name: d.name} END) AS departments
+"""
+
+
+def touched_entities(transaction):
+    """Return the (minister names, department names) whose parent relationships a transaction can change."""
+    ministers, departments = set(), set()
+    by_label = {"minister": ministers, "department": departments}
+    file_type = transaction["file_type"]
+    if file_type in ("Add", "Terminate"):
+        by_label.get(transaction["child_type"], set()).add(transaction["child"])
+    elif file_type == "Move":
+        departments.add(transaction["child"])
+    elif file_type == "Rename" and transaction["type"] == "minister":
+        ministers.update((transaction["old"], transaction["new"]))
+    elif file_type == "Merge" and transaction["type"] in by_label:
+        by_label[transaction["type"]].update(parse_name_list(transaction["old"]))
+        by_label[transaction["type"]].add(transaction["new"])
+    return ministers, departments
+
+
+def refresh_current(tx, ministers, departments):
+    """Bring the current relationships of the given entities in line with their open relationships."""
+    if not ministers and not departments:
+        return
+    result = tx.run(REFRESH_QUERY, ministers=sorted(ministers), departments=sorted(departments))
+    counters = result.consume().counters
+    logger.debug("Refreshed current view for %d minister(s), %d department(s): %d created, %d deleted",
+                 len(ministers), len(departments), counters.relationships_created, counters.relationships_deleted)
+
+
+def refresh_for_transactions(tx, transactions):
+    """Refresh the current view for every entity a list of transactions touches, in one statement."""
+    ministers, departments = set(), set()
+    for transaction in transactions:
+        touched_ministers, touched_departments = touched_entities(transaction)
+        ministers |= touched_ministers
+        departments |= touched_departments
+    refresh_current(tx, ministers, departments)
+
+
+def rebuild_current_view(driver: Neo4jInterface):
+    """Drop and recreate every current relationship from the open relationships (after a snapshot load)."""
+    start = time.perf_counter()
+    driver.execute_query(CLEAR_QUERY)
+    for rel_type in CURRENT_RELATIONSHIPS:
+        driver.execute_query(_rebuild_query(rel_type))
+    logger.info("Current view rebuilt in %.2fs", time.perf_counter() - start)
+
+
+def current_org_chart(driver: Neo4jInterface):
+    """Return today's government -> minister -> department tree, following current relationships only."""
+    governments = {}
+    for record in driver.stream_query(CURRENT_ORG_CHART_QUERY):
+        government = governments.setdefault(record["government_id"], {
+            "id": record["government_id"], "name": record["government_name"], "ministers": []})
+        if record["minister_id"] is None:
+            continue
+        government["ministers"].append({
+            "id": record["minister_id"],
+            "name": record["minister_name"],
+            "departments": sorted(record["departments"], key=lambda department: department["id"]),
+        })
+    tree = []
+    for government_id in sorted(governments):
+        government = governments[government_id]
+        government["ministers"].sort(key=lambda minister: minister["id"])
+        tree.append(government)
+    return tree
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Print today's org chart from the current view.")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the current view from the open relationships first")
+    parser.add_argument("--log-level", default="INFO")
+    args = parser.parse_args()
+    configure_logging(args.log_level)
+
+    with Neo4jInterface() as neo4j_interface:
+        if args.rebuild:
+            rebuild_current_view(neo4j_interface)
+        print(json.dumps(current_org_chart(neo4j_interface), indent=2))
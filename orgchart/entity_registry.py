@@ -0,0 +1,96 @@
+import logging
+import re
+from collections import OrderedDict
+import sys
+import os
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/../')
+
+from neo4j_util.neo4j_interface import Neo4jInterface
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CAPACITY = 100000
+
+# Generated ids look like <gazette>_<type prefix>_<number>, e.g. 2611/11_min_4
+ID_PATTERN = re.compile(r"^(.+)_(\d+)$")
+
+ENTITY_LABELS = ("government", "minister", "department")
+
+
+class EntityRegistry:
+    """Name -> id lookups and id allocation for the amendment handlers.
+
+    All entity names and the highest number used under every id prefix are
+    bulk-loaded once per run. Lookups are served from a bounded LRU cache
+    (misses fall back to one indexed query), and handlers register the
+    entities they create so the cache stays coherent within the run.
+    """
+
+    def __init__(self, driver: Neo4jInterface, capacity: int = DEFAULT_CAPACITY):
+        self.driver = driver
+        self.capacity = capacity
+        self._cache = OrderedDict()  # (label, name) -> id, or None for a known miss
+        self.max_ids = {}            # id prefix -> highest number in use
+        self.hits = 0
+        self.misses = 0
+
+    def _remember(self, key, entity_id):
+        self._cache[key] = entity_id
+        self._cache.move_to_end(key)
+        if len(self._cache) > self.capacity:
+            self._cache.popitem(last=False)
+
+    def _track_id(self, entity_id):
+        match = ID_PATTERN.match(entity_id or "")
+        if match:
+            prefix, number = match.group(1), int(match.group(2))
+            if number > self.max_ids.get(prefix, 0):
+                self.max_ids[prefix] = number
+
+    def load(self):
+        """Bulk-load every entity's label, id and name in one streamed query."""
+        query = """
+        MATCH (n)
+        WHERE n:government OR n:minister OR n:department
+        RETURN labels(n) AS labels, n.id AS id, n.name AS name
+        """
+        count = 0
+        for record in self.driver.stream_query(query):
+            self._track_id(record["id"])
+            for label in record["labels"]:
+                if label in ENTITY_LABELS:
+                    self._remember((label, record["name"]), record["id"])
+            count += 1
+        logger.info("Entity registry loaded %s entities, %d id prefix(es)", count, len(self.max_ids))
+        return self
+
+    def lookup(self, label, name):
+        """Return the id of the named entity, or None if it does not exist."""
+        key = (label, name)
+        if key in self._cache:
+            self.hits += 1
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        self.misses += 1
+        if label not in ENTITY_LABELS:
+            raise ValueError(f"Unknown label: {label}")
+        # Runs in the open transaction when there is one, so it sees uncommitted entities
+        records = self.driver.execute_query(f"MATCH (n:{label} {{name: $name}}) RETURN n.id AS id", {"name": name})
+        entity_id = records[0]["id"] if records else None
+        self._remember(key, entity_id)
+        return entity_id
+
+    def register(self, label, name, entity_id):
+        """Record an entity created (or matched) by a handler."""
+        self._remember((label, name), entity_id)
+        self._track_id(entity_id)
+
+    def counters(self, transaction_id):
+        """Return entity_counters seeded with the highest ids already used by the gazette of transaction_id."""
+        gazette = transaction_id[:7]
+        return {
+            "minister": self.max_ids.get(f"{gazette}_min", 0),
+            "department": self.max_ids.get(f"{gazette}_dep", 0)
+        }
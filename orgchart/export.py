@@ -0,0 +1,245 @@
+import argparse
+import csv
+import itertools
+import json
+import logging
+import time
+from xml.sax.saxutils import escape, quoteattr
+import sys
+import os
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/../')
+
+from neo4j_util.neo4j_interface import Neo4jInterface
+from neo4j_util.metrics import configure_logging
+
+logger = logging.getLogger(__name__)
+
+NODE_LABELS = ("government", "minister", "department")
+
+# Snapshot files (same layout as data/2015-09-21), so CSV exports load with setup_db.py
+SNAPSHOT_NODE_FILES = {"government": "government.csv", "minister": "minister.csv", "department": "department.csv"}
+SNAPSHOT_RELATIONSHIP_FILES = {
+    "HAS_MINISTER": ("gov-min.csv", ["gov_id", "min_id", "start_date", "end_date", "active"]),
+    "HAS_DEPARTMENT": ("min-dep.csv", ["min_id", "dep_id", "start_date", "end_date", "active"]),
+}
+TEMPORAL_TYPES = ("HAS_MINISTER", "HAS_DEPARTMENT")
+LINEAGE_TYPES = ("RENAMED_TO", "MERGED_INTO")
+
+FORMATS = ("jsonl", "csv", "graphml")
+
+# A relationship is active on a day from its start_date up to, but not including, its end_date
+ACTIVE_ON_DAY = "r.start_date <= date($day) AND (r.end_date IS NULL OR r.end_date > date($day))"
+
+
+# Sources: generators over streamed records, pulled fetch_size records per round trip
+
+def _identified(records, kind, columns):
+    # Entities created without an id cannot be referenced by the sinks (GraphML needs one, a snapshot loads
+    # back on it); they and their relationships are left out and counted
+    skipped = 0
+    for record in records:
+        if any(record[column] is None for column in columns):
+            skipped += 1
+            continue
+        yield record
+    if skipped:
+        logger.warning("Skipped %d %s record(s) without an id", skipped, kind)
+
+
+def nodes(driver: Neo4jInterface, day=None):
+    """Yield {label, id, name} for every entity, or only those with an active relationship on day.
+
+    Entities without an id are skipped (and counted in a warning).
+    """
+    for label in NODE_LABELS:
+        if day is None or label == "government":
+            query = f"MATCH (n:{label}) RETURN n.id AS id, n.name AS name"
+        else:
+            query = f"""
+            MATCH (n:{label})
+            WHERE EXISTS {{
+                MATCH (n)-[r:HAS_MINISTER|HAS_DEPARTMENT]-()
+                WHERE {ACTIVE_ON_DAY}
+            }}
+            RETURN n.id AS id, n.name AS name
+            """
+        for record in _identified(driver.stream_query(query, {"day": day}), label, ("id",)):
+            yield {"label": label, "id": record["id"], "name": record["name"]}
+
+
+def relationships(driver: Neo4jInterface, day=None):
+    """Yield {type, start_id, end_id, start_date, end_date} for every relationship.
+
+    As of a day, only the HAS_MINISTER/HAS_DEPARTMENT relationships active on it are
+    yielded, with no end_date (they had not ended yet). RENAMED_TO/MERGED_INTO carry
+    their `date` as start_date. Relationships of an entity without an id are skipped, as in nodes().
+    """
+    for rel_type in TEMPORAL_TYPES:
+        where = f"WHERE {ACTIVE_ON_DAY}" if day is not None else ""
+        query = f"""
+        MATCH (a)-[r:{rel_type}]->(b)
+        {where}
+        RETURN a.id AS start_id, b.id AS end_id, toString(r.start_date) AS start_date, toString(r.end_date) AS end_date
+        """
+        for record in _identified(driver.stream_query(query, {"day": day}), rel_type, ("start_id", "end_id")):
+            yield {"type": rel_type, "start_id": record["start_id"], "end_id": record["end_id"],
+                   "start_date": record["start_date"], "end_date": record["end_date"] if day is None else None}
+    if day is not None:
+        return
+    for rel_type in LINEAGE_TYPES:
+        query = f"""
+        MATCH (a)-[r:{rel_type}]->(b)
+        RETURN a.id AS start_id, b.id AS end_id, toString(r.date) AS start_date
+        """
+        for record in _identified(driver.stream_query(query), rel_type, ("start_id", "end_id")):
+            yield {"type": rel_type, "start_id": record["start_id"], "end_id": record["end_id"],
+                   "start_date": record["start_date"], "end_date": None}
+
+
+def tree(driver: Neo4jInterface, day):
+    """Yield one {government, minister, departments} entry per minister active on day.
+
+    Departments are grouped per minister on the server, so the client holds one minister at a time.
+    """
+    query = """
+    MATCH (g:government)-[r:HAS_MINISTER]->(m:minister)
+    WHERE r.start_date <= date($day) AND (r.end_date IS NULL OR r.end_date > date($day))
+    OPTIONAL MATCH (m)-[rd:HAS_DEPARTMENT]->(d:department)
+    WHERE rd.start_date <= date($day) AND (rd.end_date IS NULL OR rd.end_date > date($day))
+    RETURN g.id AS government_id, g.name AS government_name, m.id AS minister_id, m.name AS minister_name,
+           collect(CASE WHEN d IS NULL THEN NULL ELSE {id: d.id, name: d.name} END) AS departments
+    """
+    for record in driver.stream_query(query, {"day": day}):
+        yield {
+            "government": {"id": record["government_id"], "name": record["government_name"]},
+            "minister": {"id": record["minister_id"], "name": record["minister_name"]},
+            "departments": record["departments"],
+        }
+
+
+# Sinks: write records as they arrive
+
+def write_jsonl(records, f):
+    """Write one JSON object per line. Returns the number of lines written."""
+    count = 0
+    for record in records:
+        f.write(json.dumps(record, ensure_ascii=False))
+        f.write("\n")
+        count += 1
+    return count
+
+
+GRAPHML_KEYS = [
+    ("label", "node", "string"),
+    ("name", "node", "string"),
+    ("type", "edge", "string"),
+    ("start_date", "edge", "string"),
+    ("end_date", "edge", "string"),
+]
+
+
+def _graphml_data(record, keys):
+    return "".join(f'<data key="{key}">{escape(str(record[key]))}</data>'
+                   for key in keys if record.get(key) is not None)
+
+
+def write_graphml(node_records, relationship_records, f):
+    """Write nodes then edges as GraphML. Returns (nodes, edges) written."""
+    f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+    f.write('<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n')
+    for key, domain, key_type in GRAPHML_KEYS:
+        f.write(f'  <key id="{key}" for="{domain}" attr.name="{key}" attr.type="{key_type}"/>\n')
+    f.write('  <graph id="orgchart" edgedefault="directed">\n')
+    node_count = 0
+    for record in node_records:
+        f.write(f'    <node id={quoteattr(record["id"])}>{_graphml_data(record, ("label", "name"))}</node>\n')
+        node_count += 1
+    edge_count = 0
+    for record in relationship_records:
+        f.write(f'    <edge source={quoteattr(record["start_id"])} target={quoteattr(record["end_id"])}>'
+                f'{_graphml_data(record, ("type", "start_date", "end_date"))}</edge>\n')
+        edge_count += 1
+    f.write('  </graph>\n</graphml>\n')
+    return node_count, edge_count
+
+
+def write_snapshot(node_records, relationship_records, output_dir):
+    """Write records as a snapshot directory (government/minister/department.csv, gov-min.csv, min-dep.csv).
+
+    Open relationships get the -1 end date and active TRUE, as in the gazette snapshots.
+    RENAMED_TO/MERGED_INTO are not part of the snapshot layout and are skipped.
+    Returns the number of rows written per file.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    files = {}
+    writers = {}
+    counts = {}
+    try:
+        for label, file_name in SNAPSHOT_NODE_FILES.items():
+            files[label] = open(os.path.join(output_dir, file_name), "w", newline="", encoding="utf-8")
+            writers[label] = csv.writer(files[label])
+            writers[label].writerow(["id", "name"])
+            counts[file_name] = 0
+        for rel_type, (file_name, columns) in SNAPSHOT_RELATIONSHIP_FILES.items():
+            files[rel_type] = open(os.path.join(output_dir, file_name), "w", newline="", encoding="utf-8")
+            writers[rel_type] = csv.writer(files[rel_type])
+            writers[rel_type].writerow(columns)
+            counts[file_name] = 0
+
+        for record in node_records:
+            writers[record["label"]].writerow([record["id"], record["name"]])
+            counts[SNAPSHOT_NODE_FILES[record["label"]]] += 1
+        for record in relationship_records:
+            if record["type"] not in SNAPSHOT_RELATIONSHIP_FILES:
+                continue
+            end_date = record["end_date"]
+            writers[record["type"]].writerow([record["start_id"], record["end_id"], record["start_date"],
+                                              end_date or "-1", "TRUE" if end_date is None else "FALSE"])
+            counts[SNAPSHOT_RELATIONSHIP_FILES[record["type"]][0]] += 1
+    finally:
+        for f in files.values():
+            f.close()
+    return counts
+
+
+def export(driver: Neo4jInterface, output, output_format="jsonl", day=None, as_tree=False):
+    """Stream the org chart (the full temporal graph, or as of day) to output in the given format.
+
+    jsonl and graphml write to the file `output`; csv writes a snapshot directory `output`.
+    With as_tree=True (jsonl only) one line per active minister is written instead of nodes and edges.
+    """
+    if output_format not in FORMATS:
+        raise ValueError(f"Unknown export format: {output_format}")
+    if as_tree and (output_format != "jsonl" or day is None):
+        raise ValueError("The tree export is JSON Lines as of a date")
+    start = time.perf_counter()
+    if output_format == "csv":
+        result = write_snapshot(nodes(driver, day), relationships(driver, day), output)
+    else:
+        with open(output, "w", encoding="utf-8") as f:
+            if as_tree:
+                result = write_jsonl(tree(driver, day), f)
+            elif output_format == "jsonl":
+                result = write_jsonl(itertools.chain(({"kind": "node", **record} for record in nodes(driver, day)),
+                                            ({"kind": "relationship", **record} for record in relationships(driver, day))), f)
+            else:
+                result = write_graphml(nodes(driver, day), relationships(driver, day), f)
+    logger.info("Exported %s to %s in %.2fs: %s", "as of " + day if day else "the full graph",
+                output, time.perf_counter() - start, result)
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream the org chart to JSON Lines, a snapshot CSV directory or GraphML.")
+    parser.add_argument("output", help="Output file (jsonl, graphml) or directory (csv)")
+    parser.add_argument("--format", choices=FORMATS, default="jsonl")
+    parser.add_argument("--as-of", help="Only what was active on this date (YYYY-MM-DD); default the full temporal graph")
+    parser.add_argument("--tree", action="store_true", help="With --as-of and jsonl: one line per minister with its departments")
+    parser.add_argument("--log-level", default="INFO")
+    args = parser.parse_args()
+    configure_logging(args.log_level)
+
+    with Neo4jInterface() as neo4j_interface:
+        export(neo4j_interface, args.output, args.format, args.as_of, args.tree)
@@ -0,0 +1,154 @@
+import ast
+import csv
+import json
+from datetime import date, datetime
+from functools import lru_cache
+import sys
+import os
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/../')
+
+from neo4j_util.neo4j_interface import batched, DEFAULT_BATCH_SIZE
+
+# End date cells that mean "still active"
+MISSING_DATES = ("-1", "")
+
+AMENDMENT_FILES = {
+    "Rename": "RENAME.csv",
+    "Move": "MOVE.csv",
+    "Add": "ADD.csv",
+    "Terminate": "TERMINATE.csv",
+    "Merge": "MERGE.csv"
+}
+
+# Column layout of each amendment file, as read_amendment_file reads them
+AMENDMENT_COLUMNS = {
+    "Rename": (AMENDMENT_FILES["Rename"], ["transaction_id", "old", "new", "type", "date"]),
+    "Move": (AMENDMENT_FILES["Move"], ["transaction_id", "old_parent", "new_parent", "child", "type", "date"]),
+    "Add": (AMENDMENT_FILES["Add"], ["transaction_id", "parent", "parent_type", "child", "child_type", "rel_type", "date"]),
+    "Terminate": (AMENDMENT_FILES["Terminate"], ["transaction_id", "parent", "parent_type", "child", "child_type", "rel_type", "date"]),
+    "Merge": (AMENDMENT_FILES["Merge"], ["transaction_id", "old", "new", "type", "date"]),
+}
+
+# Every snapshot column is read as text: ids and names must not be coerced
+# (a name like "NA" is not a missing value) and dates are converted explicitly
+NODE_DTYPES = {"id": str, "name": str}
+RELATIONSHIP_DTYPES = {"start_date": str, "end_date": str, "active": str}
+
+
+def _pandas():
+    # Imported on first use: the amendment path reads small files with the csv module and never needs it
+    import pandas as pd
+    return pd
+
+
+@lru_cache(maxsize=4096)
+def _parse_iso(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        # Unpadded dates such as 2015-1-5
+        return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def parse_date(value):
+    """Return a date for a date or ISO date string, or None for the -1 end date marker.
+
+    Gazette rows repeat the same few dates, so parsed strings are cached.
+    """
+    if isinstance(value, date):
+        return value
+    value = str(value).strip()
+    if value in MISSING_DATES:
+        return None
+    return _parse_iso(value)
+
+
+def iso_date(value):
+    """Return the ISO string of a date cell, or None for the -1 end date marker."""
+    parsed = parse_date(value)
+    return parsed.isoformat() if parsed is not None else None
+
+
+def parse_name_list(value):
+    """Parse a list column such as MERGE.csv's `old` (["a","b"]) without eval.
+
+    The gazettes write JSON lists; Python literals with single quotes are accepted as well.
+    """
+    if not isinstance(value, str):
+        return list(value)
+    try:
+        names = json.loads(value)
+    except ValueError:
+        names = ast.literal_eval(value)
+    if not isinstance(names, (list, tuple)):
+        raise ValueError(f"Expected a list of names, got: {value!r}")
+    return list(names)
+
+
+# Snapshots: read once, column-oriented
+
+def read_table(path, dtypes):
+    """Read a snapshot CSV with every column as text and no NA inference."""
+    pd = _pandas()
+    return pd.read_csv(path, dtype=dtypes, keep_default_na=False, na_filter=False, encoding="utf-8-sig")
+
+
+def iso_date_column(values):
+    """Convert a column of date cells to ISO strings (None for -1) in one vectorized pass.
+
+    Each distinct cell is parsed once and the results are gathered back by position,
+    so a million rows that share a handful of dates cost a handful of parses.
+    """
+    pd = _pandas()
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object).str.strip())
+    uniques = pd.Series(uniques, dtype=object)
+    missing = uniques.isin(MISSING_DATES)
+    parsed = pd.to_datetime(uniques.where(~missing), format="%Y-%m-%d")
+    converted = parsed.dt.strftime("%Y-%m-%d").astype(object).where(~missing, None)
+    return converted.to_numpy()[codes].tolist()
+
+
+def node_rows(path):
+    """Return the {id, name} rows of a node file."""
+    table = read_table(path, NODE_DTYPES)
+    return [{"id": node_id, "name": name} for node_id, name in zip(table["id"].tolist(), table["name"].tolist())]
+
+
+def relationship_rows(path, start_column, end_column):
+    """Return the rows of a relationship file with ISO date strings (end_date None for -1)."""
+    table = read_table(path, dict(RELATIONSHIP_DTYPES, **{start_column: str, end_column: str}))
+    return [
+        {start_column: start, end_column: end, "start_date": start_date, "end_date": end_date}
+        for start, end, start_date, end_date in zip(
+            table[start_column].tolist(), table[end_column].tolist(),
+            iso_date_column(table["start_date"]), iso_date_column(table["end_date"]))
+    ]
+
+
+def parameter_batches(rows, batch_size=DEFAULT_BATCH_SIZE):
+    """Yield lists of rows ready to send as the $rows parameter of an UNWIND statement."""
+    return batched(rows, batch_size)
+
+
+# Amendments: small files, read with the csv module
+
+def read_amendment_file(path, file_type):
+    """Return the rows of one amendment file, tagged with their file_type."""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        rows = [row for row in csv.DictReader(f) if row.get("transaction_id")]
+    for row in rows:
+        row["file_type"] = file_type
+    return rows
+
+
+def read_amendments(folder):
+    """Return every transaction of an amendment gazette, sorted by transaction_id."""
+    transactions = []
+    for file_type, file_name in AMENDMENT_FILES.items():
+        path = os.path.join(folder, file_name)
+        if os.path.exists(path):
+            transactions.extend(read_amendment_file(path, file_type))
+    transactions.sort(key=lambda transaction: transaction["transaction_id"])
+    return transactions
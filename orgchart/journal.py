@@ -0,0 +1,119 @@
+import json
+import logging
+from datetime import datetime, timezone
+import sys
+import os
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/../')
+
+from neo4j_util.neo4j_interface import Neo4jInterface
+
+logger = logging.getLogger(__name__)
+
+PREPARED = "prepared"
+COMMITTED = "committed"
+FAILED = "failed"
+
+# Journals are kept out of the gazette directories under data/ (see .gitignore)
+DEFAULT_JOURNAL_DIR = os.path.join("..", "journals")
+
+CHECKPOINT_QUERY = """
+MERGE (c:IngestCheckpoint {pipeline: $pipeline})
+SET c.transaction_id = $transaction_id, c.complete = false, c.updated_at = datetime()
+"""
+
+
+def default_journal_path(gazette):
+    """Return the journal path of a gazette (by directory name) when none is given."""
+    return os.path.join(DEFAULT_JOURNAL_DIR, f"{gazette}.jsonl")
+
+
+class CommitJournal:
+    """Append-only JSON Lines journal of the chunks of a gazette applied in chunked mode.
+
+    Each chunk is journaled as `prepared` before its transaction commits and as
+    `committed` (with the entity counters after it) once it has. Every line is
+    fsynced. The chunk transaction also stores its last transaction_id in an
+    IngestCheckpoint node, so a chunk left `prepared` by a crash between the commit
+    and the journal write is resolved against the database on resume.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.pipeline = f"journal:{os.path.abspath(path)}"
+
+    def entries(self):
+        """Return every complete journal entry; a line torn by a crash is ignored."""
+        if not os.path.exists(self.path):
+            return []
+        entries = []
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    logger.warning("Ignoring incomplete journal line in %s", self.path)
+        return entries
+
+    def append(self, status, first_transaction_id, last_transaction_id, rows, entity_counters=None, error=None):
+        entry = {
+            "status": status,
+            "first_transaction_id": first_transaction_id,
+            "last_transaction_id": last_transaction_id,
+            "rows": rows,
+            "entity_counters": dict(entity_counters) if entity_counters is not None else None,
+            "at": datetime.now(timezone.utc).isoformat(),
+        }
+        if error is not None:
+            entry["error"] = error
+        line = json.dumps(entry) + "\n"
+        if self._torn():
+            line = "\n" + line  # keep a line torn by a crash from swallowing this one
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        return entry
+
+    def _torn(self):
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return False
+        with open(self.path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) != b"\n"
+
+    def record_checkpoint(self, tx, transaction_id):
+        """Store the chunk's last transaction_id in the chunk's own transaction."""
+        tx.run(CHECKPOINT_QUERY, pipeline=self.pipeline, transaction_id=transaction_id).consume()
+
+    def resume_point(self, driver: Neo4jInterface):
+        """Return (last committed transaction_id or None, entity counters after it or None).
+
+        A trailing `prepared` chunk is checked against the database checkpoint and
+        journaled as committed if its transaction did commit.
+        """
+        last_committed = None
+        pending = None
+        for entry in self.entries():
+            if entry["status"] == COMMITTED:
+                last_committed = entry
+                pending = None
+            elif entry["status"] == PREPARED:
+                pending = entry
+            else:
+                pending = None
+        if pending is not None:
+            records = driver.execute_query(
+                "MATCH (c:IngestCheckpoint {pipeline: $pipeline}) RETURN c.transaction_id AS transaction_id",
+                {"pipeline": self.pipeline})
+            stored = records[0]["transaction_id"] if records else None
+            if stored is not None and stored >= pending["last_transaction_id"]:
+                logger.info("Chunk %s..%s committed before the journal was updated; recording it",
+                            pending["first_transaction_id"], pending["last_transaction_id"])
+                last_committed = self.append(COMMITTED, pending["first_transaction_id"],
+                                             pending["last_transaction_id"], pending["rows"])
+        if last_committed is None:
+            return None, None
+        return last_committed["last_transaction_id"], last_committed["entity_counters"]
@@ -0,0 +1,199 @@
+import argparse
+import json
+import logging
+import time
+import sys
+import os
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/../')
+
+from neo4j_util.neo4j_interface import Neo4jInterface, DEFAULT_BATCH_SIZE
+from neo4j_util.metrics import configure_logging
+from orgchart.org_engine import NODE_LABELS as ENGINE_LABELS, RELATIONSHIP_TYPES as ENGINE_TYPES, from_ordinal
+
+logger = logging.getLogger(__name__)
+
+LINEAGE_TYPES = ("RENAMED_TO", "MERGED_INTO")
+LINEAGE_LABELS = ("minister", "department")
+
+# Lineage closure, kept as node properties: every entity that was renamed or merged away
+# carries `successor_id` (the id of the entity it lives on as today, following the whole
+# chain) and `succeeded_on` (the date of its own rename or merge). Active entities have neither.
+
+
+def _record_query(label):
+    # Folds old, and everything already folded into old, into new. An entity that is
+    # renamed or merged into again (a reused name) becomes active again.
+    return f"""
+    UNWIND $rows AS row
+    MATCH (old:{label} {{name: row.old}}), (new:{label} {{name: row.new}})
+    WHERE old <> new
+    CALL {{
+        WITH old, new
+        MATCH (n:{label} {{successor_id: old.id}})
+        SET n.successor_id = new.id
+    }}
+    SET old.successor_id = new.id, old.succeeded_on = date(row.date)
+    REMOVE new.successor_id, new.succeeded_on
+    """
+
+
+RECORD_QUERIES = {label: _record_query(label) for label in LINEAGE_LABELS}
+
+
+def record_lineage(tx, label, rows):
+    """Update the lineage closure for rows of {old, new, date} names, in the caller's transaction."""
+    if not rows:
+        return
+    result = tx.run(RECORD_QUERIES[label], rows=rows)
+    logger.debug("Recorded %d %s lineage step(s), Result: %d property(ies) set",
+                 len(rows), label, result.consume().counters.properties_set)
+
+
+# Lookups: one indexed query each, no traversal of the RENAMED_TO/MERGED_INTO chains
+
+def successor(driver: Neo4jInterface, label, entity_id):
+    """Return {id, name} of the entity an entity lives on as today (itself when still active), or None."""
+    query = f"""
+    MATCH (n:{label} {{id: $id}})
+    OPTIONAL MATCH (s:{label} {{id: n.successor_id}})
+    RETURN coalesce(s.id, n.id) AS id, coalesce(s.name, n.name) AS name
+    """
+    records = driver.execute_query(query, {"id": entity_id})
+    return {"id": records[0]["id"], "name": records[0]["name"]} if records else None
+
+
+def predecessors(driver: Neo4jInterface, label, entity_id):
+    """Return [{id, name, succeeded_on}] of every entity ever renamed or merged into an entity, oldest first."""
+    query = f"""
+    MATCH (n:{label} {{successor_id: $id}})
+    RETURN n.id AS id, n.name AS name, toString(n.succeeded_on) AS succeeded_on
+    ORDER BY succeeded_on, id
+    """
+    return [dict(record) for record in driver.execute_query(query, {"id": entity_id})]
+
+
+class LineageIndex:
+    """In-memory lineage closure with the same semantics as the node properties.
+
+    `successors` maps every folded entity straight to its current successor and
+    `members` maps each successor to the set folded into it, so resolution is a
+    dict lookup. Recording a step relabels the folded set of the old entity.
+    """
+
+    def __init__(self):
+        self.successors = {}    # entity id -> current successor id
+        self.members = {}       # current successor id -> ids folded into it
+        self.succeeded_on = {}  # entity id -> date of its own rename or merge
+        self.labels = {}        # entity id -> label
+
+    def _reactivate(self, entity_id):
+        root = self.successors.pop(entity_id, None)
+        if root is not None:
+            self.members[root].discard(entity_id)
+            self.succeeded_on.pop(entity_id, None)
+
+    def record(self, old, new, day, label=None):
+        """Record that old was renamed or merged into new on day (ids)."""
+        if old == new:
+            return
+        self._reactivate(new)
+        folded = self.members.pop(old, set())
+        folded.add(old)
+        folded.discard(new)
+        for entity_id in folded:
+            self.successors[entity_id] = new
+        self.members.setdefault(new, set()).update(folded)
+        self.succeeded_on[old] = day
+        if label is not None:
+            self.labels[old] = self.labels[new] = label
+
+    def current(self, entity_id):
+        """Return the id an entity lives on as today (itself when still active)."""
+        return self.successors.get(entity_id, entity_id)
+
+    def predecessors(self, entity_id):
+        """Return [(id, succeeded_on)] of every entity folded into entity_id, oldest first."""
+        return sorted(((member, self.succeeded_on.get(member)) for member in self.members.get(entity_id, ())),
+                      key=lambda item: (str(item[1]), item[0]))
+
+    @classmethod
+    def from_steps(cls, steps):
+        """Build from (label, old id, new id, date) steps in the order they were applied."""
+        index = cls()
+        for label, old, new, day in steps:
+            index.record(old, new, day, label)
+        return index
+
+    @classmethod
+    def from_neo4j(cls, driver: Neo4jInterface):
+        """Build from the RENAMED_TO/MERGED_INTO relationships in the database, in the order they were applied.
+
+        Steps on the same day (A renamed to B, then B to C) are ordered by the
+        transaction_id of the row that created them, the order gazettes apply in.
+        """
+        query = """
+        MATCH (old)-[r:RENAMED_TO|MERGED_INTO]->(new)
+        RETURN labels(old) AS labels, old.id AS old, new.id AS new, r.date AS date
+        ORDER BY r.date, r.transaction_id
+        """
+        return cls.from_steps(
+            (next((label for label in record["labels"] if label in LINEAGE_LABELS), None),
+             record["old"], record["new"], record["date"].to_native())
+            for record in driver.stream_query(query))
+
+    @classmethod
+    def from_graph(cls, graph):
+        """Build from an in-memory OrgGraph (see org_engine.py), in relationship creation order."""
+        lineage_codes = {code for code, rel_type in enumerate(ENGINE_TYPES) if rel_type in LINEAGE_TYPES}
+        return cls.from_steps(
+            (ENGINE_LABELS[graph.node_label[graph.rel_source[rel]]],
+             graph.node_id[graph.rel_source[rel]], graph.node_id[graph.rel_target[rel]],
+             from_ordinal(graph.rel_start_date[rel]))
+            for rel in range(len(graph.rel_type)) if graph.rel_type[rel] in lineage_codes)
+
+    def rows(self, label):
+        """Yield {id, successor_id, succeeded_on} property rows for the folded entities of a label."""
+        for entity_id, successor_id in self.successors.items():
+            if self.labels.get(entity_id) == label:
+                day = self.succeeded_on.get(entity_id)
+                yield {"id": entity_id, "successor_id": successor_id,
+                       "succeeded_on": day.isoformat() if day is not None else None}
+
+
+def rebuild_lineage(driver: Neo4jInterface, batch_size=DEFAULT_BATCH_SIZE):
+    """Recompute the lineage properties of every entity from the RENAMED_TO/MERGED_INTO relationships."""
+    start = time.perf_counter()
+    index = LineageIndex.from_neo4j(driver)
+    for label in LINEAGE_LABELS:
+        driver.execute_query(f"""
+        MATCH (n:{label})
+        WHERE n.successor_id IS NOT NULL
+        REMOVE n.successor_id, n.succeeded_on
+        """)
+        driver.execute_many(f"""
+        UNWIND $rows AS row
+        MATCH (n:{label} {{id: row.id}})
+        SET n.successor_id = row.successor_id, n.succeeded_on = date(row.succeeded_on)
+        """, list(index.rows(label)), batch_size)
+    logger.info("Lineage rebuilt for %d entity(ies) in %.2fs", len(index.successors), time.perf_counter() - start)
+    return index
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Look up what an entity is called today and what was folded into it.")
+    parser.add_argument("label", choices=LINEAGE_LABELS)
+    parser.add_argument("entity_id", help="Id of the minister or department")
+    parser.add_argument("--rebuild", action="store_true", help="Recompute the lineage properties from the relationships first")
+    parser.add_argument("--log-level", default="INFO")
+    args = parser.parse_args()
+    configure_logging(args.log_level)
+
+    with Neo4jInterface() as neo4j_interface:
+        if args.rebuild:
+            rebuild_lineage(neo4j_interface)
+        print(json.dumps({
+            "successor": successor(neo4j_interface, args.label, args.entity_id),
+            "predecessors": predecessors(neo4j_interface, args.label, args.entity_id),
+        }, indent=2))
@@ -0,0 +1,238 @@
+import argparse
+import json
+import logging
+import re
+import time
+import unicodedata
+from collections import namedtuple
+import sys
+import os
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/../')
+
+from neo4j_util.neo4j_interface import Neo4jInterface
+from neo4j_util.metrics import configure_logging
+from orgchart.ingestion import parse_name_list, read_amendments
+from orgchart.preflight import Problem, log_problems
+
+logger = logging.getLogger(__name__)
+
+ENTITY_LABELS = ("government", "minister", "department")
+
+EXACT = "exact"
+NORMALIZED = "normalized"
+AMBIGUOUS = "ambiguous"
+MISSING = "missing"
+
+# Words too common to say two names are alike
+STOPWORDS = frozenset({"and", "of", "the", "for", "to", "in", "on", "minister", "ministry", "department"})
+
+_SEPARATORS = re.compile(r"[\W_]+")
+
+Resolution = namedtuple("Resolution", ["status", "name", "entity_id", "candidates"])
+
+
+def normalize(name):
+    """Return the key two spellings of the same name share.
+
+    Case, "&" versus "and", punctuation and whitespace are folded:
+    "Transport & Civil Aviation" and "transport and civil  aviation." have the same key.
+    """
+    text = unicodedata.normalize("NFKC", name).casefold().replace("&", " and ")
+    return " ".join(_SEPARATORS.sub(" ", text).split())
+
+
+def tokens(key):
+    """Return the distinctive words of a normalized key."""
+    return {word for word in key.split() if word not in STOPWORDS}
+
+
+class NameIndex:
+    """Per-label name lookups tolerant of spelling differences, built once per run.
+
+    Exact names resolve first. Otherwise the normalized key resolves the name when it
+    matches one entity, and reports the candidates when it matches several. A token
+    index ranks near misses for names that match nothing.
+    """
+
+    def __init__(self):
+        self._exact = {}   # (label, name) -> id
+        self._keys = {}    # (label, normalized key) -> {name: id}
+        self._tokens = {}  # (label, token) -> set of names
+
+    def add(self, label, name, entity_id=None):
+        if not name:
+            return
+        self._exact[(label, name)] = entity_id
+        key = normalize(name)
+        self._keys.setdefault((label, key), {})[name] = entity_id
+        for token in tokens(key):
+            self._tokens.setdefault((label, token), set()).add(name)
+
+    def __len__(self):
+        return len(self._exact)
+
+    def resolve(self, label, name):
+        """Return a Resolution: the stored spelling and id of a name, or the candidates when it is not unique."""
+        if (label, name) in self._exact:
+            return Resolution(EXACT, name, self._exact[(label, name)], [name])
+        matches = self._keys.get((label, normalize(name)), {})
+        if len(matches) == 1:
+            (match, entity_id), = matches.items()
+            return Resolution(NORMALIZED, match, entity_id, [match])
+        if matches:
+            return Resolution(AMBIGUOUS, None, None, sorted(matches))
+        return Resolution(MISSING, None, None, self.suggest(label, name))
+
+    def suggest(self, label, name, limit=3):
+        """Return up to limit names of a label sharing the most distinctive words with name, best first."""
+        wanted = tokens(normalize(name))
+        shared = {}
+        for token in wanted:
+            for candidate in self._tokens.get((label, token), ()):
+                shared[candidate] = shared.get(candidate, 0) + 1
+        # Rank by the share of words in common (Jaccard), then by name for a stable order
+        scored = sorted(shared.items(), key=lambda item: (
+            -item[1] / len(wanted | tokens(normalize(item[0]))), item[0]))
+        return [candidate for candidate, _ in scored[:limit]]
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build from (label, id, name) rows."""
+        index = cls()
+        for label, entity_id, name in rows:
+            index.add(label, name, entity_id)
+        return index
+
+    @classmethod
+    def from_graph(cls, graph):
+        """Build from an in-memory OrgGraph (see org_engine.py)."""
+        return cls.from_rows(graph.nodes())
+
+    @classmethod
+    def from_neo4j(cls, driver: Neo4jInterface):
+        """Build from every entity in the database with one streamed query."""
+        query = """
+        MATCH (n)
+        WHERE n:government OR n:minister OR n:department
+        RETURN labels(n) AS labels, n.id AS id, n.name AS name
+        """
+        return cls.from_rows(
+            (label, record["id"], record["name"])
+            for record in driver.stream_query(query)
+            for label in record["labels"] if label in ENTITY_LABELS)
+
+
+def name_fields(transaction):
+    """Return (column, label, creates) for every entity name of an amendment row.
+
+    creates is True for the names a row may introduce (an added child, a rename or merge target).
+    """
+    file_type = transaction.get("file_type")
+    if file_type in ("Add", "Terminate"):
+        return [("parent", transaction.get("parent_type"), False),
+                ("child", transaction.get("child_type"), file_type == "Add")]
+    if file_type == "Move":
+        return [("old_parent", "minister", False), ("new_parent", "minister", False),
+                ("child", transaction.get("type") or "department", False)]
+    if file_type in ("Rename", "Merge"):
+        return [("old", transaction.get("type"), False), ("new", transaction.get("type"), True)]
+    return []
+
+
+class NameResolver:
+    """Rewrites the entity names of amendment rows to their stored spelling, before anything runs.
+
+    Names the rows create are added to the index as the rows are resolved, so later
+    rows that refer to them (in any spelling) resolve too. Ambiguous names are
+    reported as problems; names that match nothing are logged with suggestions and
+    left as they are (preflight.py reports them).
+    """
+
+    def __init__(self, index):
+        self.index = index
+        self.problems = []
+        self.rewritten = 0
+
+    def _resolve_name(self, transaction, column, label, name, creates):
+        resolution = self.index.resolve(label, name)
+        if resolution.status in (EXACT, NORMALIZED):
+            if resolution.status == NORMALIZED:
+                logger.info("%s: %s %r resolved to %r", transaction.get("transaction_id"), column, name, resolution.name)
+                self.rewritten += 1
+            return resolution.name
+        if resolution.status == AMBIGUOUS:
+            self.problems.append(Problem(transaction.get("transaction_id"), transaction.get("file_type"),
+                                         f"{label} {name!r} ({column}) matches several entities: {resolution.candidates}"))
+        elif not creates:
+            logger.warning("%s: no %s named %r (%s); closest: %s", transaction.get("transaction_id"),
+                           label, name, column, resolution.candidates or "none")
+        return name
+
+    def resolve(self, transaction):
+        """Return a copy of an amendment row with its entity names resolved."""
+        resolved = dict(transaction)
+        created = []
+        referenced = set()  # resolved names of the entities the row already refers to
+        for column, label, creates in name_fields(transaction):
+            value = transaction.get(column)
+            if label not in ENTITY_LABELS or not value:
+                continue
+            if transaction.get("file_type") == "Merge" and column == "old":
+                try:
+                    names = parse_name_list(value)
+                except (ValueError, SyntaxError):
+                    continue  # preflight.py reports unparsable lists
+                resolved_names = [self._resolve_name(transaction, column, label, name, creates) for name in names]
+                if resolved_names != names:
+                    resolved[column] = json.dumps(resolved_names, ensure_ascii=False)
+                resolved_names = set(resolved_names)
+            elif creates:
+                # A rename or merge that only respells an entity keeps the new spelling
+                if self.index.resolve(label, value).name not in referenced:
+                    resolved[column] = self._resolve_name(transaction, column, label, value, creates)
+                created.append((label, resolved[column]))
+                continue
+            else:
+                resolved[column] = self._resolve_name(transaction, column, label, value, creates)
+                resolved_names = {resolved[column]}
+            referenced |= resolved_names
+        for label, name in created:
+            if self.index.resolve(label, name).status != EXACT:
+                self.index.add(label, name)
+        return resolved
+
+    def run(self, transactions):
+        return [self.resolve(transaction) for transaction in transactions]
+
+
+def resolve_transactions(transactions, index):
+    """Resolve the entity names of amendment rows against a NameIndex. Returns (resolved rows, problems)."""
+    start = time.perf_counter()
+    resolver = NameResolver(index)
+    resolved = resolver.run(transactions)
+    logger.info("Resolved names of %d transaction(s) against %d entities in %.3fs: %d rewritten, %d problem(s)",
+                len(transactions), len(index), time.perf_counter() - start, resolver.rewritten, len(resolver.problems))
+    return resolved, resolver.problems
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resolve the entity names of an amendment gazette to their stored spelling.")
+    parser.add_argument("amendment_dir", nargs="?", default=os.path.join("..", "data/2015-10-15_2"), help="Amendment gazette directory")
+    parser.add_argument("--snapshot", help="Resolve against this snapshot directory instead of the database")
+    parser.add_argument("--log-level", default="INFO")
+    args = parser.parse_args()
+    configure_logging(args.log_level)
+
+    transactions = read_amendments(args.amendment_dir)
+    if args.snapshot:
+        from orgchart.org_engine import OrgGraph
+
+        index = NameIndex.from_graph(OrgGraph().load_snapshot(args.snapshot))
+    else:
+        with Neo4jInterface() as driver:
+            index = NameIndex.from_neo4j(driver)
+    _, problems = resolve_transactions(transactions, index)
+    log_problems(problems)
+    sys.exit(1 if problems else 0)
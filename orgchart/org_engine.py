@@ -0,0 +1,324 @@
+import argparse
+import csv
+from array import array
+from datetime import date
+import time
+import sys
+import os
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/../')
+
+from orgchart.ingestion import parse_date, parse_name_list, read_amendments
+
+GOVERNMENT_ROOT = "Government of Sri Lanka"
+
+NODE_LABELS = ("government", "minister", "department")
+RELATIONSHIP_TYPES = ("HAS_MINISTER", "HAS_DEPARTMENT", "RENAMED_TO", "MERGED_INTO")
+
+OPEN = 0  # end ordinal of a relationship without an end_date
+
+
+def to_ordinal(value):
+    """Convert a date, ISO date string or -1 marker to a date ordinal (OPEN for no date)."""
+    parsed = parse_date(value)
+    return parsed.toordinal() if parsed is not None else OPEN
+
+
+def from_ordinal(ordinal):
+    return date.fromordinal(ordinal) if ordinal != OPEN else None
+
+
+class OrgGraph:
+    """In-memory temporal org graph that applies gazette amendments like update_orgchart.py.
+
+    Nodes and relationships are stored column-wise (node/relationship numbers index
+    into the columns) with hash indexes on id, on name per label, on node pairs and
+    on the open relationships of each node. Every handler mirrors the Cypher of its
+    counterpart in update_orgchart.py, including MERGE matching on start_date and
+    matches that silently find nothing; the latter are recorded in `unmatched`.
+    """
+
+    def __init__(self):
+        # Node columns
+        self.node_label = array("b")
+        self.node_id = []
+        self.node_name = []
+        # Relationship columns; the RENAMED_TO/MERGED_INTO `date` is kept in rel_start_date
+        self.rel_type = array("b")
+        self.rel_source = array("l")
+        self.rel_target = array("l")
+        self.rel_start_date = array("l")
+        self.rel_end_date = array("l")
+        # Indexes
+        self.by_id = {}
+        self.by_name = {label: {} for label in NODE_LABELS}
+        self.pair_index = {}  # (source, target) -> relationship numbers
+        self.open_out = []    # node -> open outgoing relationship numbers
+        self.open_in = []     # node -> open incoming relationship numbers
+        self.unmatched = []   # (transaction_id, label, name) lookups that matched nothing
+
+    # Storage
+
+    def add_node(self, label, node_id, name):
+        """Create a node and return its number."""
+        node = len(self.node_id)
+        self.node_label.append(NODE_LABELS.index(label))
+        self.node_id.append(node_id)
+        self.node_name.append(name)
+        self.open_out.append(set())
+        self.open_in.append(set())
+        self.by_id[node_id] = node
+        self.by_name[label][name] = node
+        return node
+
+    def add_relationship(self, rel_type, source, target, start_date, end_date=OPEN):
+        """Create a relationship between two node numbers and return its number."""
+        rel = len(self.rel_type)
+        self.rel_type.append(RELATIONSHIP_TYPES.index(rel_type))
+        self.rel_source.append(source)
+        self.rel_target.append(target)
+        self.rel_start_date.append(start_date)
+        self.rel_end_date.append(end_date)
+        self.pair_index.setdefault((source, target), []).append(rel)
+        if end_date == OPEN:
+            self.open_out[source].add(rel)
+            self.open_in[target].add(rel)
+        return rel
+
+    def end_relationship(self, rel, end_date):
+        self.rel_end_date[rel] = end_date
+        self.open_out[self.rel_source[rel]].discard(rel)
+        self.open_in[self.rel_target[rel]].discard(rel)
+
+    def merge_relationship(self, rel_type, source, target, start_date):
+        """MERGE semantics: reuse a relationship of the type with the same start date, open or not."""
+        type_code = RELATIONSHIP_TYPES.index(rel_type)
+        for rel in self.pair_index.get((source, target), ()):
+            if self.rel_type[rel] == type_code and self.rel_start_date[rel] == start_date:
+                return rel
+        return self.add_relationship(rel_type, source, target, start_date)
+
+    def find(self, label, name, transaction_id=None):
+        """Return the node number of a named entity, or None (recorded as unmatched)."""
+        node = self.by_name[label].get(name)
+        if node is None:
+            self.unmatched.append((transaction_id, label, name))
+        return node
+
+    def open_relationships(self, node, rel_type, outgoing=True):
+        type_code = RELATIONSHIP_TYPES.index(rel_type)
+        rels = self.open_out[node] if outgoing else self.open_in[node]
+        return sorted(rel for rel in rels if self.rel_type[rel] == type_code)
+
+    # Snapshot loading (same result as setup_db.load_data_to_neo4j)
+
+    def load_snapshot(self, snapshot_dir):
+        """Load a gazette snapshot directory such as data/2015-09-21."""
+        for label in NODE_LABELS:
+            for row in _read_csv(os.path.join(snapshot_dir, f"{label}.csv")):
+                self.add_node(label, row["id"], row["name"])
+        for rel_type, file_name, start_column, end_column in (
+            ("HAS_MINISTER", "gov-min.csv", "gov_id", "min_id"),
+            ("HAS_DEPARTMENT", "min-dep.csv", "min_id", "dep_id"),
+        ):
+            for row in _read_csv(os.path.join(snapshot_dir, file_name)):
+                source = self.by_id.get(row[start_column])
+                target = self.by_id.get(row[end_column])
+                if source is None or target is None:
+                    continue  # MATCH finds nothing, so nothing is created
+                self.add_relationship(rel_type, source, target, to_ordinal(row["start_date"]), to_ordinal(row["end_date"]))
+        return self
+
+    # Amendment handlers (same semantics as update_orgchart.py)
+
+    def add_entity(self, transaction, entity_counters):
+        child_type = transaction["child_type"]
+        if child_type not in entity_counters:
+            raise ValueError(f"Unknown child type: {child_type}")
+        transaction_id = transaction["transaction_id"]
+        entity_counter = entity_counters[child_type] + 1
+        new_entity_id = f"{transaction_id[:7]}_{child_type[:3].lower()}_{entity_counter}"
+
+        child = self.by_name[child_type].get(transaction["child"])
+        if child is None:
+            child = self.add_node(child_type, new_entity_id, transaction["child"])
+        parent = self.find(transaction["parent_type"], transaction["parent"], transaction_id)
+        if parent is not None:
+            self.merge_relationship(transaction["rel_type"], parent, child, to_ordinal(transaction["date"]))
+        return entity_counter
+
+    def terminate_entity(self, transaction):
+        transaction_id = transaction.get("transaction_id")
+        parent = self.find(transaction["parent_type"], transaction["parent"], transaction_id)
+        child = self.find(transaction["child_type"], transaction["child"], transaction_id)
+        if parent is None or child is None:
+            return
+        type_code = RELATIONSHIP_TYPES.index(transaction["rel_type"])
+        end_date = to_ordinal(transaction["date"])
+        # The Cypher pattern is undirected; the pair index avoids scanning every open relationship of the parent
+        for rel in self.pair_index.get((parent, child), []) + self.pair_index.get((child, parent), []):
+            if self.rel_type[rel] == type_code and self.rel_end_date[rel] == OPEN:
+                self.end_relationship(rel, end_date)
+
+    def _transfer_departments(self, old, new, start_date):
+        for rel in self.open_relationships(old, "HAS_DEPARTMENT"):
+            self.merge_relationship("HAS_DEPARTMENT", new, self.rel_target[rel], start_date)
+
+    def _end_departments(self, old, end_date):
+        for rel in self.open_relationships(old, "HAS_DEPARTMENT"):
+            self.end_relationship(rel, end_date)
+
+    def _government_relationship(self, child, transaction_id, date_value):
+        return {
+            "parent": GOVERNMENT_ROOT,
+            "child": child,
+            "date": date_value,
+            "parent_type": "government",
+            "child_type": "minister",
+            "rel_type": "HAS_MINISTER",
+            "transaction_id": transaction_id
+        }
+
+    def rename_minister(self, transaction, entity_counters):
+        transaction_id = transaction["transaction_id"]
+        start_date = to_ordinal(transaction["date"])
+        new_minister_counter = self.add_entity(
+            self._government_relationship(transaction["new"], transaction_id, transaction["date"]), entity_counters)
+
+        old = self.find("minister", transaction["old"], transaction_id)
+        new = self.by_name["minister"][transaction["new"]]
+        if old is not None:
+            self._transfer_departments(old, new, start_date)
+        self.terminate_entity(self._government_relationship(transaction["old"], transaction_id, transaction["date"]))
+        if old is not None:
+            self._end_departments(old, start_date)
+            self.merge_relationship("RENAMED_TO", old, new, start_date)
+        return new_minister_counter
+
+    def move_department(self, transaction):
+        transaction_id = transaction["transaction_id"]
+        new_parent = self.find("minister", transaction["new_parent"], transaction_id)
+        child = self.find("department", transaction["child"], transaction_id)
+        if new_parent is not None and child is not None:
+            self.merge_relationship("HAS_DEPARTMENT", new_parent, child, to_ordinal(transaction["date"]))
+        self.terminate_entity({
+            "parent": transaction["old_parent"],
+            "child": transaction["child"],
+            "date": transaction["date"],
+            "parent_type": "minister",
+            "child_type": "department",
+            "rel_type": "HAS_DEPARTMENT",
+            "transaction_id": transaction_id
+        })
+
+    def merge_ministers(self, transaction, entity_counters):
+        transaction_id = transaction["transaction_id"]
+        day = to_ordinal(transaction["date"])
+        new_minister_counter = self.add_entity(
+            self._government_relationship(transaction["new"], transaction_id, transaction["date"]), entity_counters)
+        new = self.by_name["minister"][transaction["new"]]
+
+        for old_name in parse_name_list(transaction["old"]):
+            old = self.find("minister", old_name, transaction_id)
+            if old is not None:
+                self._transfer_departments(old, new, day)
+            self.terminate_entity(self._government_relationship(old_name, transaction_id, transaction["date"]))
+            if old is not None:
+                self._end_departments(old, day)
+                self.merge_relationship("MERGED_INTO", old, new, day)
+        return new_minister_counter
+
+    def merge_departments(self, transaction, entity_counters):
+        transaction_id = transaction["transaction_id"]
+        day = to_ordinal(transaction["date"])
+        old_departments = parse_name_list(transaction["old"])
+        new = self.by_name["department"].get(transaction["new"])
+        if new is None:
+            new_id = f"{transaction_id[:7]}_dep_{entity_counters['department'] + 1}"
+            new = self.add_node("department", new_id, transaction["new"])
+
+        # The minister(s) of the first old department take the new department
+        first = self.find("department", old_departments[0], transaction_id)
+        if first is not None:
+            for rel in self.open_relationships(first, "HAS_DEPARTMENT", outgoing=False):
+                if NODE_LABELS[self.node_label[self.rel_source[rel]]] == "minister":
+                    self.merge_relationship("HAS_DEPARTMENT", self.rel_source[rel], new, day)
+
+        for old_name in old_departments:
+            old = self.find("department", old_name, transaction_id)
+            if old is None:
+                continue
+            for rel in self.open_relationships(old, "HAS_DEPARTMENT", outgoing=False):
+                if NODE_LABELS[self.node_label[self.rel_source[rel]]] == "minister":
+                    self.end_relationship(rel, day)
+            self.merge_relationship("MERGED_INTO", old, new, day)
+        return entity_counters["department"] + 1
+
+    def apply(self, transaction, entity_counters):
+        """Dispatch one transaction the way execute_transactions does, updating entity_counters."""
+        if transaction["file_type"] == "Rename" and transaction["type"] == "minister":
+            entity_counters["minister"] = self.rename_minister(transaction, entity_counters)
+        elif transaction["file_type"] == "Move" and transaction["type"] == "department":
+            self.move_department(transaction)
+        elif transaction["file_type"] == "Add":
+            entity_counters[transaction["child_type"]] = self.add_entity(transaction, entity_counters)
+        elif transaction["file_type"] == "Terminate":
+            self.terminate_entity(transaction)
+        elif transaction["file_type"] == "Merge" and transaction["type"] == "minister":
+            entity_counters["minister"] = self.merge_ministers(transaction, entity_counters)
+        elif transaction["file_type"] == "Merge" and transaction["type"] == "department":
+            entity_counters["department"] = self.merge_departments(transaction, entity_counters)
+
+    def replay(self, transactions, entity_counters=None):
+        """Apply transactions in order and return the final entity counters."""
+        if entity_counters is None:
+            entity_counters = {"minister": 0, "department": 0}
+        for transaction in transactions:
+            self.apply(transaction, entity_counters)
+        return entity_counters
+
+    # Reading the state back
+
+    def nodes(self):
+        """Yield (label, id, name) for every node."""
+        for node in range(len(self.node_id)):
+            yield NODE_LABELS[self.node_label[node]], self.node_id[node], self.node_name[node]
+
+    def relationships(self):
+        """Yield (type, source id, target id, start date, end date or None) for every relationship."""
+        for rel in range(len(self.rel_type)):
+            yield (RELATIONSHIP_TYPES[self.rel_type[rel]],
+                   self.node_id[self.rel_source[rel]],
+                   self.node_id[self.rel_target[rel]],
+                   from_ordinal(self.rel_start_date[rel]),
+                   from_ordinal(self.rel_end_date[rel]))
+
+    def summary(self):
+        open_count = sum(len(rels) for rels in self.open_out)
+        return f"{len(self.node_id)} node(s), {len(self.rel_type)} relationship(s), {open_count} open"
+
+
+def _read_csv(path):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        yield from csv.DictReader(f)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay an amendment gazette on a snapshot in memory (dry run).")
+    parser.add_argument("snapshot_dir", nargs="?", default="../data/2015-09-21", help="Gazette snapshot directory")
+    parser.add_argument("amendment_dir", nargs="?", default="../data/2015-10-15_2", help="Amendment gazette directory")
+    args = parser.parse_args()
+
+    graph = OrgGraph().load_snapshot(args.snapshot_dir)
+    print(f"Loaded snapshot: {graph.summary()}")
+
+    transactions = read_amendments(args.amendment_dir)
+    start = time.perf_counter()
+    entity_counters = graph.replay(transactions)
+    elapsed = time.perf_counter() - start
+    rate = len(transactions) / elapsed if elapsed > 0 else float("inf")
+    print(f"Replayed {len(transactions)} transaction(s) in {elapsed * 1000:.1f}ms ({rate:.0f}/sec): {graph.summary()}")
+    print(f"Entity counters: {entity_counters}")
+    for transaction_id, label, name in graph.unmatched:
+        print(f"Unmatched {label} in {transaction_id}: {name}")
@@ -0,0 +1,275 @@
+import argparse
+import logging
+import time
+from collections import namedtuple
+from datetime import date
+import sys
+import os
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/../')
+
+from neo4j_util.neo4j_interface import Neo4jInterface
+from neo4j_util.metrics import configure_logging
+from orgchart.ingestion import AMENDMENT_COLUMNS, parse_date, parse_name_list, read_amendments
+from orgchart.org_engine import GOVERNMENT_ROOT, NODE_LABELS, OrgGraph, to_ordinal
+
+logger = logging.getLogger(__name__)
+
+# Which relationship type links each parent/child label pair
+PARENT_RELATIONSHIPS = {
+    ("government", "minister"): "HAS_MINISTER",
+    ("minister", "department"): "HAS_DEPARTMENT",
+}
+
+# Every entity, with the open HAS_MINISTER/HAS_DEPARTMENT relationships it starts
+SNAPSHOT_QUERY = """
+MATCH (n)
+WHERE n:government OR n:minister OR n:department
+OPTIONAL MATCH (n)-[r:HAS_MINISTER|HAS_DEPARTMENT]->(child)
+WHERE r.end_date IS NULL
+RETURN labels(n) AS labels, n.id AS id, n.name AS name,
+       collect(CASE WHEN r IS NULL THEN NULL ELSE [type(r), child.id, toString(r.start_date)] END) AS open
+"""
+
+Problem = namedtuple("Problem", ["transaction_id", "file_type", "message"])
+
+
+def load_current_graph(driver):
+    """Build an OrgGraph of every entity and the open relationships between them in one read query."""
+    graph = OrgGraph()
+    relationships = []
+    for record in driver.stream_query(SNAPSHOT_QUERY):
+        label = next((label for label in record["labels"] if label in NODE_LABELS), None)
+        if label is None:
+            continue
+        graph.add_node(label, record["id"], record["name"])
+        relationships.extend((record["id"], rel) for rel in record["open"])
+    for source_id, (rel_type, target_id, start_date) in relationships:
+        source, target = graph.by_id.get(source_id), graph.by_id.get(target_id)
+        if source is not None and target is not None:
+            graph.add_relationship(rel_type, source, target, to_ordinal(start_date))
+    return graph
+
+
+class Preflight:
+    """Checks amendment rows against an OrgGraph before anything is written.
+
+    Each row is checked against the state left by the rows before it (the row is
+    applied to the graph once checked), so a gazette that adds a department and
+    then moves it validates cleanly. Problems are collected rather than raised.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.problems = []
+        self.entity_counters = {"minister": 0, "department": 0}
+        self._transaction = None
+
+    def _problem(self, message):
+        self.problems.append(Problem(self._transaction.get("transaction_id"), self._transaction.get("file_type"), message))
+
+    def _node(self, label, name):
+        """Return the node number of a named entity, reporting it when missing."""
+        if label not in NODE_LABELS:
+            self._problem(f"unknown entity type {label!r}")
+            return None
+        node = self.graph.by_name[label].get(name)
+        if node is None:
+            self._problem(f"{label} {name!r} does not exist")
+        return node
+
+    def _open_parents(self, node, rel_type):
+        graph = self.graph
+        return [graph.rel_source[rel] for rel in graph.open_relationships(node, rel_type, outgoing=False)]
+
+    def _is_active(self, label, node):
+        if label == "government":
+            return True
+        rel_type = "HAS_MINISTER" if label == "minister" else "HAS_DEPARTMENT"
+        return bool(self._open_parents(node, rel_type))
+
+    def _active_node(self, label, name):
+        """Return the node number of an entity that must exist and be active, reporting it otherwise."""
+        node = self._node(label, name)
+        if node is not None and not self._is_active(label, node):
+            self._problem(f"{label} {name!r} is not active")
+        return node
+
+    def _check_open(self, rel_type, parent, child, parent_name, child_name):
+        if parent is None or child is None:
+            return
+        if parent not in self._open_parents(child, rel_type):
+            self._problem(f"no active {rel_type} relationship from {parent_name!r} to {child_name!r}")
+
+    # Per file type checks
+
+    def check_add(self, transaction):
+        parent_type, child_type = transaction["parent_type"], transaction["child_type"]
+        rel_type = PARENT_RELATIONSHIPS.get((parent_type, child_type))
+        if rel_type is None:
+            self._problem(f"cannot add a {child_type!r} under a {parent_type!r}")
+            return False
+        if transaction["rel_type"] != rel_type:
+            self._problem(f"rel_type {transaction['rel_type']!r} should be {rel_type!r}")
+        self._active_node(parent_type, transaction["parent"])
+        child = self.graph.by_name[child_type].get(transaction["child"])
+        if child is not None:
+            for parent in self._open_parents(child, rel_type):
+                self._problem(f"{child_type} {transaction['child']!r} is already active under "
+                              f"{self.graph.node_name[parent]!r}")
+        return True
+
+    def check_terminate(self, transaction):
+        parent_type, child_type = transaction["parent_type"], transaction["child_type"]
+        rel_type = PARENT_RELATIONSHIPS.get((parent_type, child_type))
+        if rel_type is None or transaction["rel_type"] != rel_type:
+            self._problem(f"cannot terminate a {transaction['rel_type']!r} from a {parent_type!r} to a {child_type!r}")
+            return False
+        parent = self._node(parent_type, transaction["parent"])
+        child = self._node(child_type, transaction["child"])
+        self._check_open(rel_type, parent, child, transaction["parent"], transaction["child"])
+        return True
+
+    def check_move(self, transaction):
+        if transaction["type"] != "department":
+            self._problem(f"cannot move a {transaction['type']!r}")
+            return False
+        if transaction["old_parent"] == transaction["new_parent"]:
+            self._problem(f"old and new parent are both {transaction['new_parent']!r}")
+        old_parent = self._node("minister", transaction["old_parent"])
+        child = self._node("department", transaction["child"])
+        self._check_open("HAS_DEPARTMENT", old_parent, child, transaction["old_parent"], transaction["child"])
+        self._active_node("minister", transaction["new_parent"])
+        return True
+
+    def check_rename(self, transaction):
+        if transaction["type"] != "minister":
+            self._problem(f"cannot rename a {transaction['type']!r}")
+            return False
+        self._active_node("minister", transaction["old"])
+        new = self.graph.by_name["minister"].get(transaction["new"])
+        if new is not None and self._is_active("minister", new):
+            self._problem(f"minister {transaction['new']!r} already exists and is active")
+        return True
+
+    def check_merge(self, transaction):
+        label = transaction["type"]
+        if label not in ("minister", "department"):
+            self._problem(f"cannot merge a {label!r}")
+            return False
+        try:
+            old_names = parse_name_list(transaction["old"])
+        except (ValueError, SyntaxError) as e:
+            self._problem(f"cannot parse the old list {transaction['old']!r}: {e}")
+            return False
+        if not old_names:
+            self._problem("the old list is empty")
+            return False
+        if len(set(old_names)) != len(old_names):
+            self._problem(f"the old list names an entity twice: {old_names}")
+        for name in old_names:
+            self._active_node(label, name)
+        return True
+
+    CHECKS = {
+        "Add": check_add,
+        "Terminate": check_terminate,
+        "Move": check_move,
+        "Rename": check_rename,
+        "Merge": check_merge,
+    }
+
+    def _validate(self, transaction):
+        """Report the problems of one transaction; False when it cannot be applied at all."""
+        file_type = transaction.get("file_type")
+        if file_type not in AMENDMENT_COLUMNS:
+            self._problem(f"unknown file type {file_type!r}")
+            return False
+        missing = [column for column in AMENDMENT_COLUMNS[file_type][1] if not transaction.get(column)]
+        if missing:
+            self._problem(f"missing {', '.join(missing)}")
+            return False
+        try:
+            if parse_date(transaction["date"]) is None:
+                raise ValueError("no date")
+        except ValueError:
+            self._problem(f"invalid date {transaction['date']!r}")
+            return False
+        return self.CHECKS[file_type](self, transaction)
+
+    def _assume_created(self, transaction):
+        """Create the entity a rejected row introduces, so later rows that refer to it are not reported too."""
+        if transaction.get("file_type") == "Add":
+            label, name = transaction.get("child_type"), transaction.get("child")
+            parent_label, parent_name = transaction.get("parent_type"), transaction.get("parent")
+        elif transaction.get("file_type") in ("Rename", "Merge"):
+            label, name = transaction.get("type"), transaction.get("new")
+            parent_label, parent_name = ("government", GOVERNMENT_ROOT) if label == "minister" else (None, None)
+        else:
+            return
+        if label not in NODE_LABELS or not name or name in self.graph.by_name[label]:
+            return
+        node = self.graph.add_node(label, f"unapplied/{transaction.get('transaction_id')}", name)
+        parent = self.graph.by_name.get(parent_label, {}).get(parent_name)
+        rel_type = PARENT_RELATIONSHIPS.get((parent_label, label))
+        if parent is not None and rel_type is not None:
+            try:
+                start = parse_date(transaction.get("date"))
+            except ValueError:
+                start = None
+            # The row may have been rejected for its date; the assumed relationship then starts at the beginning
+            self.graph.add_relationship(rel_type, parent, node, (start or date.min).toordinal())
+
+    def check(self, transaction):
+        """Check one transaction and apply it to the graph, so the next one is checked against its effects."""
+        self._transaction = transaction
+        if not self._validate(transaction):
+            self._assume_created(transaction)
+            return
+        try:
+            # The engine mutates rows (e.g. parsed dates), so it gets a copy
+            self.graph.apply(dict(transaction), self.entity_counters)
+        except Exception as e:
+            self._problem(f"cannot be applied: {e}")
+            self._assume_created(transaction)
+
+    def run(self, transactions):
+        for transaction in transactions:
+            self.check(transaction)
+        return self.problems
+
+
+def validate_transactions(transactions, driver=None, graph=None):
+    """Check amendment transactions against the database (or a given OrgGraph) and return every problem found."""
+    start = time.perf_counter()
+    if graph is None:
+        graph = load_current_graph(driver)
+        logger.info("Pre-flight snapshot loaded in %.3fs: %s", time.perf_counter() - start, graph.summary())
+    problems = Preflight(graph).run(transactions)
+    logger.info("Pre-flight checked %d transaction(s) in %.3fs: %d problem(s)",
+                len(transactions), time.perf_counter() - start, len(problems))
+    return problems
+
+
+def log_problems(problems):
+    for problem in problems:
+        logger.error("%s (%s): %s", problem.transaction_id, problem.file_type, problem.message)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check an amendment gazette against the org chart before applying it.")
+    parser.add_argument("amendment_dir", nargs="?", default=os.path.join("..", "data/2015-10-15_2"), help="Amendment gazette directory")
+    parser.add_argument("--snapshot", help="Check against this snapshot directory instead of the database")
+    parser.add_argument("--log-level", default="INFO")
+    args = parser.parse_args()
+    configure_logging(args.log_level)
+
+    transactions = read_amendments(args.amendment_dir)
+    if args.snapshot:
+        problems = validate_transactions(transactions, graph=OrgGraph().load_snapshot(args.snapshot))
+    else:
+        with Neo4jInterface() as driver:
+            problems = validate_transactions(transactions, driver)
+    log_problems(problems)
+    sys.exit(1 if problems else 0)
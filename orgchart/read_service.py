@@ -0,0 +1,299 @@
+import argparse
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import sys
+import os
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/../')
+
+from neo4j_util.neo4j_interface import Neo4jInterface
+from neo4j_util.metrics import configure_logging
+from orgchart.ingestion import parse_date
+from orgchart.current_view import current_org_chart
+from orgchart.export import ACTIVE_ON_DAY, tree
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_TTL = 300            # seconds; bounds staleness for writes that record no GazetteCommit
+DEFAULT_POLL_INTERVAL = 1.0  # seconds between checks for new gazette commits
+
+# Every commit that changes the org chart creates a GazetteCommit with the earliest
+# date it affects (no date: every date, e.g. a snapshot load). The sequence comes from
+# a single log node whose write lock serializes committers, so sequences become
+# visible in order and readers can poll for everything after the last one they saw.
+# Amendment commits also record their gazette and the transaction_ids they applied
+# (see consistency.applied_transactions).
+RECORD_COMMIT_QUERY = """
+MERGE (log:GazetteCommitLog {name: 'orgchart'})
+SET log.sequence = coalesce(log.sequence, 0) + 1
+CREATE (c:GazetteCommit {sequence: log.sequence})
+SET c.effective_date = date($effective_date), c.source = $source, c.committed_at = datetime(),
+    c.gazette = $gazette, c.transaction_ids = $transaction_ids
+"""
+
+COMMITS_SINCE_QUERY = """
+MATCH (c:GazetteCommit)
+WHERE c.sequence > $sequence
+RETURN max(c.sequence) AS sequence, count(c) AS commits, min(c.effective_date) AS effective_date,
+       count(CASE WHEN c.effective_date IS NULL THEN 1 END) AS undated
+"""
+
+DEPARTMENTS_QUERY = f"""
+MATCH (m:minister {{id: $id}})-[r:HAS_DEPARTMENT]->(d:department)
+WHERE {ACTIVE_ON_DAY}
+RETURN d.id AS id, d.name AS name
+ORDER BY id
+"""
+
+CURRENT_DEPARTMENTS_QUERY = """
+MATCH (m:minister {id: $id})-[:HAS_CURRENT_DEPARTMENT]->(d:department)
+RETURN d.id AS id, d.name AS name
+ORDER BY id
+"""
+
+MINISTERS_QUERY = f"""
+MATCH (m:minister)-[r:HAS_DEPARTMENT]->(d:department {{id: $id}})
+WHERE {ACTIVE_ON_DAY}
+RETURN m.id AS id, m.name AS name
+ORDER BY id
+"""
+
+CURRENT_MINISTERS_QUERY = """
+MATCH (m:minister)-[:HAS_CURRENT_DEPARTMENT]->(d:department {id: $id})
+RETURN m.id AS id, m.name AS name
+ORDER BY id
+"""
+
+
+def earliest_date(transactions):
+    """Return the earliest date (ISO string) of a list of amendment rows, or None if there are none."""
+    dates = [parse_date(transaction["date"]) for transaction in transactions]
+    dates = [day for day in dates if day is not None]
+    return min(dates).isoformat() if dates else None
+
+
+def record_gazette_commit(tx, source, effective_date=None, gazette=None, transaction_ids=None):
+    """Record, in the committing transaction, that reads as of effective_date or later may have changed.
+
+    effective_date=None means every date (a snapshot load). For amendments, gazette and
+    transaction_ids record which rows of which gazette the commit applied.
+    """
+    tx.run(RECORD_COMMIT_QUERY, effective_date=effective_date, source=source,
+           gazette=gazette, transaction_ids=transaction_ids).consume()
+
+
+class ResultCache:
+    """Thread-safe LRU cache of read results with a time to live, keyed by (query, arguments, as-of date).
+
+    The as-of date is an ISO string, or None for reads of today's org chart. Those
+    are invalidated by every commit; dated ones only from the commit's effective date on.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+
+    def get(self, key):
+        """Return (True, value) for a live entry, else (False, None)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_from(self, effective_date=None):
+        """Drop today's reads and every read as of effective_date or later (all of them when None)."""
+        with self._lock:
+            stale = [key for key in self._entries
+                     if effective_date is None or key[2] is None or key[2] >= effective_date]
+            for key in stale:
+                del self._entries[key]
+            self.invalidated += len(stale)
+        return len(stale)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                    "invalidated": self.invalidated}
+
+
+class ReadService:
+    """Cached reads of the org chart, as of a date or today.
+
+    Before serving a read, the service looks for GazetteCommits newer than the last
+    one it saw (at most every poll_interval seconds) and invalidates the affected dates.
+    """
+
+    def __init__(self, driver: Neo4jInterface, cache=None, poll_interval=DEFAULT_POLL_INTERVAL):
+        self.driver = driver
+        self.cache = cache or ResultCache()
+        self.poll_interval = poll_interval
+        self._sync_lock = threading.Lock()
+        self._next_poll = 0.0
+        self.sequence = self._commits_since(0)["sequence"] or 0
+
+    def _commits_since(self, sequence):
+        return self.driver.execute_query(COMMITS_SINCE_QUERY, {"sequence": sequence})[0]
+
+    def sync(self, force=False):
+        """Invalidate the cache for gazette commits made since the last sync. Returns the entries dropped."""
+        with self._sync_lock:
+            now = time.monotonic()
+            if not force and now < self._next_poll:
+                return 0
+            self._next_poll = now + self.poll_interval
+            record = self._commits_since(self.sequence)
+            if not record["commits"]:
+                return 0
+            self.sequence = record["sequence"]
+            effective_date = None if record["undated"] else record["effective_date"].iso_format()
+            dropped = self.cache.invalidate_from(effective_date)
+            logger.info("%d gazette commit(s) from %s on: %d cached result(s) invalidated",
+                        record["commits"], effective_date or "the beginning", dropped)
+            return dropped
+
+    def _cached(self, name, args, day, compute):
+        self.sync()
+        key = (name, args, day)
+        found, value = self.cache.get(key)
+        if not found:
+            sequence = self.sequence
+            value = compute()
+            # A sync during compute may have invalidated dates this result was read before
+            if self.sequence == sequence:
+                self.cache.put(key, value)
+        return value
+
+    def org_chart(self, day=None):
+        """Return the government -> minister -> department tree as of day (today when None)."""
+        day = _iso(day)
+        if day is None:
+            return self._cached("org_chart", (), None, lambda: current_org_chart(self.driver))
+        return self._cached("org_chart", (), day, lambda: _nest(tree(self.driver, day)))
+
+    def departments_of(self, minister_id, day=None):
+        """Return [{id, name}] of the departments a minister held as of day (today when None)."""
+        day = _iso(day)
+        return self._cached("departments_of", (minister_id,), day, lambda: self._rows(
+            DEPARTMENTS_QUERY if day else CURRENT_DEPARTMENTS_QUERY, {"id": minister_id, "day": day}))
+
+    def minister_of(self, department_id, day=None):
+        """Return [{id, name}] of the minister(s) holding a department as of day (today when None)."""
+        day = _iso(day)
+        return self._cached("minister_of", (department_id,), day, lambda: self._rows(
+            MINISTERS_QUERY if day else CURRENT_MINISTERS_QUERY, {"id": department_id, "day": day}))
+
+    def _rows(self, query, parameters):
+        return [dict(record) for record in self.driver.execute_query(query, parameters)]
+
+
+def _iso(day):
+    # Dates and date strings alike are keyed by their ISO form; raises ValueError when unparsable
+    if day is None or day == "":
+        return None
+    return (day if isinstance(day, date) else parse_date(day)).isoformat()
+
+
+def _nest(entries):
+    # Group export.tree()'s one entry per minister into the current_org_chart() shape
+    governments = {}
+    for entry in entries:
+        government = governments.setdefault(entry["government"]["id"], {**entry["government"], "ministers": []})
+        government["ministers"].append({**entry["minister"],
+                                        "departments": sorted(entry["departments"], key=lambda d: d["id"])})
+    nested = []
+    for government_id in sorted(governments):
+        governments[government_id]["ministers"].sort(key=lambda minister: minister["id"])
+        nested.append(governments[government_id])
+    return nested
+
+
+class ReadHandler(BaseHTTPRequestHandler):
+    """GET /org-chart, /ministers/<id>/departments, /departments/<id>/minister (each with ?as_of=YYYY-MM-DD), /stats."""
+
+    service = None  # set by serve()
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        day = parse_qs(url.query).get("as_of", [None])[0]
+        parts = [part for part in url.path.split("/") if part]
+        try:
+            if parts == ["org-chart"]:
+                body = self.service.org_chart(day)
+            elif len(parts) == 3 and parts[0] == "ministers" and parts[2] == "departments":
+                body = self.service.departments_of(parts[1], day)
+            elif len(parts) == 3 and parts[0] == "departments" and parts[2] == "minister":
+                body = self.service.minister_of(parts[1], day)
+            elif parts == ["stats"]:
+                body = {**self.service.cache.stats(), "sequence": self.service.sequence}
+            else:
+                return self._send(404, {"error": "not found"})
+        except ValueError as e:
+            return self._send(400, {"error": str(e)})
+        self._send(200, body)
+
+    def _send(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+
+def serve(service, host="127.0.0.1", port=8080):
+    """Serve a ReadService over HTTP until interrupted."""
+    handler = type("BoundReadHandler", (ReadHandler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    logger.info("Serving the org chart on http://%s:%d", host, port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve cached org chart reads over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--max-entries", type=int, default=DEFAULT_MAX_ENTRIES, help="Cached results kept (LRU)")
+    parser.add_argument("--ttl", type=float, default=DEFAULT_TTL, help="Seconds a cached result is served at most")
+    parser.add_argument("--poll-interval", type=float, default=DEFAULT_POLL_INTERVAL,
+                        help="Seconds between checks for new gazette commits")
+    parser.add_argument("--log-level", default="INFO")
+    args = parser.parse_args()
+    configure_logging(args.log_level)
+
+    with Neo4jInterface() as neo4j_interface:
+        serve(ReadService(neo4j_interface, ResultCache(args.max_entries, args.ttl), args.poll_interval),
+              args.host, args.port)
@@ -0,0 +1,208 @@
+import argparse
+import ast
+import logging
+import re
+import sys
+import os
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/../')
+
+from neo4j_util.neo4j_interface import Neo4jInterface
+from neo4j_util.metrics import configure_logging
+
+logger = logging.getLogger(__name__)
+
+NODE_LABELS = ["government", "minister", "department"]
+RELATIONSHIP_TYPES = ["HAS_MINISTER", "HAS_DEPARTMENT"]
+
+# Uniqueness constraints, declared as (name, label, property). Each one is backed by an index.
+CONSTRAINTS = [
+    ("government_name_unique", "government", "name"),
+    ("minister_name_unique", "minister", "name"),
+    ("department_name_unique", "department", "name"),
+    ("government_id_unique", "government", "id"),
+    ("minister_id_unique", "minister", "id"),
+    ("department_id_unique", "department", "id"),
+    ("ingest_checkpoint_pipeline_unique", "IngestCheckpoint", "pipeline"),
+    ("gazette_commit_log_name_unique", "GazetteCommitLog", "name"),
+    ("gazette_commit_sequence_unique", "GazetteCommit", "sequence"),
+]
+
+# Relationship property indexes, declared as (name, type, property).
+# These serve date range lookups on the temporal relationships (e.g. "active on date D");
+# `end_date IS NULL` filters are applied after expanding from an indexed node.
+RELATIONSHIP_INDEXES = [
+    ("has_minister_start_date", "HAS_MINISTER", "start_date"),
+    ("has_minister_end_date", "HAS_MINISTER", "end_date"),
+    ("has_department_start_date", "HAS_DEPARTMENT", "start_date"),
+    ("has_department_end_date", "HAS_DEPARTMENT", "end_date"),
+]
+
+# Indexes dropped from the schema; apply_schema removes them from existing databases
+RETIRED_INDEXES = [
+    "has_minister_transaction_id", "has_minister_end_transaction_id",
+    "has_department_transaction_id", "has_department_end_transaction_id",
+    "renamed_to_transaction_id", "merged_into_transaction_id",
+]
+
+# Node property indexes, declared as (name, label, property). `successor_id` serves the
+# lineage lookups (see lineage.py): "everything folded into this entity". GazetteCommit
+# `gazette` serves the applied-row lookups (see consistency.py).
+NODE_INDEXES = [(f"{label}_successor_id", label, "successor_id") for label in NODE_LABELS]
+NODE_INDEXES.append(("gazette_commit_gazette", "GazetteCommit", "gazette"))
+
+DEFAULT_INDEX_TIMEOUT = 300  # seconds
+
+
+def schema_statements():
+    """Return the DDL statements for every declared constraint and index."""
+    statements = [
+        f"CREATE CONSTRAINT {name} IF NOT EXISTS FOR (n:{label}) REQUIRE n.{prop} IS UNIQUE"
+        for name, label, prop in CONSTRAINTS
+    ]
+    statements += [
+        f"CREATE INDEX {name} IF NOT EXISTS FOR (n:{label}) ON (n.{prop})"
+        for name, label, prop in NODE_INDEXES
+    ]
+    statements += [
+        f"CREATE INDEX {name} IF NOT EXISTS FOR ()-[r:{rel_type}]-() ON (r.{prop})"
+        for name, rel_type, prop in RELATIONSHIP_INDEXES
+    ]
+    statements += [f"DROP INDEX {name} IF EXISTS" for name in RETIRED_INDEXES]
+    return statements
+
+
+def wait_for_indexes(driver: Neo4jInterface, timeout: int = DEFAULT_INDEX_TIMEOUT):
+    """Block until every index (including constraint-backed ones) is online."""
+    driver.execute_query("CALL db.awaitIndexes($timeout)", {"timeout": timeout})
+
+
+def apply_schema(driver: Neo4jInterface, timeout: int = DEFAULT_INDEX_TIMEOUT):
+    """Create all constraints and indexes, then wait for them to come online."""
+    for query in schema_statements():
+        driver.execute_query(query)
+    wait_for_indexes(driver, timeout)
+    logger.info("Schema applied: %d constraint(s), %d node index(es), %d relationship index(es) online.",
+                len(CONSTRAINTS), len(NODE_INDEXES), len(RELATIONSHIP_INDEXES))
+
+
+# Static check: find lookup keys in Cypher queries that no declared index backs
+
+CLAUSE_PATTERN = re.compile(r"\b(OPTIONAL MATCH|MATCH|MERGE|CREATE|WHERE|SET|REMOVE|WITH|RETURN|UNWIND|DELETE|ON CREATE|ON MATCH)\b")
+NODE_PATTERN = re.compile(r"\((\w*)\s*:\s*(\{\w+\}|\w+)\s*\{((?:[^{}]|\{\w+\})*)\}\s*\)")
+NODE_VARIABLE_PATTERN = re.compile(r"\((\w+)\s*:\s*(\{\w+\}|\w+)")
+RELATIONSHIP_PATTERN = re.compile(r"\[(\w+)\s*:\s*(\{\w+\}|\w+)[^\]]*\]")
+MAP_KEY_PATTERN = re.compile(r"(\{\w+\}|\w+)\s*:")
+PROPERTY_PATTERN = re.compile(r"\b(\w+)\.(\w+)\b")
+
+
+def indexed_keys():
+    """Return the set of (label or type, property) pairs backed by an index."""
+    keys = {(label, prop) for _, label, prop in CONSTRAINTS}
+    keys |= {(label, prop) for _, label, prop in NODE_INDEXES}
+    keys |= {(rel_type, prop) for _, rel_type, prop in RELATIONSHIP_INDEXES}
+    return keys
+
+
+# Properties interpolated as lookup keys (see update_orgchart.match_key)
+MATCH_KEYS = ["id", "name"]
+
+
+def _expand(name, known):
+    # Labels and types interpolated with f-strings (e.g. {parent_type}) may be any known one
+    return known if name.startswith("{") else [name]
+
+
+def unindexed_lookups(query: str, keys=None):
+    """Return the (label or type, property) lookups in a query that have no backing index."""
+    keys = indexed_keys() if keys is None else keys
+    problems = []
+
+    # Labels and types of the variables bound in patterns, for the WHERE filters on them
+    variables = {}
+    for var, label in NODE_VARIABLE_PATTERN.findall(query):
+        variables.setdefault(var, set()).update(_expand(label, NODE_LABELS))
+    for var, rel_type in RELATIONSHIP_PATTERN.findall(query):
+        variables.setdefault(var, set()).update(_expand(rel_type, RELATIONSHIP_TYPES))
+
+    parts = CLAUSE_PATTERN.split(query)
+    for keyword, body in zip(parts[1::2], parts[2::2]):
+        if keyword in ("MATCH", "OPTIONAL MATCH", "MERGE"):
+            # Node patterns with a property map are lookups on that property
+            for _, label, props in NODE_PATTERN.findall(body):
+                for key in MAP_KEY_PATTERN.findall(props):
+                    for prop in _expand(key, MATCH_KEYS):
+                        for candidate in _expand(label, NODE_LABELS):
+                            if (candidate, prop) not in keys:
+                                problems.append((candidate, prop))
+        elif keyword == "WHERE":
+            # Filters on node and relationship properties
+            for var, prop in PROPERTY_PATTERN.findall(body):
+                for candidate in variables.get(var, ()):
+                    if (candidate, prop) not in keys:
+                        problems.append((candidate, prop))
+    return sorted(set(problems))
+
+
+def _string_value(node):
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    if isinstance(node, ast.JoinedStr):
+        parts = []
+        for value in node.values:
+            if isinstance(value, ast.Constant):
+                parts.append(value.value)
+            elif isinstance(value, ast.FormattedValue) and isinstance(value.value, ast.Name):
+                parts.append("{" + value.value.id + "}")
+            else:
+                parts.append("{expr}")
+        return "".join(parts)
+    return None
+
+
+def find_queries(paths):
+    """Yield (path, line, query) for every Cypher string literal in the given Python files."""
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            tree = ast.parse(f.read(), filename=path)
+        for node in ast.walk(tree):
+            # Skip the pieces of f-strings; the JoinedStr itself is visited
+            if isinstance(node, ast.JoinedStr):
+                for value in node.values:
+                    value._in_fstring = True
+            if getattr(node, "_in_fstring", False):
+                continue
+            text = _string_value(node)
+            if text and re.search(r"\b(MATCH|MERGE)\b", text):
+                yield path, node.lineno, text
+
+
+def check_queries(paths=None):
+    """Report every query whose lookup keys have no backing index. Returns the number of problems."""
+    if paths is None:
+        base = os.path.dirname(os.path.abspath(__file__))
+        paths = sorted(os.path.join(base, name) for name in os.listdir(base) if name.endswith(".py"))
+
+    problems = 0
+    keys = indexed_keys()
+    for path, line, query in find_queries(paths):
+        for key, prop in unindexed_lookups(query, keys):
+            logger.warning("%s:%d: lookup on %s.%s has no backing index", os.path.relpath(path), line, key, prop)
+            problems += 1
+    logger.info("Index check finished: %d unindexed lookup(s) found.", problems)
+    return problems
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply the graph schema or check queries against it.")
+    parser.add_argument("--check", action="store_true", help="Check the queries in orgchart/ for unindexed lookups")
+    parser.add_argument("--timeout", type=int, default=DEFAULT_INDEX_TIMEOUT, help="Seconds to wait for indexes to come online")
+    parser.add_argument("--log-level", default="INFO")
+    args = parser.parse_args()
+    configure_logging(args.log_level)
+
+    if args.check:
+        sys.exit(1 if check_queries() else 0)
+    with Neo4jInterface() as neo4j_interface:
+        apply_schema(neo4j_interface, args.timeout)
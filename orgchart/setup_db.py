@@ -1,172 +1,293 @@
-import pandas as pd
-from datetime import datetime
-import sys
-import os
-
-# Add the parent directory to sys.path
-sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/../')
-
-from neo4j_util.neo4j_interface import Neo4jInterface
-
-# Initialize Neo4j interface
-neo4j_interface = Neo4jInterface()
-
-def create_constraints(driver: Neo4jInterface):
-    """Create unique constraints for nodes."""
-    constraints = [
-        "CREATE CONSTRAINT government_name_unique IF NOT EXISTS FOR (g:government) REQUIRE g.name IS UNIQUE",
-        "CREATE CONSTRAINT minister_name_unique IF NOT EXISTS FOR (m:minister) REQUIRE m.name IS UNIQUE",
-        "CREATE CONSTRAINT department_name_unique IF NOT EXISTS FOR (d:department) REQUIRE d.name IS UNIQUE"
-    ]
-    for query in constraints:
-        driver.execute_query(query)
-    print("Constraints created successfully.")
-
-
-# Create nodes and relationships from CSV files
-def create_government_nodes(driver: Neo4jInterface, gov_file: str):
-    """Create Government nodes."""
-    governments = pd.read_csv(gov_file)
-    for _, row in governments.iterrows():
-        query = """
-        CREATE (:government {id: $id, name: $name})
-        """
-        parameters = {
-            "id": row["id"],
-            "name": row["name"]
-        }
-        driver.execute_query(query, parameters)
-
-def create_minister_nodes(driver: Neo4jInterface, min_file: str):
-    """Create Minister nodes."""
-    ministers = pd.read_csv(min_file)
-    for _, row in ministers.iterrows():
-        query = """
-        CREATE (:minister {id: $id, name: $name})
-        """
-        parameters = {
-            "id": row["id"],
-            "name": row["name"]
-        }
-        driver.execute_query(query, parameters)
-
-def create_department_nodes(driver: Neo4jInterface, dep_file: str):
-    """Create Department nodes."""
-    departments = pd.read_csv(dep_file)
-    for _, row in departments.iterrows():
-        query = """
-        CREATE (:department {id: $id, name: $name})
-        """
-        parameters = {
-            "id": row["id"],
-            "name": row["name"]
-        }
-        driver.execute_query(query, parameters)
-
-def create_gov_min_relationships(driver: Neo4jInterface, gov_min_file: str):
-    """Create relationships between Government and Ministry."""
-    gov_min = pd.read_csv(gov_min_file)
-    for _, row in gov_min.iterrows():
-        # Check if 'end_date' is empty or missing
-        # end_date = row.get("end_date", None)
-
-        # Convert 'start_date' and 'end_date' to Neo4j's date format
-        start_date = datetime.strptime(row["start_date"], "%Y-%m-%d").date()
-        end_date = (
-            datetime.strptime(row["end_date"], "%Y-%m-%d").date() if row["end_date"] != -1 else -1
-        )
-        
-        # If end_date is not empty, include it in the query
-        if end_date != -1:
-            query = """
-            MATCH (gov:government {id: $gov_id}), (min:minister {id: $min_id})
-            CREATE (gov)-[:HAS_MINISTER {start_date: date($start_date), end_date: date($end_date)}]->(min)
-            """
-            parameters = {
-                "gov_id": row["gov_id"],
-                "min_id": row["min_id"],
-                "start_date": str(start_date),
-                "end_date": str(end_date)
-            }
-        else:
-            # If end_date is empty, exclude it from the query
-            query = """
-            MATCH (gov:government {id: $gov_id}), (min:minister {id: $min_id})
-            CREATE (gov)-[:HAS_MINISTER {start_date: date($start_date)}]->(min)
-            """
-            parameters = {
-                "gov_id": row["gov_id"],
-                "min_id": row["min_id"],
-                "start_date": str(start_date)
-            }
-        
-        # Execute the query
-        driver.execute_query(query, parameters)
-
-
-def create_min_dep_relationships(driver: Neo4jInterface, min_dep_file: str):
-    """Create relationships between Ministry and Department."""
-    min_dep = pd.read_csv(min_dep_file)
-    for _, row in min_dep.iterrows():
-        # Check if 'end_date' is empty or missing
-        # end_date = row.get("end_date", None)
-
-        start_date = datetime.strptime(row["start_date"], "%Y-%m-%d").date()
-        end_date = (
-            datetime.strptime(row["end_date"], "%Y-%m-%d").date() if row["end_date"] != -1 else -1
-        )
-
-        # If end_date is not empty, include it in the query
-        if end_date != -1:
-            query = """
-            MATCH (min:minister {id: $min_id}), (dep:department {id: $dep_id})
-            CREATE (min)-[:HAS_DEPARTMENT {start_date: date($start_date), end_date: date($end_date)}]->(dep)
-            """
-            parameters = {
-                "min_id": row["min_id"],
-                "dep_id": row["dep_id"],
-                "start_date": end_date,
-                "end_date": end_date
-            }
-        else:
-            # If end_date is empty, exclude it from the query
-            query = """
-            MATCH (min:minister {id: $min_id}), (dep:department {id: $dep_id})
-            CREATE (min)-[:HAS_DEPARTMENT {start_date: date($start_date)}]->(dep)
-            """
-            parameters = {
-                "min_id": row["min_id"],
-                "dep_id": row["dep_id"],
-                "start_date": start_date
-            }
-        
-        # Execute the query
-        driver.execute_query(query, parameters)
-
-
-# Main execution
-def load_data_to_neo4j():
-    
-    # Create constraints to ensure unique names
-    create_constraints(neo4j_interface)
-
-    # File paths (replace with your actual file paths)
-    government_file = "../data/2015-09-21/government.csv"
-    ministry_file = "../data/2015-09-21/minister.csv"
-    gov_min_file = "../data/2015-09-21/gov-min.csv"
-    department_file = "../data/2015-09-21/department.csv"
-    min_dep_file = "../data/2015-09-21/min-dep.csv"
-
-    # Create nodes
-    create_government_nodes(neo4j_interface, government_file)
-    create_minister_nodes(neo4j_interface, ministry_file)
-    create_department_nodes(neo4j_interface, department_file)
-
-    # Create relationships
-    create_gov_min_relationships(neo4j_interface, gov_min_file)
-    create_min_dep_relationships(neo4j_interface, min_dep_file)
-
-    print("Data successfully loaded into Neo4j.")
-
-if __name__ == "__main__":
-    load_data_to_neo4j()
+import argparse
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import sys
+import os
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/../')
+
+from neo4j_util.neo4j_interface import Neo4jInterface, DEFAULT_BATCH_SIZE
+from neo4j_util.metrics import add_instrumentation_arguments, configure_logging, report_metrics
+from orgchart.schema import apply_schema
+from orgchart.ingestion import node_rows, relationship_rows
+from orgchart.current_view import rebuild_current_view
+from orgchart.binary_snapshot import write_from_neo4j
+from orgchart.read_service import record_gazette_commit
+
+logger = logging.getLogger(__name__)
+
+# Initialize Neo4j interface
+neo4j_interface = Neo4jInterface()
+
+def create_constraints(driver: Neo4jInterface):
+    """Create the constraints and indexes the loaders rely on and wait for them to come online."""
+    apply_schema(driver)
+
+
+# Create nodes and relationships from CSV files
+def create_government_nodes(driver: Neo4jInterface, gov_file: str):
+    """Create Government nodes."""
+    for row in node_rows(gov_file):
+        query = """
+        CREATE (:government {id: $id, name: $name})
+        """
+        driver.execute_query(query, row)
+
+def create_minister_nodes(driver: Neo4jInterface, min_file: str):
+    """Create Minister nodes."""
+    for row in node_rows(min_file):
+        query = """
+        CREATE (:minister {id: $id, name: $name})
+        """
+        driver.execute_query(query, row)
+
+def create_department_nodes(driver: Neo4jInterface, dep_file: str):
+    """Create Department nodes."""
+    for row in node_rows(dep_file):
+        query = """
+        CREATE (:department {id: $id, name: $name})
+        """
+        driver.execute_query(query, row)
+
+def create_gov_min_relationships(driver: Neo4jInterface, gov_min_file: str):
+    """Create relationships between Government and Ministry."""
+    # Dates arrive as ISO strings, with None for the -1 end date
+    for row in relationship_rows(gov_min_file, "gov_id", "min_id"):
+        # If end_date is not empty, include it in the query
+        if row["end_date"] is not None:
+            query = """
+            MATCH (gov:government {id: $gov_id}), (min:minister {id: $min_id})
+            CREATE (gov)-[:HAS_MINISTER {start_date: date($start_date), end_date: date($end_date)}]->(min)
+            """
+        else:
+            # If end_date is empty, exclude it from the query
+            query = """
+            MATCH (gov:government {id: $gov_id}), (min:minister {id: $min_id})
+            CREATE (gov)-[:HAS_MINISTER {start_date: date($start_date)}]->(min)
+            """
+
+        # Execute the query
+        driver.execute_query(query, row)
+
+
+def create_min_dep_relationships(driver: Neo4jInterface, min_dep_file: str):
+    """Create relationships between Ministry and Department."""
+    # Dates arrive as ISO strings, with None for the -1 end date
+    for row in relationship_rows(min_dep_file, "min_id", "dep_id"):
+        # If end_date is not empty, include it in the query
+        if row["end_date"] is not None:
+            query = """
+            MATCH (min:minister {id: $min_id}), (dep:department {id: $dep_id})
+            CREATE (min)-[:HAS_DEPARTMENT {start_date: date($start_date), end_date: date($end_date)}]->(dep)
+            """
+        else:
+            # If end_date is empty, exclude it from the query
+            query = """
+            MATCH (min:minister {id: $min_id}), (dep:department {id: $dep_id})
+            CREATE (min)-[:HAS_DEPARTMENT {start_date: date($start_date)}]->(dep)
+            """
+
+        # Execute the query
+        driver.execute_query(query, row)
+
+
+# Bulk loading: one UNWIND statement and one transaction per batch of rows
+NODE_BATCH_QUERY = """
+UNWIND $rows AS row
+CREATE (:{label} {{id: row.id, name: row.name}})
+"""
+
+GOV_MIN_BATCH_QUERY = """
+UNWIND $rows AS row
+MATCH (gov:government {id: row.gov_id}), (min:minister {id: row.min_id})
+CREATE (gov)-[:HAS_MINISTER {start_date: date(row.start_date), end_date: date(row.end_date)}]->(min)
+"""
+
+MIN_DEP_BATCH_QUERY = """
+UNWIND $rows AS row
+MATCH (min:minister {id: row.min_id}), (dep:department {id: row.dep_id})
+CREATE (min)-[:HAS_DEPARTMENT {start_date: date(row.start_date), end_date: date(row.end_date)}]->(dep)
+"""
+
+def run_in_batches(driver: Neo4jInterface, stage: str, query: str, rows: list, batch_size: int = DEFAULT_BATCH_SIZE):
+    """Send rows to an UNWIND query in batches and report the throughput of the stage."""
+    start = time.perf_counter()
+    # One retried write transaction per batch
+    driver.execute_many(query, rows, batch_size)
+    elapsed = time.perf_counter() - start
+    rate = len(rows) / elapsed if elapsed > 0 else float("inf")
+    logger.info("%s: %d rows in %.2fs (%.0f rows/sec)", stage, len(rows), elapsed, rate)
+
+def bulk_create_nodes(driver: Neo4jInterface, label: str, node_file: str, batch_size: int = DEFAULT_BATCH_SIZE):
+    """Create nodes of the given label in batches."""
+    rows = node_rows(node_file)
+    run_in_batches(driver, f"{label} nodes", NODE_BATCH_QUERY.format(label=label), rows, batch_size)
+
+def bulk_create_gov_min_relationships(driver: Neo4jInterface, gov_min_file: str, batch_size: int = DEFAULT_BATCH_SIZE):
+    """Create relationships between Government and Ministry in batches."""
+    rows = relationship_rows(gov_min_file, "gov_id", "min_id")
+    run_in_batches(driver, "HAS_MINISTER relationships", GOV_MIN_BATCH_QUERY, rows, batch_size)
+
+def bulk_create_min_dep_relationships(driver: Neo4jInterface, min_dep_file: str, batch_size: int = DEFAULT_BATCH_SIZE):
+    """Create relationships between Ministry and Department in batches."""
+    rows = relationship_rows(min_dep_file, "min_id", "dep_id")
+    run_in_batches(driver, "HAS_DEPARTMENT relationships", MIN_DEP_BATCH_QUERY, rows, batch_size)
+
+
+# Parallel loading: rows are partitioned by start node so that no two workers write
+# relationships on the same minister (or government) node
+def partition_rows(rows: list, key: str, partitions: int):
+    """Split rows into at most `partitions` lists such that all rows with the same key land in the same list.
+
+    Keys are assigned largest group first to the currently smallest partition, which
+    keeps the partitions balanced when a few start nodes hold most of the rows.
+    """
+    groups = {}
+    for row in rows:
+        groups.setdefault(row[key], []).append(row)
+    buckets = [[] for _ in range(min(partitions, len(groups)))]
+    for group in sorted(groups.values(), key=len, reverse=True):
+        min(buckets, key=len).extend(group)
+    return buckets
+
+def load_partition(driver: Neo4jInterface, query: str, rows: list, batch_size: int = DEFAULT_BATCH_SIZE):
+    """Load one partition in the worker's own session. Returns (rows, seconds)."""
+    start = time.perf_counter()
+    with driver.new_session() as session:
+        # Each batch is a managed write transaction, retried on deadlocks and other transient errors
+        driver.execute_many(query, rows, batch_size, session=session)
+    return len(rows), time.perf_counter() - start
+
+def _load_partition_in_process(settings: dict, query: str, rows: list, batch_size: int):
+    # Runs in a worker process, which needs its own driver
+    with Neo4jInterface(**settings) as driver:
+        return load_partition(driver, query, rows, batch_size)
+
+def run_in_parallel(driver: Neo4jInterface, stage: str, query: str, rows: list, key: str, workers: int,
+                    batch_size: int = DEFAULT_BATCH_SIZE, processes: bool = False):
+    """Load rows with a pool of workers, one partition per worker, and report the throughput of each worker.
+
+    Relationships sharing an end node (e.g. a department with an ended and an active
+    minister) can still meet in two workers; those deadlocks are retried by the driver.
+    """
+    if not rows:
+        logger.info("%s: no rows to load", stage)
+        return
+    partitions = partition_rows(rows, key, workers)
+    start = time.perf_counter()
+    if processes:
+        settings = {"uri": driver.uri, "user": driver.user, "password": driver.password, "database": driver.database,
+                    "max_pool_size": driver.max_pool_size, "fetch_size": driver.fetch_size,
+                    "max_retry_time": driver.max_retry_time}
+        with ProcessPoolExecutor(max_workers=len(partitions)) as pool:
+            futures = [pool.submit(_load_partition_in_process, settings, query, partition, batch_size)
+                       for partition in partitions]
+            results = [future.result() for future in futures]
+    else:
+        with ThreadPoolExecutor(max_workers=len(partitions)) as pool:
+            futures = [pool.submit(load_partition, driver, query, partition, batch_size) for partition in partitions]
+            results = [future.result() for future in futures]
+    elapsed = time.perf_counter() - start
+
+    for worker, (count, seconds) in enumerate(results):
+        rate = count / seconds if seconds > 0 else float("inf")
+        logger.info("%s worker %d: %d rows in %.2fs (%.0f rows/sec)", stage, worker, count, seconds, rate)
+    rate = len(rows) / elapsed if elapsed > 0 else float("inf")
+    logger.info("%s: %d rows in %.2fs (%.0f rows/sec) with %d worker(s)", stage, len(rows), elapsed, rate, len(partitions))
+
+def parallel_create_gov_min_relationships(driver: Neo4jInterface, gov_min_file: str, workers: int,
+                                          batch_size: int = DEFAULT_BATCH_SIZE, processes: bool = False):
+    """Create relationships between Government and Ministry with a worker pool, partitioned by government.
+
+    Every HAS_MINISTER row of a government locks that government's node, so with a
+    single government (as in the gazette snapshots) all rows land in one partition
+    and are loaded by one worker; only min-dep.csv is spread across the pool.
+    """
+    rows = relationship_rows(gov_min_file, "gov_id", "min_id")
+    run_in_parallel(driver, "HAS_MINISTER relationships", GOV_MIN_BATCH_QUERY, rows, "gov_id", workers, batch_size, processes)
+
+def parallel_create_min_dep_relationships(driver: Neo4jInterface, min_dep_file: str, workers: int,
+                                          batch_size: int = DEFAULT_BATCH_SIZE, processes: bool = False):
+    """Create relationships between Ministry and Department with a worker pool, partitioned by minister."""
+    rows = relationship_rows(min_dep_file, "min_id", "dep_id")
+    run_in_parallel(driver, "HAS_DEPARTMENT relationships", MIN_DEP_BATCH_QUERY, rows, "min_id", workers, batch_size, processes)
+
+
+# Main execution
+def load_data_to_neo4j(batch_size=None, data_folder="../data/2015-09-21", driver: Neo4jInterface = None,
+                       workers=None, processes=False, binary_snapshot=None):
+    """Load a snapshot row by row, or in UNWIND batches when batch_size is given.
+
+    With workers, relationships are loaded in batches by a pool of that many
+    threads (or processes), partitioned by start node. With binary_snapshot, the
+    loaded graph is also written to that file (see binary_snapshot.py).
+    """
+    driver = driver or neo4j_interface
+    if workers and not batch_size:
+        batch_size = DEFAULT_BATCH_SIZE
+    
+    # File paths
+    government_file = os.path.join(data_folder, "government.csv")
+    ministry_file = os.path.join(data_folder, "minister.csv")
+    gov_min_file = os.path.join(data_folder, "gov-min.csv")
+    department_file = os.path.join(data_folder, "department.csv")
+    min_dep_file = os.path.join(data_folder, "min-dep.csv")
+
+    # Reuse one session for every statement of the load
+    with driver.session():
+        # Create constraints and indexes, and wait until they are online
+        create_constraints(driver)
+
+        if batch_size:
+            # Create nodes
+            bulk_create_nodes(driver, "government", government_file, batch_size)
+            bulk_create_nodes(driver, "minister", ministry_file, batch_size)
+            bulk_create_nodes(driver, "department", department_file, batch_size)
+
+            # Create relationships
+            if workers:
+                parallel_create_gov_min_relationships(driver, gov_min_file, workers, batch_size, processes)
+                parallel_create_min_dep_relationships(driver, min_dep_file, workers, batch_size, processes)
+            else:
+                bulk_create_gov_min_relationships(driver, gov_min_file, batch_size)
+                bulk_create_min_dep_relationships(driver, min_dep_file, batch_size)
+        else:
+            # Create nodes
+            create_government_nodes(driver, government_file)
+            create_minister_nodes(driver, ministry_file)
+            create_department_nodes(driver, department_file)
+
+            # Create relationships
+            create_gov_min_relationships(driver, gov_min_file)
+            create_min_dep_relationships(driver, min_dep_file)
+
+        # Materialize the current (open) relationships for today's org chart
+        rebuild_current_view(driver)
+
+        # A snapshot can change any date: read services drop every cached result
+        with driver.transaction() as tx:
+            record_gazette_commit(tx, data_folder)
+
+    logger.info("Data successfully loaded into Neo4j.")
+
+    if binary_snapshot:
+        logger.info("Binary snapshot written to %s: %s", binary_snapshot, write_from_neo4j(driver, binary_snapshot))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load the initial gazette snapshot into Neo4j.")
+    parser.add_argument("data_folder", nargs="?", default="../data/2015-09-21", help="Gazette snapshot directory")
+    parser.add_argument("--batch-size", type=int, default=None,
+                        help=f"Load rows in UNWIND batches of this size (e.g. {DEFAULT_BATCH_SIZE}) instead of one query per row")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Load relationships with this many parallel workers, partitioned by start node")
+    parser.add_argument("--processes", action="store_true", help="Use worker processes instead of threads")
+    parser.add_argument("--binary-snapshot", metavar="PATH", help="Also write the loaded graph to this binary snapshot file")
+    add_instrumentation_arguments(parser)
+    args = parser.parse_args()
+    configure_logging(args.log_level)
+    neo4j_interface.metrics.profile_slowest = args.profile_slowest
+    load_data_to_neo4j(batch_size=args.batch_size, data_folder=args.data_folder,
+                       workers=args.workers, processes=args.processes, binary_snapshot=args.binary_snapshot)
+    report_metrics(neo4j_interface, args)
@@ -0,0 +1,165 @@
+import argparse
+import csv
+import re
+import sys
+import os
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/../')
+
+from orgchart.ingestion import AMENDMENT_COLUMNS
+
+
+def _read_csv(path):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        yield from csv.DictReader(f)
+
+
+def _is_active(row):
+    return row["end_date"].strip() in ("-1", "")
+
+
+def load_active_structure(snapshot_dir):
+    """Return the active (government, minister) and (minister, department) name pairs of a snapshot.
+
+    Relationship rows are resolved to names with a hash join on the node ids,
+    since ids are specific to the gazette that issued the snapshot.
+    """
+    names = {}
+    for file_name in ("government.csv", "minister.csv", "department.csv"):
+        for row in _read_csv(os.path.join(snapshot_dir, file_name)):
+            names[row["id"]] = row["name"]
+
+    ministers = {
+        (names[row["gov_id"]], names[row["min_id"]])
+        for row in _read_csv(os.path.join(snapshot_dir, "gov-min.csv"))
+        if _is_active(row)
+    }
+    departments = {
+        (names[row["min_id"]], names[row["dep_id"]])
+        for row in _read_csv(os.path.join(snapshot_dir, "min-dep.csv"))
+        if _is_active(row)
+    }
+    return ministers, departments
+
+
+def graph_structure(graph):
+    """Return the open (government, minister) and (minister, department) name pairs of an OrgGraph.
+
+    Same shape as load_active_structure, so the state in the database (see
+    preflight.load_current_graph) can be diffed against a snapshot.
+    """
+    structure = {"HAS_MINISTER": set(), "HAS_DEPARTMENT": set()}
+    for rel_type, source_id, target_id, _, end_date in graph.relationships():
+        if rel_type in structure and end_date is None:
+            source, target = graph.by_id[source_id], graph.by_id[target_id]
+            structure[rel_type].add((graph.node_name[source], graph.node_name[target]))
+    return structure["HAS_MINISTER"], structure["HAS_DEPARTMENT"]
+
+
+def gazette_prefix(snapshot_dir):
+    """Derive the gazette number used in ids (e.g. 2611/11) from a snapshot's government id."""
+    for row in _read_csv(os.path.join(snapshot_dir, "government.csv")):
+        return row["id"].split("_")[0]
+    raise ValueError(f"{snapshot_dir} has no government")
+
+
+def diff_snapshots(old_dir, new_dir, prefix, date):
+    """Compute the Add/Move/Terminate transactions that turn the old snapshot into the new one.
+
+    Returns transaction dicts in the load_transactions format, ordered so that
+    ministers are added before departments are attached to them and departments
+    are detached before their ministers are terminated.
+    """
+    return diff_structures(load_active_structure(old_dir), load_active_structure(new_dir), prefix, date)
+
+
+def diff_structures(old, new, prefix, date):
+    """Compute the transactions between two (ministers, departments) structures, as diff_snapshots does."""
+    old_ministers, old_departments = old
+    new_ministers, new_departments = new
+
+    # Parents of every department whose placement changed
+    removed_by_department = {}
+    for minister, department in old_departments - new_departments:
+        removed_by_department.setdefault(department, []).append(minister)
+    added_by_department = {}
+    for minister, department in new_departments - old_departments:
+        added_by_department.setdefault(department, []).append(minister)
+
+    adds = [
+        {"file_type": "Add", "parent": government, "parent_type": "government", "child": minister,
+         "child_type": "minister", "rel_type": "HAS_MINISTER"}
+        for government, minister in sorted(new_ministers - old_ministers)
+    ]
+    moves = []
+    department_terminations = []
+    for department in sorted(set(removed_by_department) | set(added_by_department)):
+        removed = sorted(removed_by_department.get(department, []))
+        added = sorted(added_by_department.get(department, []))
+        if len(removed) == 1 and len(added) == 1:
+            moves.append({"file_type": "Move", "old_parent": removed[0], "new_parent": added[0],
+                          "child": department, "type": "department"})
+            continue
+        for minister in added:
+            adds.append({"file_type": "Add", "parent": minister, "parent_type": "minister", "child": department,
+                         "child_type": "department", "rel_type": "HAS_DEPARTMENT"})
+        for minister in removed:
+            department_terminations.append({"file_type": "Terminate", "parent": minister, "parent_type": "minister",
+                                            "child": department, "child_type": "department",
+                                            "rel_type": "HAS_DEPARTMENT"})
+    minister_terminations = [
+        {"file_type": "Terminate", "parent": government, "parent_type": "government", "child": minister,
+         "child_type": "minister", "rel_type": "HAS_MINISTER"}
+        for government, minister in sorted(old_ministers - new_ministers)
+    ]
+
+    transactions = adds + moves + department_terminations + minister_terminations
+    # Zero-padded so that sorting transaction ids as strings keeps this order
+    width = max(2, len(str(len(transactions))))
+    for number, transaction in enumerate(transactions, start=1):
+        transaction["transaction_id"] = f"{prefix}_tr_{number:0{width}d}"
+        transaction["date"] = date
+    return transactions
+
+
+def write_amendments(transactions, output_dir):
+    """Write transactions as an amendment gazette directory readable by load_transactions."""
+    os.makedirs(output_dir, exist_ok=True)
+    for file_type, (file_name, columns) in AMENDMENT_COLUMNS.items():
+        with open(os.path.join(output_dir, file_name), "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=columns, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(transaction for transaction in transactions if transaction["file_type"] == file_type)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Derive amendment transactions from two full gazette snapshots.")
+    parser.add_argument("old_dir", help="Snapshot currently in the database")
+    parser.add_argument("new_dir", help="New full snapshot")
+    parser.add_argument("output_dir", help="Directory to write the amendment CSVs to")
+    parser.add_argument("--date", help="Effective date (defaults to the new snapshot's directory name)")
+    parser.add_argument("--prefix", help="Gazette number used in ids (defaults to the new snapshot's government id prefix)")
+    parser.add_argument("--apply", action="store_true", help="Apply the derived transactions to the database")
+    args = parser.parse_args()
+
+    date = args.date
+    if date is None:
+        match = re.match(r"\d{4}-\d{2}-\d{2}", os.path.basename(os.path.normpath(args.new_dir)))
+        if not match:
+            parser.error("--date is required when the new snapshot directory is not named by date")
+        date = match.group(0)
+    prefix = args.prefix or gazette_prefix(args.new_dir)
+
+    transactions = diff_snapshots(args.old_dir, args.new_dir, prefix, date)
+    write_amendments(transactions, args.output_dir)
+    counts = {}
+    for transaction in transactions:
+        counts[transaction["file_type"]] = counts.get(transaction["file_type"], 0) + 1
+    print(f"Derived {len(transactions)} transaction(s) {counts} into {args.output_dir}")
+
+    if args.apply and transactions:
+        from neo4j_util.metrics import configure_logging
+        from orgchart.update_orgchart import execute_transactions, gazette_name, load_transactions
+        configure_logging()
+        execute_transactions(load_transactions(args.output_dir), gazette=gazette_name(args.output_dir))
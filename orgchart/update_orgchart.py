@@ -1,43 +1,57 @@
-import pandas as pd
+import argparse
+import logging
+import time
 import sys
 import os
-from datetime import datetime
 
 # Add the parent directory to sys.path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/../')
 
-from neo4j_util.neo4j_interface import Neo4jInterface
+from neo4j_util.neo4j_interface import Neo4jInterface, batched
+from neo4j_util.metrics import add_instrumentation_arguments, configure_logging, report_metrics
+from orgchart.schema import apply_schema
+from orgchart.amendment_planner import AmendmentPlan, execute_plan
+from orgchart.entity_registry import EntityRegistry
+from orgchart.ingestion import parse_date, parse_name_list, read_amendments
+from orgchart.preflight import log_problems, validate_transactions
+from orgchart.current_view import refresh_current, touched_entities
+from orgchart.lineage import record_lineage
+from orgchart.binary_snapshot import write_from_neo4j
+from orgchart.journal import COMMITTED, FAILED, PREPARED, CommitJournal, default_journal_path
+from orgchart.read_service import earliest_date, record_gazette_commit
+from orgchart.name_index import NameIndex, resolve_transactions
+from orgchart.consistency import applied_transactions
+
+logger = logging.getLogger(__name__)
 
 # Initialize Neo4j interface
 neo4j_interface = Neo4jInterface()
 
+DEFAULT_AMENDMENT_DIR = os.path.join("..", "data/2015-10-15_2")
+
 # Function to load and process transactions from files
-def load_transactions():
-    base_folder = os.path.join("..", "data/2015-10-15_2")  # Adjust path if needed
-    files = {
-        "Rename": os.path.join(base_folder, "RENAME.csv"),
-        "Move": os.path.join(base_folder, "MOVE.csv"),
-        "Add": os.path.join(base_folder, "ADD.csv"),
-        "Terminate": os.path.join(base_folder, "TERMINATE.csv"),
-        "Merge": os.path.join(base_folder, "MERGE.csv")
-    }
-
-    transactions = []
-    for file_type, file_path in files.items():
-        df = pd.read_csv(file_path)
-        df["file_type"] = file_type  # Add file type to each transaction
-        transactions.extend(df.to_dict("records"))
-
-    # Sort transactions by transaction_id
-    transactions.sort(key=lambda x: x["transaction_id"])
-    return transactions
+def load_transactions(base_folder=DEFAULT_AMENDMENT_DIR):  # Adjust path if needed
+    """Read every amendment file of a gazette and return the transactions sorted by transaction_id."""
+    # Amendment files are small, so they are read with the csv module rather than pandas
+    return read_amendments(base_folder)
+
+def gazette_name(folder):
+    """Return the name a gazette's commits are recorded under: its directory name."""
+    return os.path.basename(os.path.normpath(folder))
+
+def match_key(registry, label, name):
+    """Return the property and value to match an entity on: its id when the registry knows it, else its name."""
+    if registry is not None:
+        entity_id = registry.lookup(label, name)
+        if entity_id is not None:
+            return "id", entity_id
+    return "name", name
 
 # Function to handle renaming of a minister
-def rename_minister(tx, transaction, entity_counters):
+def rename_minister(tx, transaction, entity_counters, registry=None):
     try:
         
-        if isinstance(transaction["date"], str):
-            transaction["date"] = datetime.strptime(transaction["date"].strip(), "%Y-%m-%d").date()
+        transaction["date"] = parse_date(transaction["date"])
 
         # Create new minister
         add_entity_transaction = {
@@ -51,17 +65,23 @@ def rename_minister(tx, transaction, entity_counters):
         }
 
         # Call add_entity to create the new minister and establish the relationship
-        new_minister_counter = add_entity(tx, add_entity_transaction, entity_counters)
+        new_minister_counter = add_entity(tx, add_entity_transaction, entity_counters, registry)
+
+        old_key, old = match_key(registry, "minister", transaction["old"])
+        new_key, new = match_key(registry, "minister", transaction["new"])
 
         # Create relationships between the old minister's departments and the new minister
-        query_transfer = """
-        MATCH (old:minister {name: $old})-[r:HAS_DEPARTMENT]->(d)
+        query_transfer = f"""
+        MATCH (old:minister {{{old_key}: $old}})-[r:HAS_DEPARTMENT]->(d)
         WHERE r.end_date IS NULL
-        MATCH (new:minister {name: $new})
-        MERGE (new)-[:HAS_DEPARTMENT {start_date: date($start_date)}]->(d)
+        MATCH (new:minister {{{new_key}: $new}})
+        MERGE (new)-[r_new:HAS_DEPARTMENT {{start_date: date($start_date)}}]->(d)
+        ON CREATE SET r_new.transaction_id = $transaction_id
         """
-        result = tx.run(query_transfer, old=transaction["old"], new=transaction["new"], start_date=transaction["date"])
-        print(f"Transferred departments to {transaction['new']}, Result: {result.consume().counters.relationships_created} relationship(s) created")
+        result = tx.run(query_transfer, old=old, new=new, start_date=transaction["date"],
+                        transaction_id=transaction["transaction_id"])
+        logger.debug("Transferred departments to %s, Result: %d relationship(s) created",
+                     transaction['new'], result.consume().counters.relationships_created)
 
         # Terminate old government-to-minister relationship
         terminate_gov_minister_transaction = {
@@ -70,48 +90,62 @@ def rename_minister(tx, transaction, entity_counters):
             "date": transaction["date"],
             "parent_type": "government",
             "child_type": "minister",
-            "rel_type": "HAS_MINISTER"
+            "rel_type": "HAS_MINISTER",
+            "transaction_id": transaction["transaction_id"]
         }
-        terminate_entity(tx, terminate_gov_minister_transaction)
+        terminate_entity(tx, terminate_gov_minister_transaction, registry)
 
         # Terminate old minister-to-department relationships
-        query_terminate_departments = """
-        MATCH (old:minister {name: $old})-[r:HAS_DEPARTMENT]->(d)
+        query_terminate_departments = f"""
+        MATCH (old:minister {{{old_key}: $old}})-[r:HAS_DEPARTMENT]->(d)
         WHERE r.end_date IS NULL
-        SET r.end_date = date($end_date)
+        SET r.end_date = date($end_date), r.end_transaction_id = $transaction_id
         """
-        result = tx.run(query_terminate_departments, old=transaction["old"], end_date=transaction["date"])
-        print(f"Terminated department relationships, Result: {result.consume().counters.properties_set} property(ies) set")
+        result = tx.run(query_terminate_departments, old=old, end_date=transaction["date"],
+                        transaction_id=transaction["transaction_id"])
+        logger.debug("Terminated department relationships, Result: %d property(ies) set",
+                     result.consume().counters.properties_set)
 
         # Create RENAMED_TO relationship between old and new ministers
-        query_rename_rel = """
-        MATCH (old:minister {name: $old}), (new:minister {name: $new})
-        MERGE (old)-[:RENAMED_TO {date: date($date)}]->(new)
+        query_rename_rel = f"""
+        MATCH (old:minister {{{old_key}: $old}}), (new:minister {{{new_key}: $new}})
+        MERGE (old)-[r:RENAMED_TO {{date: date($date)}}]->(new)
+        ON CREATE SET r.transaction_id = $transaction_id
         """
-        result = tx.run(query_rename_rel, old=transaction["old"], new=transaction["new"], date=transaction["date"])
-        print(f"Created RENAMED_TO relationship, Result: {result.consume().counters.relationships_created} relationship(s) created")
+        result = tx.run(query_rename_rel, old=old, new=new, date=transaction["date"],
+                        transaction_id=transaction["transaction_id"])
+        logger.debug("Created RENAMED_TO relationship, Result: %d relationship(s) created",
+                     result.consume().counters.relationships_created)
+
+        # Everything that lived on as the old minister now lives on as the new one
+        record_lineage(tx, "minister", [{"old": transaction["old"], "new": transaction["new"], "date": transaction["date"]}])
 
         return new_minister_counter
 
     except Exception as e:
-        print(f"Error processing rename transaction: {transaction['transaction_id']}, Error: {e}")
+        logger.error("Error processing rename transaction: %s, Error: %s", transaction['transaction_id'], e)
         raise  # Rethrow the exception to allow rollback
     
 
 # Function to handle moving a department
-def move_department(tx, transaction):
+def move_department(tx, transaction, registry=None):
     try:
 
-        if isinstance(transaction["date"], str):
-            transaction["date"] = datetime.strptime(transaction["date"].strip(), "%Y-%m-%d").date()
+        transaction["date"] = parse_date(transaction["date"])
+
+        new_parent_key, new_parent = match_key(registry, "minister", transaction["new_parent"])
+        child_key, child = match_key(registry, "department", transaction["child"])
 
         # Create new relationships between the new minister parent and the department child
-        query_create = """
-        MATCH (new_parent:minister {name: $new_parent}), (child:department {name: $child})
-        MERGE (new_parent)-[:HAS_DEPARTMENT {start_date: date($start_date)}]->(child)
+        query_create = f"""
+        MATCH (new_parent:minister {{{new_parent_key}: $new_parent}}), (child:department {{{child_key}: $child}})
+        MERGE (new_parent)-[r:HAS_DEPARTMENT {{start_date: date($start_date)}}]->(child)
+        ON CREATE SET r.transaction_id = $transaction_id
         """
-        result = tx.run(query_create, new_parent=transaction["new_parent"], child=transaction["child"], start_date=transaction["date"])
-        print(f"Created new department relationship, Result: {result.consume().counters.relationships_created} relationship(s) created")
+        result = tx.run(query_create, new_parent=new_parent, child=child, start_date=transaction["date"],
+                        transaction_id=transaction["transaction_id"])
+        logger.debug("Created new department relationship, Result: %d relationship(s) created",
+                     result.consume().counters.relationships_created)
 
         # Terminate the old parent to department relationships
         terminate_relationship_transaction = {
@@ -120,19 +154,19 @@ def move_department(tx, transaction):
             "date": transaction["date"],
             "parent_type": "minister",
             "child_type": "department",
-            "rel_type": "HAS_DEPARTMENT"
+            "rel_type": "HAS_DEPARTMENT",
+            "transaction_id": transaction["transaction_id"]
         }
-        terminate_entity(tx, terminate_relationship_transaction)
+        terminate_entity(tx, terminate_relationship_transaction, registry)
 
     except Exception as e:
-        print(f"Error processing move transaction: {transaction['transaction_id']}, Error: {e}")
+        logger.error("Error processing move transaction: %s, Error: %s", transaction['transaction_id'], e)
         raise  # Rethrow the exception to allow rollback
 
-def add_entity(tx, transaction, entity_counters):
+def add_entity(tx, transaction, entity_counters, registry=None):
     try:
 
-        if isinstance(transaction["date"], str):
-            transaction["date"] = datetime.strptime(transaction["date"].strip(), "%Y-%m-%d").date()
+        transaction["date"] = parse_date(transaction["date"])
 
         # Extract details from the transaction
         parent = transaction["parent"]
@@ -155,30 +189,39 @@ def add_entity(tx, transaction, entity_counters):
         query_create_entity = f"""
         MERGE (child:{child_type} {{name: $child}})
         ON CREATE SET child.id = $entity_id
+        RETURN child.id AS id
         """
         result = tx.run(query_create_entity, child=child, entity_id=new_entity_id)
-        print(f"Created entity: {child} ({child_type}), Result: {result.consume().counters.nodes_created} node(s) created")
+        child_id = result.single()["id"]
+        logger.debug("Created entity: %s (%s), Result: %d node(s) created",
+                     child, child_type, result.consume().counters.nodes_created)
+        if registry is not None:
+            registry.register(child_type, child, child_id)
+
+        parent_key, parent_value = match_key(registry, parent_type, parent)
 
         # Create the relationship from the parent to the child
         query_create_relationship = f"""
-        MATCH (parent:{parent_type} {{name: $parent}}), (child:{child_type} {{name: $child}})
-        MERGE (parent)-[:{rel_type} {{start_date: date($start_date)}}]->(child)
+        MATCH (parent:{parent_type} {{{parent_key}: $parent}}), (child:{child_type} {{id: $child_id}})
+        MERGE (parent)-[r:{rel_type} {{start_date: date($start_date)}}]->(child)
+        ON CREATE SET r.transaction_id = $transaction_id
         """
-        result = tx.run(query_create_relationship, parent=parent, child=child, start_date=date)
-        print(f"Created relationship from {parent} to {child}, Result: {result.consume().counters.relationships_created} relationship(s) created")
+        result = tx.run(query_create_relationship, parent=parent_value, child_id=child_id, start_date=date,
+                        transaction_id=transaction_id)
+        logger.debug("Created relationship from %s to %s, Result: %d relationship(s) created",
+                     parent, child, result.consume().counters.relationships_created)
 
         # Increment the counter for the specific entity type
         return entity_counter
 
     except Exception as e:
-        print(f"Error processing add transaction: {transaction['transaction_id']}, Error: {e}")
+        logger.error("Error processing add transaction: %s, Error: %s", transaction['transaction_id'], e)
         raise  # Rethrow the exception to allow rollback
 
-def terminate_entity(tx, transaction):
+def terminate_entity(tx, transaction, registry=None):
     try:
 
-        if isinstance(transaction["date"], str):
-            transaction["date"] = datetime.strptime(transaction["date"].strip(), "%Y-%m-%d").date()
+        transaction["date"] = parse_date(transaction["date"])
 
         # Extract details from the transaction
         parent = transaction["parent"]
@@ -188,27 +231,31 @@ def terminate_entity(tx, transaction):
         child_type = transaction["child_type"]
         rel_type = transaction["rel_type"]
 
+        parent_key, parent_value = match_key(registry, parent_type, parent)
+        child_key, child_value = match_key(registry, child_type, child)
+
         # Match the parent and child nodes and the specified relationship
         query_terminate_relationship = f"""
-        MATCH (parent:{parent_type} {{name: $parent}})-[rel:{rel_type}]-(child:{child_type} {{name: $child}})
+        MATCH (parent:{parent_type} {{{parent_key}: $parent}})-[rel:{rel_type}]-(child:{child_type} {{{child_key}: $child}})
         WHERE rel.end_date is NULL
-        SET rel.end_date = date($end_date)
+        SET rel.end_date = date($end_date), rel.end_transaction_id = $transaction_id
         """
-        result = tx.run(query_terminate_relationship, parent=parent, child=child, end_date=date)
-        print(f"Terminated relationship from {parent} to {child}, Result: {result.consume().counters.properties_set} property(ies) set")
+        result = tx.run(query_terminate_relationship, parent=parent_value, child=child_value, end_date=date,
+                        transaction_id=transaction["transaction_id"])
+        logger.debug("Terminated relationship from %s to %s, Result: %d property(ies) set",
+                     parent, child, result.consume().counters.properties_set)
 
     except Exception as e:
-        print(f"Error processing terminate transaction: {transaction['transaction_id']}, Error: {e}")
+        logger.error("Error processing terminate transaction: %s, Error: %s", transaction['transaction_id'], e)
         raise  # Rethrow the exception to allow rollback
 
-def merge_ministers(tx, transaction, entity_counters):
+def merge_ministers(tx, transaction, entity_counters, registry=None):
     try:
 
-        if isinstance(transaction["date"], str):
-            transaction["date"] = datetime.strptime(transaction["date"].strip(), "%Y-%m-%d").date()
+        transaction["date"] = parse_date(transaction["date"])
 
         # Parse the old ministers array from the transaction
-        old_ministers = eval(transaction["old"])  # Convert string representation of array to list
+        old_ministers = parse_name_list(transaction["old"])  # Convert string representation of array to list
         new_minister = transaction["new"]
         date = transaction["date"]
         transaction_id = transaction["transaction_id"]
@@ -231,21 +278,24 @@ def merge_ministers(tx, transaction, entity_counters):
             "transaction_id": transaction_id
         }
         
-        new_minister_counter = add_entity(tx, add_entity_transaction, entity_counters)
-    
+        new_minister_counter = add_entity(tx, add_entity_transaction, entity_counters, registry)
+        new_key, new = match_key(registry, "minister", new_minister)
         
         # Loop through each old minister to transfer relationships and terminate them
         for old_minister in old_ministers:
+            old_key, old = match_key(registry, "minister", old_minister)
+
             # Transfer relationships from old minister's departments to new minister
-            query_transfer_departments = """
-            MATCH (old:minister {name: $old})-[r:HAS_DEPARTMENT]->(dept:department)
+            query_transfer_departments = f"""
+            MATCH (old:minister {{{old_key}: $old}})-[r:HAS_DEPARTMENT]->(dept:department)
             WHERE r.end_date is NULL
-            MATCH (new:minister {name: $new})
-            MERGE (new)-[:HAS_DEPARTMENT {start_date: date($date)}]->(dept)
+            MATCH (new:minister {{{new_key}: $new}})
+            MERGE (new)-[r_new:HAS_DEPARTMENT {{start_date: date($date)}}]->(dept)
+            ON CREATE SET r_new.transaction_id = $transaction_id
             """
-            result = tx.run(query_transfer_departments, old=old_minister, new=new_minister, date=date)
-            print(f"Created relationship(s) from {old_minister} department(s) to {new_minister}, "
-                  f"Result: {result.consume().counters.relationships_created} relationship(s) created")
+            result = tx.run(query_transfer_departments, old=old, new=new, date=date, transaction_id=transaction_id)
+            logger.debug("Created relationship(s) from %s department(s) to %s, Result: %d relationship(s) created",
+                         old_minister, new_minister, result.consume().counters.relationships_created)
 
             # Terminate government -> old minister relationship
 
@@ -255,144 +305,365 @@ def merge_ministers(tx, transaction, entity_counters):
                 "date": date,
                 "parent_type": "government",
                 "child_type": "minister",
-                "rel_type": "HAS_MINISTER"
+                "rel_type": "HAS_MINISTER",
+                "transaction_id": transaction_id
             }
 
-            terminate_entity(tx, terminate_entity_transaction)
+            terminate_entity(tx, terminate_entity_transaction, registry)
 
             # Terminate old minister -> department relationships
-            query_terminate_department_relations = """
-            MATCH (old:minister {name: $old})-[r:HAS_DEPARTMENT]->(dept:department)
+            query_terminate_department_relations = f"""
+            MATCH (old:minister {{{old_key}: $old}})-[r:HAS_DEPARTMENT]->(dept:department)
             WHERE r.end_date is NULL
-            SET r.end_date = date($date)
+            SET r.end_date = date($date), r.end_transaction_id = $transaction_id
             """
-            result = tx.run(query_terminate_department_relations, old=old_minister, date=date)
-            print(f"Terminated department relationships for {old_minister}, "
-                  f"Result: {result.consume().counters.properties_set} property(s) updated")
+            result = tx.run(query_terminate_department_relations, old=old, date=date, transaction_id=transaction_id)
+            logger.debug("Terminated department relationships for %s, Result: %d property(s) updated",
+                         old_minister, result.consume().counters.properties_set)
 
             # Create old minister -> new minister MERGED_INTO relationship
-            query_create_merged_into = """
-            MATCH (old:minister {name: $old}), (new:minister {name: $new})
-            MERGE (old)-[:MERGED_INTO {date: date($date)}]->(new)
+            query_create_merged_into = f"""
+            MATCH (old:minister {{{old_key}: $old}}), (new:minister {{{new_key}: $new}})
+            MERGE (old)-[r:MERGED_INTO {{date: date($date)}}]->(new)
+            ON CREATE SET r.transaction_id = $transaction_id
             """
-            result = tx.run(query_create_merged_into, old=old_minister, new=new_minister, date=date)
-            print(f"Created MERGED_INTO relationship from {old_minister} to {new_minister}, "
-                  f"Result: {result.consume().counters.relationships_created} relationship(s) created")
+            result = tx.run(query_create_merged_into, old=old, new=new, date=date, transaction_id=transaction_id)
+            logger.debug("Created MERGED_INTO relationship from %s to %s, Result: %d relationship(s) created",
+                         old_minister, new_minister, result.consume().counters.relationships_created)
+
+        record_lineage(tx, "minister", [{"old": old_minister, "new": new_minister, "date": date} for old_minister in old_ministers])
 
         return new_minister_counter
 
     except Exception as e:
-        print(f"Error processing merge transaction: {transaction['transaction_id']}, Error: {e}")
+        logger.error("Error processing merge transaction: %s, Error: %s", transaction['transaction_id'], e)
         raise  # Rethrow the exception to allow rollback
 
-def merge_departments(tx, transaction, entity_counters):
+def merge_departments(tx, transaction, entity_counters, registry=None):
     try:
 
-        if isinstance(transaction["date"], str):
-            transaction["date"] = datetime.strptime(transaction["date"].strip(), "%Y-%m-%d").date()
+        transaction["date"] = parse_date(transaction["date"])
 
         # Extract details from the transaction
-        print(transaction["old"])
-        old_departments = eval(transaction["old"])  # Convert string representation of list to actual list
+        logger.debug("Merging departments: %s", transaction["old"])
+        old_departments = parse_name_list(transaction["old"])  # Convert string representation of list to actual list
         new_department = transaction["new"]
         date = transaction["date"]
+        transaction_id = transaction["transaction_id"]
 
         # Determine the ID for the new department
         if "department" not in entity_counters:
             raise ValueError("Department counter not initialized")
         
         # entity_counters["Department"] += 1
-        new_department_id = f"{transaction["transaction_id"][:7]}_dep_{entity_counters['department']+1}"
+        new_department_id = f"{transaction['transaction_id'][:7]}_dep_{entity_counters['department']+1}"
 
         # Step 1: Create the new department
         query_create_department = """
         MERGE (new:department {name: $new})
         ON CREATE SET new.id = $new_id
+        RETURN new.id AS id
         """
         result = tx.run(query_create_department, new=new_department, new_id=new_department_id)
-        print(f"Created new department: {new_department}, Result: {result.consume().counters.nodes_created} node(s) created")
+        new_id = result.single()["id"]
+        logger.debug("Created new department: %s, Result: %d node(s) created",
+                     new_department, result.consume().counters.nodes_created)
+        if registry is not None:
+            registry.register("department", new_department, new_id)
+
+        first_key, first = match_key(registry, "department", old_departments[0])
 
         # Create relationship from the minister of old department to the new department
-        query_create_minister_relationship = """
-        MATCH (minister:minister)-[rel:HAS_DEPARTMENT]->(old:department {name: $old})
+        query_create_minister_relationship = f"""
+        MATCH (minister:minister)-[rel:HAS_DEPARTMENT]->(old:department {{{first_key}: $old}})
         WHERE rel.end_date is NULL
         WITH minister, old
-        MATCH (new:department {name: $new})
-        MERGE (minister)-[:HAS_DEPARTMENT {start_date: date($date)}]->(new)
+        MATCH (new:department {{id: $new_id}})
+        MERGE (minister)-[r:HAS_DEPARTMENT {{start_date: date($date)}}]->(new)
+        ON CREATE SET r.transaction_id = $transaction_id
         """
-        result = tx.run(query_create_minister_relationship, old=old_departments[0], new=new_department, date=date)
-        print(f"Created relationship from minister of {old_departments[0]} to {new_department}, "
-                f"Result: {result.consume().counters.relationships_created} relationship(s) created")
+        result = tx.run(query_create_minister_relationship, old=first, new_id=new_id, date=date,
+                        transaction_id=transaction_id)
+        logger.debug("Created relationship from minister of %s to %s, Result: %d relationship(s) created",
+                     old_departments[0], new_department, result.consume().counters.relationships_created)
 
         # Step 2: Handle relationships for each old department
         for old_department in old_departments:
-            
+            old_key, old = match_key(registry, "department", old_department)
+
             # Terminate relationship between minister and old department
-            query_terminate_minister_relationship = """
-            MATCH (minister:minister)-[rel:HAS_DEPARTMENT]->(old:department {name: $old})
+            query_terminate_minister_relationship = f"""
+            MATCH (minister:minister)-[rel:HAS_DEPARTMENT]->(old:department {{{old_key}: $old}})
             WHERE rel.end_date is NULL
-            SET rel.end_date = $date
+            SET rel.end_date = date($date), rel.end_transaction_id = $transaction_id
             """
-            result = tx.run(query_terminate_minister_relationship, old=old_department, date=date)
-            print(f"Terminated relationship from minister to {old_department}, "
-                  f"Result: {result.consume().counters.properties_set} property(s) updated")
+            result = tx.run(query_terminate_minister_relationship, old=old, date=date, transaction_id=transaction_id)
+            logger.debug("Terminated relationship from minister to %s, Result: %d property(s) updated",
+                         old_department, result.consume().counters.properties_set)
 
             # Create MERGED_INTO relationship
-            query_create_merged_into = """
-            MATCH (old:department {name: $old}), (new:department {name: $new})
-            CREATE (old)-[:MERGED_INTO {date: date($date)}]->(new)
+            query_create_merged_into = f"""
+            MATCH (old:department {{{old_key}: $old}}), (new:department {{id: $new_id}})
+            MERGE (old)-[r:MERGED_INTO {{date: date($date)}}]->(new)
+            ON CREATE SET r.transaction_id = $transaction_id
             """
-            result = tx.run(query_create_merged_into, old=old_department, new=new_department, date=date)
-            print(f"Created MERGED_INTO relationship from {old_department} to {new_department}, "
-                  f"Result: {result.consume().counters.relationships_created} relationship(s) created")
+            result = tx.run(query_create_merged_into, old=old, new_id=new_id, date=date, transaction_id=transaction_id)
+            logger.debug("Created MERGED_INTO relationship from %s to %s, Result: %d relationship(s) created",
+                         old_department, new_department, result.consume().counters.relationships_created)
+
+        record_lineage(tx, "department", [{"old": old_department, "new": new_department, "date": date} for old_department in old_departments])
 
         return entity_counters["department"]+1
 
     except Exception as e:
-        print(f"Error processing merge departments transaction: {transaction['transaction_id']}, Error: {e}")
+        logger.error("Error processing merge departments transaction: %s, Error: %s", transaction['transaction_id'], e)
         raise  # Rethrow the exception to allow rollback
 
 
+def apply_transaction(tx, transaction, entity_counters, registry=None):
+    """Dispatch one transaction to its handler, updating entity_counters in place."""
+    start = time.perf_counter()
+    # Identify the correct function to call based on file type and type
+    if transaction["file_type"] == "Rename" and transaction["type"] == "minister":
+        entity_counters["minister"] = rename_minister(tx, transaction, entity_counters, registry)
+        logger.debug("Processed Rename Minister transaction: %s", transaction['transaction_id'])
+    elif transaction["file_type"] == "Move" and transaction["type"] == "department":
+        move_department(tx, transaction, registry)
+        logger.debug("Processed Move Department transaction: %s", transaction['transaction_id'])
+    elif transaction["file_type"] == "Add":
+        new_counter = add_entity(tx, transaction, entity_counters, registry)
+        entity_counters[transaction["child_type"]] = new_counter
+        logger.debug("Processed Add transaction: %s", transaction['transaction_id'])
+    elif transaction["file_type"] == "Terminate":
+        terminate_entity(tx, transaction, registry)
+        logger.debug("Processed Terminate transaction: %s", transaction['transaction_id'])
+    elif transaction["file_type"] == "Merge" and transaction["type"] == "minister":
+        entity_counters['minister'] = merge_ministers(tx, transaction, entity_counters, registry)
+        logger.debug("Processed Merge Ministers transaction: %s", transaction['transaction_id'])
+    elif transaction["file_type"] == "Merge" and transaction["type"] == "department":
+        entity_counters["department"] = merge_departments(tx, transaction, entity_counters, registry)
+        logger.debug("Processed Merge Departments transaction: %s", transaction['transaction_id'])
+
+    # Keep the current view in step, in the same transaction as the handler's writes
+    refresh_current(tx, *touched_entities(transaction))
+
+    # Per transaction type timings, when running in an instrumented transaction
+    metrics = getattr(tx, "metrics", None)
+    if metrics is not None:
+        transaction_type = f"{transaction['file_type']} {transaction.get('type') or transaction.get('child_type')}"
+        metrics.record_transaction(transaction_type, time.perf_counter() - start)
+
+
+def prepare_transactions(driver: Neo4jInterface, transactions, gazette=None, reapply=False, resolve_names=True,
+                         validate=False, name_index=None):
+    """Return the rows of a gazette that still have to run, ready to apply, or None when nothing may be written.
+
+    Unless reapply, the rows an earlier commit of the same gazette applied are logged
+    and dropped (see consistency.applied_transactions), so applying a gazette again is
+    a no-op. With resolve_names, entity names are rewritten to their stored spelling
+    (see name_index.py; pass name_index to share one across calls) and an ambiguous
+    name stops the gazette. With validate, every row is checked first (see preflight.py).
+    Every apply path (row by row, planned, chunked and backfill.py) goes through here.
+    """
+    if not reapply:
+        if gazette is None:
+            raise ValueError("Skipping applied rows needs the gazette name (or reapply=True)")
+        applied = applied_transactions(driver, gazette, [transaction["transaction_id"] for transaction in transactions])
+        for transaction in transactions:
+            if transaction["transaction_id"] in applied:
+                logger.info("Skipping %s (%s): already applied from gazette %s",
+                            transaction["transaction_id"], transaction["file_type"], gazette)
+        if applied:
+            logger.info("Skipped %d transaction(s) already applied", len(applied))
+            transactions = [transaction for transaction in transactions if transaction["transaction_id"] not in applied]
+    if not transactions:
+        return transactions
+
+    if resolve_names:
+        index = name_index if name_index is not None else NameIndex.from_neo4j(driver)
+        transactions, problems = resolve_transactions(transactions, index)
+        if problems:
+            log_problems(problems)
+            logger.error("Name resolution found %d ambiguous name(s), nothing was written", len(problems))
+            return None
+
+    if validate:
+        problems = validate_transactions(transactions, driver)
+        if problems:
+            log_problems(problems)
+            logger.error("Pre-flight validation found %d problem(s), nothing was written", len(problems))
+            return None
+    return transactions
+
+
 # Main function to load transactions and execute them in order
-def execute_transactions():
-    transactions = load_transactions()
-    
+def execute_transactions(transactions=None, planned=False, validate=False, binary_snapshot=None,
+                         chunk_size=None, journal=None, resolve_names=True, reapply=False, gazette=None):
+    """Apply an amendment gazette in one transaction.
+
+    With planned=True, independent transactions of the same kind are grouped
+    into batched UNWIND statements (see amendment_planner.py) instead of
+    running each handler row by row. With validate=True every row is checked
+    first (see preflight.py) and nothing is written if any problem is found.
+    With binary_snapshot, the committed graph is written to that file (see binary_snapshot.py).
+
+    By default the whole gazette commits or rolls back as one. With chunk_size, it
+    commits every chunk_size rows instead, journaling each chunk to `journal`
+    (default: journal.default_journal_path(gazette)), and a re-run resumes after
+    the last committed chunk (see execute_in_chunks).
+
+    With resolve_names, entity names are first rewritten to the spelling stored in
+    the database ("&" for "and", case, punctuation; see name_index.py), and nothing
+    is written if a name matches several entities.
+
+    `gazette` names the gazette (its directory name); every commit records it with the
+    transaction_ids it applied, and rows an earlier commit of the same gazette applied
+    are skipped and logged, so applying it again writes nothing. With reapply, every
+    row runs again (see prepare_transactions).
+    """
+    if transactions is None:
+        transactions = load_transactions()
+        gazette = gazette or gazette_name(DEFAULT_AMENDMENT_DIR)
+
+    # Make sure the lookups below run against online indexes
+    apply_schema(neo4j_interface)
+
+    transactions = prepare_transactions(neo4j_interface, transactions, gazette, reapply, resolve_names, validate)
+    if transactions is None:
+        return
+    if not transactions:
+        logger.info("Nothing left to apply")
+        return
+
+    if chunk_size:
+        if journal is None:
+            if gazette is None:
+                raise ValueError("Chunked commits need a journal path or the gazette name")
+            journal = default_journal_path(gazette)
+        if execute_in_chunks(transactions, chunk_size, journal, planned, gazette):
+            write_binary_snapshot(binary_snapshot)
+        return
+
+    # Resolve names to ids once up front, and continue numbering after ids the gazette already used
+    registry = EntityRegistry(neo4j_interface).load()
     entity_counters = {"minister": 0, "department": 0}  # Initialize counters for entity types
-    
-    
-    with neo4j_interface.driver.session() as session:
-        with session.begin_transaction() as tx:
-            for transaction in transactions:
-                try:
-                    # Identify the correct function to call based on file type and type
-                    if transaction["file_type"] == "Rename" and transaction["type"] == "minister":
-                        entity_counters["minister"] = rename_minister(tx, transaction, entity_counters)
-                        print(f"Processed Rename Minister transaction: {transaction['transaction_id']}")
-                    elif transaction["file_type"] == "Move" and transaction["type"] == "department":
-                        move_department(tx, transaction)
-                        print(f"Processed Move Department transaction: {transaction['transaction_id']}")
-                    elif transaction["file_type"] == "Add":
-                        new_counter = add_entity(tx, transaction, entity_counters)
-                        entity_counters[transaction["child_type"]] = new_counter
-                        print(f"Processed Add transaction: {transaction['transaction_id']}")
-                    elif transaction["file_type"] == "Terminate":
-                        terminate_entity(tx, transaction)
-                        print(f"Processed Terminate transaction: {transaction['transaction_id']}")
-                    elif transaction["file_type"] == "Merge" and transaction["type"] == "minister":
-                        entity_counters['minister'] = merge_ministers(tx, transaction, entity_counters)
-                        print(f"Processed Merge Ministers transaction: {transaction['transaction_id']}")
-                    elif transaction["file_type"] == "Merge" and transaction["type"] == "department":
-                        entity_counters["department"] = merge_departments(tx, transaction, entity_counters)
-                        print(f"Processed Merge Departments transaction: {transaction['transaction_id']}")
-
-                except Exception as e:
-                    print(f"Error processing transaction: {transaction['transaction_id']}, Error: {e}")
-                    tx.rollback()
-                    return  # Exit early on failure
-
-            # Commit the transaction if no errors occurred
-            tx.commit()
-            print("All transactions successfully committed")
+    if len(transactions) > 0:
+        entity_counters = registry.counters(transactions[0]["transaction_id"])
+
+    if planned:
+        plan = AmendmentPlan(transactions, entity_counters)
+        logger.info("Planned %d transaction(s) as %d batch(es) in %s level(s), %s statement(s)",
+                    len(transactions), len(plan.batches), plan.levels(), plan.statement_count())
+        with neo4j_interface.transaction() as tx:
+            execute_plan(tx, plan)
+            _record_commit(tx, transactions, gazette)
+        logger.info("All transactions successfully committed")
+        write_binary_snapshot(binary_snapshot)
+        return
+
+    with neo4j_interface.transaction() as tx:
+        for transaction in transactions:
+            try:
+                apply_transaction(tx, transaction, entity_counters, registry)
+            except Exception as e:
+                logger.error("Error processing transaction: %s, Error: %s", transaction['transaction_id'], e)
+                tx.rollback()
+                return  # Exit early on failure
+        _record_commit(tx, transactions, gazette)
+
+    # The transaction commits when the block exits without errors
+    logger.info("All transactions successfully committed")
+    logger.info("Entity registry: %s hit(s), %s miss(es)", registry.hits, registry.misses)
+    write_binary_snapshot(binary_snapshot)
+
+
+def execute_in_chunks(transactions, chunk_size, journal_path, planned=False, gazette=None):
+    """Apply transactions in chunks of chunk_size rows, one database transaction each. Returns True when all committed.
+
+    Each chunk is journaled as prepared, applied together with a checkpoint of its
+    last transaction_id, committed, and journaled as committed with the entity
+    counters after it. Rows up to the last committed chunk are skipped, so after a
+    failure the same call resumes where it stopped.
+    """
+    journal = CommitJournal(journal_path)
+    resume_after, journal_counters = journal.resume_point(neo4j_interface)
+    if resume_after is not None:
+        transactions = [transaction for transaction in transactions if transaction["transaction_id"] > resume_after]
+        logger.info("Resuming after %s (journal %s): %d transaction(s) left", resume_after, journal_path, len(transactions))
+    if not transactions:
+        logger.info("Nothing left to apply")
+        return True
+
+    registry = EntityRegistry(neo4j_interface).load()
+    entity_counters = registry.counters(transactions[0]["transaction_id"])
+    for child_type, counter in (journal_counters or {}).items():
+        entity_counters[child_type] = max(entity_counters.get(child_type, 0), counter)
+
+    for chunk in batched(transactions, chunk_size):
+        first, last = chunk[0]["transaction_id"], chunk[-1]["transaction_id"]
+        journal.append(PREPARED, first, last, len(chunk))
+        chunk_counters = dict(entity_counters)
+        current = first
+        try:
+            with neo4j_interface.transaction() as tx:
+                if planned:
+                    plan = AmendmentPlan(chunk, chunk_counters)
+                    execute_plan(tx, plan)
+                    chunk_counters = plan.entity_counters
+                else:
+                    for transaction in chunk:
+                        current = transaction["transaction_id"]
+                        apply_transaction(tx, transaction, chunk_counters, registry)
+                journal.record_checkpoint(tx, last)
+                _record_commit(tx, chunk, gazette)
+        except Exception as e:
+            # The chunk's transaction was rolled back; earlier chunks stay committed
+            logger.error("Error processing transaction: %s, Error: %s", current, e)
+            journal.append(FAILED, first, last, len(chunk), entity_counters, error=f"{current}: {e}")
+            return False
+        entity_counters = chunk_counters
+        journal.append(COMMITTED, first, last, len(chunk), entity_counters)
+        logger.info("Committed %s..%s (%d row(s))", first, last, len(chunk))
+
+    logger.info("All chunks successfully committed")
+    return True
+
+
+def _record_commit(tx, transactions, gazette=None):
+    # Lets read services invalidate their cached reads from the earliest date changed (see read_service.py),
+    # and records which rows of the gazette were applied (see consistency.applied_transactions)
+    if transactions:
+        record_gazette_commit(tx, f"{transactions[0]['transaction_id']}..{transactions[-1]['transaction_id']}",
+                              earliest_date(transactions), gazette,
+                              [transaction["transaction_id"] for transaction in transactions])
+
+
+def write_binary_snapshot(path):
+    """Write the committed graph to a binary snapshot file, when a path is given."""
+    if path:
+        logger.info("Binary snapshot written to %s: %s", path, write_from_neo4j(neo4j_interface, path))
 
 if __name__ == "__main__":
-    execute_transactions()
+    parser = argparse.ArgumentParser(description="Apply an amendment gazette to the org chart.")
+    parser.add_argument("amendment_dir", nargs="?", default=DEFAULT_AMENDMENT_DIR, help="Amendment gazette directory")
+    parser.add_argument("--planned", action="store_true", help="Batch independent transactions of the same kind into UNWIND statements")
+    parser.add_argument("--validate", action="store_true", help="Check every row against the database first and write nothing if any is invalid")
+    parser.add_argument("--binary-snapshot", metavar="PATH", help="After committing, write the graph to this binary snapshot file")
+    parser.add_argument("--exact-names", action="store_true",
+                        help="Match entity names exactly as written instead of resolving spelling differences first")
+    parser.add_argument("--reapply", action="store_true",
+                        help="Run every row again, including those an earlier run of this gazette already applied")
+    parser.add_argument("--chunk-size", type=int, default=None, metavar="N",
+                        help="Commit every N rows, journaling each chunk, instead of the whole gazette at once")
+    parser.add_argument("--journal", metavar="PATH",
+                        help="Chunk journal (default: ../journals/<gazette>.jsonl); re-running resumes from it")
+    add_instrumentation_arguments(parser)
+    args = parser.parse_args()
+    configure_logging(args.log_level)
+    neo4j_interface.metrics.profile_slowest = args.profile_slowest
+    gazette = gazette_name(args.amendment_dir)
+    execute_transactions(load_transactions(args.amendment_dir), planned=args.planned, validate=args.validate,
+                         binary_snapshot=args.binary_snapshot, chunk_size=args.chunk_size,
+                         journal=args.journal,
+                         resolve_names=not args.exact_names, reapply=args.reapply, gazette=gazette)
+    report_metrics(neo4j_interface, args)
@@ -0,0 +1,14 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# The modules import each other as orgchart.x and neo4j_util.x, as the scripts do
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def data_dir():
+    return os.path.join(ROOT, "data")
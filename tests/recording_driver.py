@@ -0,0 +1,105 @@
+from contextlib import contextmanager
+
+
+class _Counters:
+    def __getattr__(self, name):
+        return 0
+
+
+class _Summary:
+    counters = _Counters()
+
+
+class _Result:
+    def __init__(self, parameters):
+        self.parameters = parameters
+
+    def consume(self):
+        return _Summary()
+
+    def single(self):
+        # Entity creating statements return the id they were given
+        parameters = self.parameters
+        return {"id": parameters.get("entity_id") or parameters.get("new_id") or parameters.get("child_id")}
+
+    def __iter__(self):
+        return iter(())
+
+
+class _Transaction:
+    def __init__(self, driver):
+        self.driver = driver
+        self.statements = []
+        self.commits = []
+        self.checkpoints = {}
+        self._closed = False
+
+    def run(self, query, parameters=None, **kwargs):
+        parameters = {**(parameters or {}), **kwargs}
+        if "CREATE (c:GazetteCommit" in query:
+            self.commits.append(parameters)
+        elif "MERGE (c:IngestCheckpoint" in query:
+            self.checkpoints.setdefault(parameters["pipeline"], {}).update(
+                {key: value for key, value in parameters.items() if key != "pipeline"})
+        else:
+            self.statements.append((query, parameters))
+        return _Result(parameters)
+
+    def rollback(self):
+        self._closed = True
+
+    def closed(self):
+        return self._closed
+
+
+class RecordingDriver:
+    """Stands in for Neo4jInterface in tests: an empty database that remembers only what the
+    write paths record about themselves (GazetteCommits and IngestCheckpoints) and counts
+    every other statement committed."""
+
+    def __init__(self):
+        self.statements = []
+        self.commits = []
+        self.checkpoints = {}
+        self.transactions = 0
+        self._tx = None
+
+    def execute_query(self, query, parameters=None):
+        parameters = parameters or {}
+        if "MATCH (c:GazetteCommit {gazette: $gazette})" in query:
+            wanted = set(parameters["transaction_ids"])
+            applied = {transaction_id for commit in self.commits if commit["gazette"] == parameters["gazette"]
+                       for transaction_id in commit["transaction_ids"] or () if transaction_id in wanted}
+            return [{"transaction_id": transaction_id} for transaction_id in sorted(applied)]
+        if "MATCH (c:IngestCheckpoint" in query:
+            stored = self.checkpoints.get(parameters["pipeline"])
+            if stored is None:
+                return []
+            return [{key: stored.get(key) for key in ("gazette", "transaction_id", "complete")}]
+        if self._tx is not None and not query.lstrip().startswith("MATCH"):
+            self._tx.run(query, parameters)
+        return []
+
+    def stream_query(self, query, parameters=None):
+        return iter(())
+
+    @contextmanager
+    def session(self):
+        yield self
+
+    @contextmanager
+    def transaction(self):
+        if self._tx is not None:
+            yield self._tx
+            return
+        tx = self._tx = _Transaction(self)
+        try:
+            yield tx
+        finally:
+            self._tx = None
+        if not tx.closed():
+            self.transactions += 1
+            self.statements.extend(tx.statements)
+            self.commits.extend(tx.commits)
+            for pipeline, values in tx.checkpoints.items():
+                self.checkpoints.setdefault(pipeline, {}).update(values)
@@ -0,0 +1,77 @@
+import os
+
+import pytest
+
+from orgchart.amendment_planner import AmendmentPlan
+from orgchart.ingestion import read_amendments
+
+
+@pytest.fixture
+def gazette(data_dir):
+    return read_amendments(os.path.join(data_dir, "2015-10-15_2"))
+
+
+def _levels(plan):
+    return {row["transaction_id"]: batch.level for batch in plan.batches for row in batch.rows}
+
+
+def test_plan_of_gazette(gazette):
+    plan = AmendmentPlan(gazette)
+    assert plan.skipped == []
+    assert (plan.levels(), len(plan.batches), plan.statement_count()) == (3, 9, 25)
+    assert sorted(_levels(plan)) == [transaction["transaction_id"] for transaction in gazette]
+    # Batches are ordered by level and hold one kind each
+    assert [batch.level for batch in plan.batches] == sorted(batch.level for batch in plan.batches)
+
+
+def test_conflicts_keep_transaction_order(gazette):
+    plan = AmendmentPlan(gazette)
+    levels = _levels(plan)
+    # The moves go to the minister renamed by tr_02, the merge of departments reads the
+    # ministers renamed by tr_01/tr_02, and the minister merge follows the department merge
+    assert plan.dependencies["2611/11_tr_03"] == ["2611/11_tr_02"]
+    assert plan.dependencies["2611/11_tr_12"] == ["2611/11_tr_01", "2611/11_tr_02"]
+    assert plan.dependencies["2611/11_tr_13"] == ["2611/11_tr_12"]
+    for transaction_id, predecessors in plan.dependencies.items():
+        for predecessor in predecessors:
+            assert predecessor < transaction_id
+            assert levels[predecessor] < levels[transaction_id]
+
+
+def test_independent_rows_share_a_batch():
+    rows = [
+        {"transaction_id": f"2611/11_tr_0{i}", "file_type": "Add", "parent": "Minister of Defence",
+         "parent_type": "minister", "child": f"Department {i}", "child_type": "department",
+         "rel_type": "HAS_DEPARTMENT", "date": " 2015-10-15 "}
+        for i in range(1, 4)
+    ]
+    plan = AmendmentPlan(rows)
+    assert (plan.levels(), len(plan.batches)) == (1, 1)
+    batch_rows = plan.batches[0].rows
+    assert [row["entity_id"] for row in batch_rows] == ["2611/11_dep_1", "2611/11_dep_2", "2611/11_dep_3"]
+    assert {row["date"] for row in batch_rows} == {"2015-10-15"}
+
+
+def test_exclusive_conflict_moves_to_next_level():
+    add = {"transaction_id": "2611/11_tr_01", "file_type": "Add", "parent": "Minister of Defence",
+           "parent_type": "minister", "child": "Department A", "child_type": "department",
+           "rel_type": "HAS_DEPARTMENT", "date": "2015-10-15"}
+    terminate = dict(add, transaction_id="2611/11_tr_02", file_type="Terminate")
+    plan = AmendmentPlan([add, terminate])
+    assert plan.dependencies["2611/11_tr_02"] == ["2611/11_tr_01"]
+    assert _levels(plan) == {"2611/11_tr_01": 0, "2611/11_tr_02": 1}
+
+
+def test_bad_date_fails_while_planning():
+    add = {"transaction_id": "2611/11_tr_01", "file_type": "Add", "parent": "Minister of Defence",
+           "parent_type": "minister", "child": "Department A", "child_type": "department",
+           "rel_type": "HAS_DEPARTMENT", "date": "15/10/2015"}
+    with pytest.raises(ValueError):
+        AmendmentPlan([add])
+
+
+def test_unknown_rows_are_skipped():
+    plan = AmendmentPlan([{"transaction_id": "2611/11_tr_01", "file_type": "Rename", "type": "department",
+                           "old": "A", "new": "B", "date": "2015-10-15"}])
+    assert plan.skipped == ["2611/11_tr_01"]
+    assert plan.batches == []
@@ -0,0 +1,58 @@
+import random
+from datetime import date
+
+import pytest
+
+from orgchart.as_of import FOREVER, IntervalTree, TemporalIndex, as_ordinal
+
+
+def _scan(intervals, point):
+    return sorted(value for start, end, value in intervals if start <= point < end)
+
+
+def test_stab_matches_linear_scan():
+    rng = random.Random(7)
+    intervals = []
+    for value in range(300):
+        start = rng.randrange(0, 100)
+        intervals.append((start, start + rng.randrange(0, 30), f"i{value}"))  # includes empty intervals
+    intervals += [(50, FOREVER, "open"), (0, 1, "first day"), (99, 100, "last day")]
+    tree = IntervalTree(intervals)
+    # Every endpoint, and the points either side of it, are where half-open bounds go wrong
+    points = {-1, FOREVER - 1, FOREVER} | {p + d for start, end, _ in intervals for p in (start, end) for d in (-1, 0, 1)}
+    for point in sorted(points):
+        assert sorted(tree.stab(point)) == _scan(intervals, point), point
+
+
+def test_half_open_edges():
+    tree = IntervalTree([(10, 20, "a"), (20, 30, "b"), (15, 15, "empty")])
+    assert tree.stab(9) == []
+    assert tree.stab(10) == ["a"]
+    assert tree.stab(19) == ["a"]
+    assert tree.stab(20) == ["b"]  # ended on 20, succeeded on 20
+    assert tree.stab(15) == ["a"]
+    assert tree.stab(30) == []
+
+
+def test_empty_tree():
+    assert IntervalTree([]).stab(0) == []
+
+
+def test_temporal_index_on_end_date():
+    index = TemporalIndex([
+        ("HAS_MINISTER", "gov", "old", "2015-01-01", "2015-06-01"),
+        ("HAS_MINISTER", "gov", "new", "2015-06-01", None),
+        ("HAS_DEPARTMENT", "old", "dep", "2015-01-01", "2015-06-01"),
+        ("HAS_DEPARTMENT", "new", "dep", "2015-06-01", None),
+    ], {"gov": "Government", "old": "Old", "new": "New", "dep": "Department"})
+    assert [m["id"] for m in index.minister_of("dep", "2015-05-31")] == ["old"]
+    assert [m["id"] for m in index.minister_of("dep", "2015-06-01")] == ["new"]
+    assert [m["id"] for m in index.as_of("2015-06-01")[0]["ministers"]] == ["new"]
+    assert index.span == (as_ordinal("2015-01-01"), as_ordinal("2015-06-01"))
+
+
+def test_as_ordinal_parses_like_the_loaders():
+    assert as_ordinal("2015-10-15") == as_ordinal(" 2015-10-15 ") == as_ordinal(date(2015, 10, 15))
+    assert as_ordinal("2015-1-5") == date(2015, 1, 5).toordinal()
+    with pytest.raises(ValueError):
+        as_ordinal("-1")
@@ -0,0 +1,122 @@
+import os
+import shutil
+
+import pytest
+
+from orgchart import backfill
+from orgchart.backfill import (Gazette, discover_gazettes, pending_gazettes, read_checkpoint, run_backfill,
+                               stream_transactions)
+from orgchart.update_orgchart import load_transactions
+from recording_driver import RecordingDriver
+
+
+@pytest.fixture
+def backfill_dir(data_dir, tmp_path):
+    for name in ("2015-09-21", "2015-10-15_2"):
+        shutil.copytree(os.path.join(data_dir, name), tmp_path / name)
+    return tmp_path
+
+
+def _gazettes(*names):
+    return [Gazette(name, None, 0, "amendment", name) for name in names]
+
+
+def test_discover_gazettes_orders_by_date_and_suffix(tmp_path, data_dir):
+    for name in ("2016-01-02_2", "2016-01-02", "2015-12-31", "notes"):
+        shutil.copytree(os.path.join(data_dir, "2015-10-15_2"), tmp_path / name)
+    (tmp_path / "2016-01-03").mkdir()  # neither a snapshot nor amendments
+    assert [gazette.name for gazette in discover_gazettes(tmp_path)] == ["2015-12-31", "2016-01-02", "2016-01-02_2"]
+
+
+def test_discover_gazettes_classifies_the_data_directory(data_dir):
+    # 2015-10-15 only carries some of the snapshot files
+    assert [(gazette.name, gazette.kind) for gazette in discover_gazettes(data_dir)] == [
+        ("2015-09-21", "snapshot"), ("2015-10-15_2", "amendment")]
+
+
+def test_pending_gazettes():
+    gazettes = _gazettes("a", "b", "c")
+    assert [(gazette.name, after) for gazette, after in pending_gazettes(gazettes, None)] == [
+        ("a", None), ("b", None), ("c", None)]
+    complete = {"gazette": "a", "transaction_id": "a_tr_09", "complete": True}
+    assert [(gazette.name, after) for gazette, after in pending_gazettes(gazettes, complete)] == [
+        ("b", None), ("c", None)]
+    partial = {"gazette": "b", "transaction_id": "b_tr_03", "complete": False}
+    assert [(gazette.name, after) for gazette, after in pending_gazettes(gazettes, partial)] == [
+        ("b", "b_tr_03"), ("c", None)]
+    with pytest.raises(ValueError):
+        list(pending_gazettes(gazettes, {"gazette": "z", "transaction_id": None, "complete": True}))
+
+
+def test_stream_transactions_sorts_each_file(tmp_path, data_dir):
+    source = os.path.join(data_dir, "2015-10-15_2")
+    shutil.copytree(source, tmp_path / "gazette")
+    with open(tmp_path / "gazette" / "ADD.csv", encoding="utf-8") as f:
+        header, *rows = f.readlines()
+    with open(tmp_path / "gazette" / "ADD.csv", "w", encoding="utf-8") as f:
+        f.writelines([header] + rows[::-1])
+    assert list(stream_transactions(tmp_path / "gazette")) == load_transactions(source)
+
+
+def test_backfill_loads_the_snapshot_then_the_amendments(backfill_dir):
+    last = load_transactions(backfill_dir / "2015-10-15_2")[-1]["transaction_id"]
+    driver = RecordingDriver()
+    assert run_backfill(driver, backfill_dir, batch_size=100, chunk_size=5, validate=False)
+    assert [len(commit["transaction_ids"] or ()) for commit in driver.commits] == [0, 5, 5, 3]
+    assert read_checkpoint(driver) == {"gazette": "2015-10-15_2", "transaction_id": last, "complete": True}
+
+    # Nothing is pending on a second run
+    transactions = driver.transactions
+    assert run_backfill(driver, backfill_dir, validate=False)
+    assert driver.transactions == transactions
+
+
+def test_backfill_resumes_inside_an_amendment_gazette(backfill_dir, monkeypatch):
+    transactions = load_transactions(backfill_dir / "2015-10-15_2")
+    apply_transaction = backfill.apply_transaction
+    failing = transactions[7]["transaction_id"]
+
+    def fail_once(tx, transaction, *args):
+        if transaction["transaction_id"] == failing:
+            monkeypatch.setattr(backfill, "apply_transaction", apply_transaction)
+            raise RuntimeError("connection lost")
+        return apply_transaction(tx, transaction, *args)
+
+    monkeypatch.setattr(backfill, "apply_transaction", fail_once)
+    driver = RecordingDriver()
+    with pytest.raises(RuntimeError):
+        run_backfill(driver, backfill_dir, chunk_size=5, validate=False)
+    assert read_checkpoint(driver) == {"gazette": "2015-10-15_2", "transaction_id": transactions[4]["transaction_id"],
+                                       "complete": False}
+
+    assert run_backfill(driver, backfill_dir, chunk_size=5, validate=False)
+    applied = [transaction_id for commit in driver.commits for transaction_id in commit["transaction_ids"] or ()]
+    assert applied == [transaction["transaction_id"] for transaction in transactions]
+    assert read_checkpoint(driver)["complete"]
+
+
+def test_backfill_resumes_a_snapshot_after_its_last_batch(backfill_dir, monkeypatch):
+    def crash(driver):
+        raise RuntimeError("connection lost")
+
+    monkeypatch.setattr(backfill, "rebuild_current_view", crash)
+    driver = RecordingDriver()
+    with pytest.raises(RuntimeError):
+        run_backfill(driver, backfill_dir, batch_size=100, validate=False)
+    assert read_checkpoint(driver) == {"gazette": "2015-09-21", "transaction_id": "HAS_DEPARTMENT:418", "complete": False}
+    batches = len(driver.statements)
+
+    monkeypatch.undo()
+    assert run_backfill(driver, backfill_dir, batch_size=100, chunk_size=5, validate=False)
+    stage_queries = {query for _, query, _, _ in backfill.SNAPSHOT_STAGES}
+    assert not [query for query, _ in driver.statements[batches:] if query in stage_queries]
+    assert read_checkpoint(driver)["gazette"] == "2015-10-15_2"
+
+
+def test_backfill_stops_at_a_gazette_that_fails_preflight(backfill_dir):
+    # The recording database is empty, so every name in the gazette is unknown
+    shutil.rmtree(backfill_dir / "2015-09-21")
+    driver = RecordingDriver()
+    assert not run_backfill(driver, backfill_dir)
+    assert driver.commits == []
+    assert read_checkpoint(driver) is None
@@ -0,0 +1,64 @@
+import os
+from collections import Counter
+
+import pytest
+
+from orgchart.as_of import TemporalIndex
+from orgchart.binary_snapshot import BinarySnapshot, write_from_graph
+from orgchart.ingestion import read_amendments
+from orgchart.org_engine import OrgGraph
+
+
+@pytest.fixture
+def graph(data_dir):
+    # The snapshot with a gazette applied, so there are ended, renamed and merged entities
+    graph = OrgGraph().load_snapshot(os.path.join(data_dir, "2015-09-21"))
+    counters = {"minister": 0, "department": 0}
+    for transaction in read_amendments(os.path.join(data_dir, "2015-10-15_2")):
+        graph.apply(transaction, counters)
+    return graph
+
+
+@pytest.fixture
+def snapshot(graph, tmp_path):
+    path = str(tmp_path / "orgchart.bin")
+    write_from_graph(graph, path)
+    with BinarySnapshot(path) as snapshot:
+        yield snapshot
+
+
+def test_round_trip_equals_graph(graph, snapshot):
+    assert Counter(snapshot.nodes()) == Counter(graph.nodes())
+    assert Counter(snapshot.relationships()) == Counter(graph.relationships())
+    assert any(end is not None for *_, end in snapshot.relationships())
+    assert snapshot.names() == {node_id: name for _, node_id, name in graph.nodes()}
+
+
+def test_lookups(graph, snapshot):
+    for label, node_id, name in graph.nodes():
+        node = snapshot.find_id(node_id)
+        assert snapshot.node(node) == (label, node_id, name)
+        assert snapshot.find_name(label, name) == node
+    assert snapshot.find_id("no such id") is None
+    assert snapshot.find_name("minister", "Minister of Nothing") is None
+
+
+def test_adjacency(snapshot):
+    for node in range(snapshot.node_count):
+        _, node_id, _ = snapshot.node(node)
+        assert all(snapshot.relationship(rel)[1] == node_id for rel in snapshot.outgoing(node))
+        assert all(snapshot.relationship(rel)[2] == node_id for rel in snapshot.incoming(node))
+    assert sum(len(snapshot.outgoing(node)) for node in range(snapshot.node_count)) == snapshot.relationship_count
+
+
+def test_as_of_matches_graph(graph, snapshot):
+    from_graph, from_binary = TemporalIndex.from_graph(graph), TemporalIndex.from_binary(snapshot)
+    for day in ("2015-09-21", "2015-10-14", "2015-10-15"):
+        assert from_binary.as_of(day) == from_graph.as_of(day)
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "not-a-snapshot.bin"
+    path.write_bytes(b"id,name\n")
+    with pytest.raises(ValueError):
+        BinarySnapshot(str(path))
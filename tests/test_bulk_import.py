@@ -0,0 +1,112 @@
+import csv
+import os
+import re
+import shutil
+from collections import Counter
+
+from orgchart.bulk_import import (CURRENT_HEADER, NODE_FILES, NODE_HEADER, RELATIONSHIP_FILES, RELATIONSHIP_HEADER,
+                                  check_parity, export_snapshot, exported_fingerprint)
+from orgchart.current_view import CURRENT_RELATIONSHIPS
+from orgchart.org_engine import OrgGraph
+
+
+class GraphDriver:
+    """Answers database_fingerprint's queries from an OrgGraph, standing in for a database loaded by setup_db.py."""
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def stream_query(self, query, parameters=None):
+        node = re.search(r"MATCH \(n:(\w+)\)", query)
+        if node:
+            return ({"id": node_id, "name": name} for label, node_id, name in self.graph.nodes()
+                    if label == node.group(1))
+        rel_type = re.search(r"\[r:(\w+)\]", query).group(1)
+        return ({"start_id": start_id, "end_id": end_id, "start_date": start_date.isoformat(),
+                 "end_date": end_date.isoformat() if end_date else None}
+                for kind, start_id, end_id, start_date, end_date in self.graph.relationships() if kind == rel_type)
+
+
+def _rows(path, encoding="utf-8"):
+    with open(path, newline="", encoding=encoding) as f:
+        return list(csv.reader(f))
+
+
+def _source(snapshot_dir, file_name):
+    with open(os.path.join(snapshot_dir, file_name), newline="", encoding="utf-8-sig") as f:
+        return list(csv.DictReader(f))
+
+
+def test_export_headers(data_dir, tmp_path):
+    export_snapshot(os.path.join(data_dir, "2015-09-21"), str(tmp_path))
+    for label, _ in NODE_FILES:
+        assert _rows(tmp_path / f"{label}-header.csv") == [NODE_HEADER]
+    for rel_type, *_ in RELATIONSHIP_FILES:
+        assert _rows(tmp_path / f"{rel_type.lower()}-header.csv") == [RELATIONSHIP_HEADER]
+        assert _rows(tmp_path / f"{CURRENT_RELATIONSHIPS[rel_type].lower()}-header.csv") == [CURRENT_HEADER]
+    assert NODE_HEADER[0] == "id:ID"
+    assert RELATIONSHIP_HEADER[:2] == CURRENT_HEADER[:2] == [":START_ID", ":END_ID"]
+
+
+def test_export_rows_match_snapshot(data_dir, tmp_path):
+    snapshot_dir = os.path.join(data_dir, "2015-09-21")
+    arguments = export_snapshot(snapshot_dir, str(tmp_path))
+    assert len(arguments) == len(NODE_FILES) + 2 * len(RELATIONSHIP_FILES)
+
+    for label, file_name in NODE_FILES:
+        source = _source(snapshot_dir, file_name)
+        assert _rows(tmp_path / f"{label}.csv") == [[row["id"], row["name"]] for row in source]
+
+    for rel_type, file_name, start_column, end_column in RELATIONSHIP_FILES:
+        source = _source(snapshot_dir, file_name)
+        exported = _rows(tmp_path / f"{rel_type.lower()}.csv")
+        assert len(exported) == len(source)
+        for row, (start_id, end_id, start_date, end_date) in zip(source, exported):
+            assert (start_id, end_id, start_date) == (row[start_column], row[end_column], row["start_date"])
+            assert end_date == ("" if row["end_date"] == "-1" else row["end_date"])
+
+        current = _rows(tmp_path / f"{CURRENT_RELATIONSHIPS[rel_type].lower()}.csv")
+        assert current == [[row[start_column], row[end_column], row["start_date"]]
+                           for row in source if row["end_date"] == "-1"]
+
+
+def test_ended_relationships_are_not_current(data_dir, tmp_path):
+    snapshot_dir = tmp_path / "snapshot"
+    shutil.copytree(os.path.join(data_dir, "2015-09-21"), snapshot_dir)
+    rows = _source(snapshot_dir, "min-dep.csv")
+    rows[0]["end_date"] = "2015-10-01"
+    with open(snapshot_dir / "min-dep.csv", "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+    output_dir = tmp_path / "import"
+    export_snapshot(str(snapshot_dir), str(output_dir))
+    assert _rows(output_dir / "has_department.csv")[0][3] == "2015-10-01"
+    assert len(_rows(output_dir / "has_current_department.csv")) == len(rows) - 1
+
+    _, relationships = exported_fingerprint(str(output_dir))
+    assert relationships[("HAS_DEPARTMENT", rows[0]["min_id"], rows[0]["dep_id"], rows[0]["start_date"], "2015-10-01")] == 1
+    assert sum(relationships.values()) == len(rows) + len(_source(snapshot_dir, "gov-min.csv"))
+
+
+def test_export_matches_the_loaded_graph(data_dir, tmp_path):
+    snapshot_dir = os.path.join(data_dir, "2015-09-21")
+    export_snapshot(snapshot_dir, str(tmp_path))
+    graph = OrgGraph().load_snapshot(snapshot_dir)
+    nodes, relationships = exported_fingerprint(str(tmp_path))
+    assert nodes == Counter(graph.nodes())
+    assert relationships == Counter(
+        (rel_type, start_id, end_id, start_date.isoformat(), end_date.isoformat() if end_date else None)
+        for rel_type, start_id, end_id, start_date, end_date in graph.relationships())
+
+
+def test_check_parity(data_dir, tmp_path):
+    snapshot_dir = os.path.join(data_dir, "2015-09-21")
+    export_snapshot(snapshot_dir, str(tmp_path))
+    graph = OrgGraph().load_snapshot(snapshot_dir)
+    assert check_parity(GraphDriver(graph), str(tmp_path))
+
+    # A relationship the database ended differently no longer matches the export
+    graph.end_relationship(0, graph.rel_start_date[0] + 1)
+    assert not check_parity(GraphDriver(graph), str(tmp_path))
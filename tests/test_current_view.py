@@ -0,0 +1,78 @@
+import os
+
+import pytest
+
+from orgchart.amendment_planner import AmendmentPlan
+from orgchart.current_view import CURRENT_RELATIONSHIPS, touched_entities
+from orgchart.ingestion import read_amendments
+from orgchart.org_engine import OrgGraph
+
+
+@pytest.fixture
+def snapshot_dir(data_dir):
+    return os.path.join(data_dir, "2015-09-21")
+
+
+@pytest.fixture
+def gazette(data_dir):
+    return read_amendments(os.path.join(data_dir, "2015-10-15_2"))
+
+
+def rebuild(graph):
+    """The current view rebuild_current_view builds: one current relationship per open one."""
+    return {(CURRENT_RELATIONSHIPS[rel_type], source, target)
+            for rel_type, source, target, _, end_date in graph.relationships()
+            if rel_type in CURRENT_RELATIONSHIPS and end_date is None}
+
+
+def refresh(graph, view, ministers, departments):
+    """What refresh_current's REFRESH_QUERY does to view after the handlers ran on graph.
+
+    The named ministers and departments, and every department the ministers hold
+    (open HAS_DEPARTMENT) or are still shown holding (HAS_CURRENT_DEPARTMENT), get
+    their incoming current relationships recomputed from the open ones.
+    """
+    minister_ids = {graph.node_id[graph.by_name["minister"][name]] for name in ministers
+                    if name in graph.by_name["minister"]}
+    held = {target for rel_type, source, target in rebuild(graph) | view
+            if rel_type == "HAS_CURRENT_DEPARTMENT" and source in minister_ids}
+    named = {graph.node_id[graph.by_name["department"][name]] for name in departments
+             if name in graph.by_name["department"]}
+    scope = minister_ids | held | named
+    return ({edge for edge in view if edge[2] not in scope}
+            | {edge for edge in rebuild(graph) if edge[2] in scope})
+
+
+def test_refreshing_each_transaction_keeps_the_view_current(snapshot_dir, gazette):
+    graph = OrgGraph().load_snapshot(snapshot_dir)
+    view = rebuild(graph)
+    entity_counters = {"minister": 0, "department": 0}
+    for transaction in gazette:
+        graph.apply(transaction, entity_counters)
+        view = refresh(graph, view, *touched_entities(transaction))
+        assert view == rebuild(graph), transaction["transaction_id"]
+
+
+def test_refreshing_once_per_plan_keeps_the_view_current(snapshot_dir, gazette):
+    graph = OrgGraph().load_snapshot(snapshot_dir)
+    view = rebuild(graph)
+    plan = AmendmentPlan(gazette)
+    graph.replay(gazette)
+    assert refresh(graph, view, *plan.touched) == rebuild(graph)
+
+
+@pytest.mark.parametrize("file_type", ["Move", "Merge", "Rename"])
+def test_moved_and_merged_departments_follow_their_new_minister(snapshot_dir, gazette, file_type):
+    graph = OrgGraph().load_snapshot(snapshot_dir)
+    view = rebuild(graph)
+    entity_counters = {"minister": 0, "department": 0}
+    for transaction in gazette:
+        if transaction["file_type"] == file_type:
+            before = rebuild(graph)
+            graph.apply(transaction, entity_counters)
+            assert rebuild(graph) != before
+            view = refresh(graph, view, *touched_entities(transaction))
+    # Every open relationship, and nothing else, is current
+    assert view == rebuild(graph)
+    departments = {target for rel_type, _, target in view if rel_type == "HAS_CURRENT_DEPARTMENT"}
+    assert len(departments) == sum(1 for rel_type, _, _ in view if rel_type == "HAS_CURRENT_DEPARTMENT")
@@ -0,0 +1,76 @@
+import pytest
+
+from orgchart.entity_registry import EntityRegistry
+
+ENTITIES = [
+    (["government"], "2610/11_gov_1", "Government of Sri Lanka"),
+    (["minister"], "2610/11_min_1", "Minister of Defence"),
+    (["minister"], "2610/11_min_12", "Minister of Transport"),
+    (["department"], "2610/11_dep_3", "Sri Lanka Army"),
+    (["minister"], "2611/11_min_2", "Minister of Higher Education and Highways"),
+]
+
+
+class StubDriver:
+    """Streams ENTITIES to load() and answers the name lookups, counting them."""
+
+    def __init__(self):
+        self.queries = []
+
+    def stream_query(self, query, parameters=None):
+        return ({"labels": labels, "id": entity_id, "name": name} for labels, entity_id, name in ENTITIES)
+
+    def execute_query(self, query, parameters=None):
+        self.queries.append(parameters["name"])
+        return [{"id": entity_id} for labels, entity_id, name in ENTITIES
+                if name == parameters["name"] and labels[0] in query]
+
+
+def test_loaded_names_are_served_from_the_cache():
+    driver = StubDriver()
+    registry = EntityRegistry(driver).load()
+    assert registry.lookup("minister", "Minister of Transport") == "2610/11_min_12"
+    assert (registry.hits, registry.misses, driver.queries) == (1, 0, [])
+
+
+def test_misses_are_cached():
+    driver = StubDriver()
+    registry = EntityRegistry(driver).load()
+    assert registry.lookup("minister", "Minister of Nothing") is None
+    assert registry.lookup("minister", "Minister of Nothing") is None
+    assert driver.queries == ["Minister of Nothing"]
+    assert (registry.hits, registry.misses) == (1, 1)
+    # Registering the entity replaces the cached miss
+    registry.register("minister", "Minister of Nothing", "2611/11_min_3")
+    assert registry.lookup("minister", "Minister of Nothing") == "2611/11_min_3"
+
+
+def test_least_recently_used_names_are_evicted():
+    driver = StubDriver()
+    registry = EntityRegistry(driver, capacity=2)
+    registry.register("minister", "Minister of Defence", "2610/11_min_1")
+    registry.register("minister", "Minister of Transport", "2610/11_min_12")
+    assert registry.lookup("minister", "Minister of Defence") == "2610/11_min_1"  # now the most recent
+    registry.register("department", "Sri Lanka Army", "2610/11_dep_3")
+    assert driver.queries == []
+
+    assert registry.lookup("minister", "Minister of Defence") == "2610/11_min_1"
+    assert driver.queries == []
+    # Evicted, so it is looked up again (and found)
+    assert registry.lookup("minister", "Minister of Transport") == "2610/11_min_12"
+    assert driver.queries == ["Minister of Transport"]
+
+
+def test_unknown_labels_are_rejected():
+    with pytest.raises(ValueError):
+        EntityRegistry(StubDriver()).lookup("party", "Anyone")
+
+
+def test_counters_continue_after_the_highest_id_of_the_gazette():
+    registry = EntityRegistry(StubDriver()).load()
+    # Numbers are compared as numbers, not strings (12 > 2)
+    assert registry.counters("2610/11_tr_01") == {"minister": 12, "department": 3}
+    assert registry.counters("2611/11_tr_05") == {"minister": 2, "department": 0}
+    assert registry.counters("2612/11_tr_01") == {"minister": 0, "department": 0}
+    registry.register("department", "National Youth Corps And Services Council", "2611/11_dep_2")
+    assert registry.counters("2611/11_tr_05") == {"minister": 2, "department": 2}
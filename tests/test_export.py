@@ -0,0 +1,75 @@
+import csv
+import json
+import re
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from orgchart.export import export
+
+NODES = {
+    "government": [{"id": "gov_1", "name": "Government of Sri Lanka"}],
+    "minister": [{"id": "min_1", "name": "Minister of Transport"}, {"id": None, "name": "Minister without an id"}],
+    "department": [{"id": "dep_1", "name": "Department of Motor Traffic"}],
+}
+
+RELATIONSHIPS = {
+    "HAS_MINISTER": [
+        {"start_id": "gov_1", "end_id": "min_1", "start_date": "2015-09-21", "end_date": None},
+        {"start_id": "gov_1", "end_id": None, "start_date": "2015-09-21", "end_date": None},
+    ],
+    "HAS_DEPARTMENT": [
+        {"start_id": "min_1", "end_id": "dep_1", "start_date": "2015-09-21", "end_date": "2015-10-15"},
+        {"start_id": None, "end_id": "dep_1", "start_date": "2015-10-15", "end_date": None},
+    ],
+    "RENAMED_TO": [],
+    "MERGED_INTO": [],
+}
+
+
+class StubDriver:
+    """Answers the export queries from fixed records, including an entity stored without an id."""
+
+    def stream_query(self, query, parameters=None):
+        node = re.search(r"MATCH \(n:(\w+)\)", query)
+        if node:
+            return iter(NODES[node.group(1)])
+        return iter(RELATIONSHIPS[re.search(r"\[r:(\w+)\]", query).group(1)])
+
+
+def _csv(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.reader(f))
+
+
+def test_jsonl_skips_records_without_ids(tmp_path):
+    output = tmp_path / "orgchart.jsonl"
+    assert export(StubDriver(), str(output)) == 5
+    records = [json.loads(line) for line in output.read_text(encoding="utf-8").splitlines()]
+    assert [record["id"] for record in records if record["kind"] == "node"] == ["gov_1", "min_1", "dep_1"]
+    assert [(record["start_id"], record["end_id"]) for record in records if record["kind"] == "relationship"] == [
+        ("gov_1", "min_1"), ("min_1", "dep_1")]
+
+
+def test_csv_skips_records_without_ids(tmp_path):
+    counts = export(StubDriver(), str(tmp_path), "csv")
+    assert counts["minister.csv"] == 1
+    assert _csv(tmp_path / "minister.csv") == [["id", "name"], ["min_1", "Minister of Transport"]]
+    assert _csv(tmp_path / "gov-min.csv")[1:] == [["gov_1", "min_1", "2015-09-21", "-1", "TRUE"]]
+    assert _csv(tmp_path / "min-dep.csv")[1:] == [["min_1", "dep_1", "2015-09-21", "2015-10-15", "FALSE"]]
+
+
+def test_graphml_skips_records_without_ids(tmp_path):
+    output = tmp_path / "orgchart.graphml"
+    assert export(StubDriver(), str(output), "graphml") == (3, 2)
+    namespace = {"g": "http://graphml.graphdrawing.org/xmlns"}
+    graph = ET.parse(output).getroot().find("g:graph", namespace)
+    node_ids = [node.get("id") for node in graph.findall("g:node", namespace)]
+    assert node_ids == ["gov_1", "min_1", "dep_1"]
+    for edge in graph.findall("g:edge", namespace):
+        assert edge.get("source") in node_ids and edge.get("target") in node_ids
+
+
+def test_tree_needs_a_date(tmp_path):
+    with pytest.raises(ValueError):
+        export(StubDriver(), str(tmp_path / "tree.jsonl"), as_tree=True)
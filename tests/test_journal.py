@@ -0,0 +1,67 @@
+import json
+
+from orgchart.journal import COMMITTED, FAILED, PREPARED, CommitJournal
+
+
+class CheckpointDriver:
+    """Answers the checkpoint lookup of resume_point with a fixed transaction_id."""
+
+    def __init__(self, transaction_id=None):
+        self.transaction_id = transaction_id
+        self.queries = 0
+
+    def execute_query(self, query, parameters=None):
+        self.queries += 1
+        return [{"transaction_id": self.transaction_id}] if self.transaction_id else []
+
+
+def _journal(tmp_path):
+    return CommitJournal(str(tmp_path / "journals" / "2015-10-15_2.jsonl"))
+
+
+def test_resume_after_last_committed_chunk(tmp_path):
+    journal = _journal(tmp_path)
+    journal.append(PREPARED, "tr_01", "tr_05", 5)
+    journal.append(COMMITTED, "tr_01", "tr_05", 5, {"minister": 2, "department": 1})
+    journal.append(PREPARED, "tr_06", "tr_10", 5)
+    journal.append(FAILED, "tr_06", "tr_10", 5, {"minister": 2, "department": 1}, error="tr_07: boom")
+    driver = CheckpointDriver()
+    assert journal.resume_point(driver) == ("tr_05", {"minister": 2, "department": 1})
+    assert driver.queries == 0  # nothing was left prepared
+
+
+def test_torn_last_line_is_ignored(tmp_path):
+    journal = _journal(tmp_path)
+    journal.append(COMMITTED, "tr_01", "tr_05", 5, {"minister": 2, "department": 1})
+    with open(journal.path, "a", encoding="utf-8") as f:
+        f.write('{"status": "committed", "first_transaction_id": "tr_06", "last_tr')  # crash mid-write
+    assert [entry["last_transaction_id"] for entry in journal.entries()] == ["tr_05"]
+    assert journal.resume_point(CheckpointDriver()) == ("tr_05", {"minister": 2, "department": 1})
+
+    # The next entry starts on a line of its own instead of completing the torn one
+    journal.append(PREPARED, "tr_06", "tr_10", 5)
+    with open(journal.path, encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    assert json.loads(lines[-1])["status"] == PREPARED
+    assert [entry["status"] for entry in journal.entries()] == [COMMITTED, PREPARED]
+
+
+def test_prepared_chunk_resolved_against_checkpoint(tmp_path):
+    journal = _journal(tmp_path)
+    journal.append(COMMITTED, "tr_01", "tr_05", 5, {"minister": 2, "department": 1})
+    journal.append(PREPARED, "tr_06", "tr_10", 5)
+    # The checkpoint shows the chunk committed before the crash: it is journaled as committed
+    assert journal.resume_point(CheckpointDriver("tr_10")) == ("tr_10", None)
+    assert journal.entries()[-1]["status"] == COMMITTED
+
+
+def test_prepared_chunk_not_committed(tmp_path):
+    journal = _journal(tmp_path)
+    journal.append(COMMITTED, "tr_01", "tr_05", 5, {"minister": 2, "department": 1})
+    journal.append(PREPARED, "tr_06", "tr_10", 5)
+    assert journal.resume_point(CheckpointDriver("tr_05")) == ("tr_05", {"minister": 2, "department": 1})
+    assert journal.entries()[-1]["status"] == PREPARED
+
+
+def test_empty_journal(tmp_path):
+    assert _journal(tmp_path).resume_point(CheckpointDriver()) == (None, None)
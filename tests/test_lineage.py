@@ -0,0 +1,61 @@
+import os
+from datetime import date
+
+import pytest
+
+from orgchart.ingestion import read_amendments
+from orgchart.lineage import LineageIndex
+from orgchart.org_engine import OrgGraph
+
+DAY = date(2015, 10, 15)
+
+
+@pytest.fixture
+def lineage(data_dir):
+    graph = OrgGraph().load_snapshot(os.path.join(data_dir, "2015-09-21"))
+    graph.replay(read_amendments(os.path.join(data_dir, "2015-10-15_2")))
+    return LineageIndex.from_graph(graph)
+
+
+def test_merged_entities_resolve_to_their_successor(lineage):
+    assert lineage.current("2610/11_min_35") == lineage.current("2610/11_min_46") == "2611/11_min_4"
+    assert lineage.current("2610/11_dep_47") == lineage.current("2610/11_dep_48") == "2611/11_dep_2"
+    assert lineage.current("2610/11_min_7") == "2611/11_min_1"
+    # Active entities are their own successor
+    assert lineage.current("2611/11_min_4") == "2611/11_min_4"
+    assert lineage.current("2610/11_min_1") == "2610/11_min_1"
+
+
+def test_predecessors_of_a_merged_entity(lineage):
+    assert lineage.predecessors("2611/11_min_4") == [("2610/11_min_35", DAY), ("2610/11_min_46", DAY)]
+    assert lineage.predecessors("2611/11_dep_2") == [("2610/11_dep_47", DAY), ("2610/11_dep_48", DAY)]
+    assert lineage.predecessors("2610/11_min_1") == []
+
+
+def test_stored_properties_point_at_the_current_successor(lineage):
+    # The successor_id/succeeded_on rows rebuild_lineage writes, which successor() and predecessors() read
+    rows = {row["id"]: row for row in lineage.rows("minister")}
+    assert rows["2610/11_min_35"] == {"id": "2610/11_min_35", "successor_id": "2611/11_min_4", "succeeded_on": "2015-10-15"}
+    assert set(rows) == {"2610/11_min_7", "2610/11_min_11", "2610/11_min_35", "2610/11_min_46"}
+    assert {row["id"] for row in lineage.rows("department")} == {"2610/11_dep_47", "2610/11_dep_48"}
+
+
+def test_chains_resolve_to_the_end_of_the_chain():
+    index = LineageIndex.from_steps([
+        ("minister", "a", "b", date(2015, 1, 1)),   # a renamed to b
+        ("minister", "b", "c", date(2015, 2, 1)),   # b and x merged into c
+        ("minister", "x", "c", date(2015, 2, 1)),
+    ])
+    assert [index.current(entity_id) for entity_id in ("a", "b", "x", "c")] == ["c", "c", "c", "c"]
+    assert index.predecessors("c") == [("a", date(2015, 1, 1)), ("b", date(2015, 2, 1)), ("x", date(2015, 2, 1))]
+    assert index.predecessors("b") == []
+
+
+def test_a_reused_name_becomes_active_again():
+    index = LineageIndex.from_steps([
+        ("minister", "a", "b", date(2015, 1, 1)),
+        ("minister", "b", "a", date(2015, 3, 1)),   # renamed back
+    ])
+    assert index.current("a") == "a"
+    assert index.current("b") == "a"
+    assert index.predecessors("a") == [("b", date(2015, 3, 1))]
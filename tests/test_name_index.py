@@ -0,0 +1,82 @@
+import json
+import os
+
+import pytest
+
+from orgchart.ingestion import parse_name_list, read_amendments
+from orgchart.name_index import (AMBIGUOUS, EXACT, MISSING, NORMALIZED, NameIndex, normalize, resolve_transactions,
+                                 tokens)
+from orgchart.org_engine import OrgGraph
+
+
+@pytest.fixture
+def index(data_dir):
+    return NameIndex.from_graph(OrgGraph().load_snapshot(os.path.join(data_dir, "2015-09-21")))
+
+
+def test_normalize():
+    assert normalize("Transport & Civil Aviation") == normalize("transport and civil  aviation.")
+    assert normalize("  Sri Lanka   Army ") == "sri lanka army"
+    assert normalize("Ｍinister of Ｄefence") == "minister of defence"  # full-width letters
+    assert tokens(normalize("Minister of Mahaweli Development & Environment")) == {
+        "mahaweli", "development", "environment"}
+
+
+def test_exact_and_normalized(index):
+    exact = index.resolve("minister", "Minister of Transport")
+    assert (exact.status, exact.entity_id) == (EXACT, "2610/11_min_7")
+    normalized = index.resolve("minister", "minister of  TRANSPORT.")
+    assert (normalized.status, normalized.name, normalized.entity_id) == (
+        NORMALIZED, "Minister of Transport", "2610/11_min_7")
+    # Names resolve within their label only
+    assert index.resolve("department", "Minister of Transport").status == MISSING
+
+
+def test_ambiguous():
+    index = NameIndex.from_rows([("department", "dep_1", "Land Reform Commission"),
+                                 ("department", "dep_2", "Land-Reform Commission")])
+    resolution = index.resolve("department", "land reform commission")
+    assert resolution.status == AMBIGUOUS
+    assert resolution.name is None
+    assert resolution.candidates == ["Land Reform Commission", "Land-Reform Commission"]
+    # An exact spelling is never ambiguous
+    assert index.resolve("department", "Land-Reform Commission").entity_id == "dep_2"
+
+
+def test_suggestions(index):
+    resolution = index.resolve("minister", "Minister of Transport and Highways")
+    assert resolution.status == MISSING
+    assert resolution.candidates[0] == "Minister of Transport"
+    assert len(resolution.candidates) <= 3
+    assert index.suggest("minister", "Minister of Nothing Whatsoever") == []
+
+
+def _parsed(rows):
+    # Merge lists are compared as lists: a rewritten list is serialized with different spacing
+    return [{**row, "old": parse_name_list(row["old"])} if row["file_type"] == "Merge" else row for row in rows]
+
+
+def test_resolve_gazette_rows(index, data_dir):
+    gazette = read_amendments(os.path.join(data_dir, "2015-10-15_2"))
+    respelled = [dict(transaction) for transaction in gazette]
+    rename = next(row for row in respelled if row["transaction_id"] == "2611/11_tr_01")
+    rename["old"] = "minister of transport"
+    merge = next(row for row in respelled if row["transaction_id"] == "2611/11_tr_13")
+    merge["old"] = json.dumps(["Minister of National  Dialogue", "minister of lands"])
+
+    resolved, problems = resolve_transactions(respelled, index)
+    assert problems == []
+    assert _parsed(resolved) == _parsed(gazette)
+
+
+def test_names_created_by_earlier_rows_resolve(index):
+    rows = [
+        {"transaction_id": "tr_01", "file_type": "Rename", "type": "minister",
+         "old": "Minister of Transport", "new": "Minister of Transport & Civil Aviation", "date": "2015-10-15"},
+        {"transaction_id": "tr_02", "file_type": "Add", "parent": "minister of transport and civil aviation",
+         "parent_type": "minister", "child": "Airport Authority", "child_type": "department",
+         "rel_type": "HAS_DEPARTMENT", "date": "2015-10-15"},
+    ]
+    resolved, problems = resolve_transactions(rows, index)
+    assert problems == []
+    assert resolved[1]["parent"] == "Minister of Transport & Civil Aviation"
@@ -0,0 +1,74 @@
+import os
+
+import pytest
+
+from orgchart.ingestion import read_amendments
+from orgchart.org_engine import OrgGraph
+
+
+@pytest.fixture
+def replayed(data_dir):
+    graph = OrgGraph().load_snapshot(os.path.join(data_dir, "2015-09-21"))
+    assert (len(graph.node_id), len(graph.rel_type)) == (469, 468)
+    entity_counters = graph.replay(read_amendments(os.path.join(data_dir, "2015-10-15_2")))
+    return graph, entity_counters
+
+
+def _open_children(graph, label, name, rel_type):
+    node = graph.by_name[label][name]
+    return {graph.node_name[graph.rel_target[rel]] for rel in graph.open_relationships(node, rel_type)}
+
+
+def _open_parents(graph, label, name, rel_type):
+    node = graph.by_name[label][name]
+    return {graph.node_name[graph.rel_source[rel]] for rel in graph.open_relationships(node, rel_type, outgoing=False)}
+
+
+def _links(graph, rel_type):
+    return {(source, target) for kind, source, target, _, _ in graph.relationships() if kind == rel_type}
+
+
+def test_replay_counts(replayed):
+    graph, entity_counters = replayed
+    assert len(graph.node_id) == 475
+    assert len(graph.rel_type) == 508
+    assert entity_counters == {"minister": 4, "department": 2}
+    assert graph.unmatched == []
+
+
+def test_rename_moves_the_departments_to_the_new_minister(replayed):
+    graph, _ = replayed
+    assert ("2610/11_min_7", "2611/11_min_1") in _links(graph, "RENAMED_TO")
+    assert _open_children(graph, "minister", "Minister of Transport", "HAS_DEPARTMENT") == set()
+    assert len(_open_children(graph, "minister", "Minister of Transport and Civil Aviation", "HAS_DEPARTMENT")) == 7
+    assert _open_parents(graph, "minister", "Minister of Transport", "HAS_MINISTER") == set()
+
+
+def test_move_and_add(replayed):
+    graph, _ = replayed
+    for department in ("Sri Lanka Institute of Advanced Technological Education",
+                       "Sri Lanka Institute of Information Technology (SLIIT) and all information technology centres "
+                       "affiliated to SLIIT"):
+        assert _open_parents(graph, "department", department, "HAS_DEPARTMENT") == {
+            "Minister of Higher Education and Highways"}
+    assert _open_parents(graph, "department", "Department of Envelopes", "HAS_DEPARTMENT") == {
+        "Minister of Post, Postal Services & Muslim Religious Affairs"}
+    assert _open_parents(graph, "minister", "Minister of Corruption", "HAS_MINISTER") == {"Government of Sri Lanka"}
+
+
+def test_terminate(replayed):
+    graph, _ = replayed
+    assert _open_parents(graph, "minister", "Minister of Home Affairs", "HAS_MINISTER") == set()
+    assert _open_children(graph, "minister", "Minister of Home Affairs", "HAS_DEPARTMENT") == set()
+    assert _open_parents(graph, "department", "Janatha Fertilizer Enterprises Ltd.", "HAS_DEPARTMENT") == set()
+
+
+def test_merge(replayed):
+    graph, _ = replayed
+    assert {("2610/11_min_35", "2611/11_min_4"), ("2610/11_min_46", "2611/11_min_4"),
+            ("2610/11_dep_47", "2611/11_dep_2"), ("2610/11_dep_48", "2611/11_dep_2")} == _links(graph, "MERGED_INTO")
+    assert len(_open_children(graph, "minister", "Minister of National Dialogue and Lands", "HAS_DEPARTMENT")) == 12
+    for minister in ("Minister of National Dialogue", "Minister of Lands"):
+        assert _open_children(graph, "minister", minister, "HAS_DEPARTMENT") == set()
+    assert _open_parents(graph, "department", "National Youth Corps And Services Council", "HAS_DEPARTMENT") == {
+        graph.node_name[graph.by_id["2610/11_min_4"]]}
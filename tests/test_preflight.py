@@ -0,0 +1,65 @@
+import os
+
+import pytest
+
+from orgchart.ingestion import read_amendments
+from orgchart.org_engine import OrgGraph
+from orgchart.preflight import Preflight, validate_transactions
+
+
+@pytest.fixture
+def graph(data_dir):
+    return OrgGraph().load_snapshot(os.path.join(data_dir, "2015-09-21"))
+
+
+@pytest.fixture
+def gazette(data_dir):
+    return read_amendments(os.path.join(data_dir, "2015-10-15_2"))
+
+
+def _row(gazette, transaction_id, **changes):
+    row = next(transaction for transaction in gazette if transaction["transaction_id"] == transaction_id)
+    return {**row, **changes}
+
+
+def test_gazette_is_clean(graph, gazette):
+    assert validate_transactions(gazette, graph=graph) == []
+
+
+def test_missing_entity_is_reported_with_its_transaction(graph, gazette):
+    broken = [_row(gazette, "2611/11_tr_03", old_parent="Minister of Nothing")]
+    problems = Preflight(graph).run(broken)
+    assert [(p.transaction_id, p.file_type) for p in problems] == [("2611/11_tr_03", "Move")] * 2
+    assert "minister 'Minister of Nothing' does not exist" in problems[0].message
+
+
+def test_broken_rows(graph, gazette):
+    rows = [
+        _row(gazette, "2611/11_tr_01", date="2015-13-40"),
+        _row(gazette, "2611/11_tr_05", rel_type="HAS_MINISTER"),
+        _row(gazette, "2611/11_tr_07", child=""),
+        _row(gazette, "2611/11_tr_12", old="[not a list"),
+    ]
+    messages = {problem.transaction_id: problem.message for problem in Preflight(graph).run(rows)}
+    assert messages["2611/11_tr_01"] == "invalid date '2015-13-40'"
+    assert messages["2611/11_tr_05"] == "rel_type 'HAS_MINISTER' should be 'HAS_DEPARTMENT'"
+    assert messages["2611/11_tr_07"] == "missing child"
+    assert messages["2611/11_tr_12"].startswith("cannot parse the old list")
+
+
+def test_rows_see_the_effects_of_earlier_rows(graph, gazette):
+    add = _row(gazette, "2611/11_tr_05")
+    terminate = {**add, "transaction_id": "2611/11_tr_90", "file_type": "Terminate"}
+    again = {**terminate, "transaction_id": "2611/11_tr_91"}
+    # The department added by the first row can be terminated, but only once
+    problems = Preflight(graph).run([add, terminate, again])
+    assert [p.transaction_id for p in problems] == ["2611/11_tr_91"]
+    assert problems[0].message.startswith("no active HAS_DEPARTMENT relationship")
+
+
+def test_rejected_add_does_not_cascade(graph, gazette):
+    # The minister is rejected for its date, but is still assumed created for the rows after it
+    rows = [_row(gazette, "2611/11_tr_06", date="not a date"),
+            {**_row(gazette, "2611/11_tr_05"), "transaction_id": "2611/11_tr_90", "parent": "Minister of Corruption"}]
+    problems = Preflight(graph).run(rows)
+    assert [(p.transaction_id, p.message) for p in problems] == [("2611/11_tr_06", "invalid date 'not a date'")]
@@ -0,0 +1,63 @@
+import time
+
+import pytest
+
+from orgchart.read_service import ResultCache, earliest_date
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_ttl(clock):
+    cache = ResultCache(ttl=10)
+    cache.put(("org_chart", (), None), "tree")
+    clock[0] += 9.9
+    assert cache.get(("org_chart", (), None)) == (True, "tree")
+    clock[0] += 0.1
+    assert cache.get(("org_chart", (), None)) == (False, None)
+    assert cache.stats() == {"entries": 0, "hits": 1, "misses": 1, "invalidated": 0}
+
+
+def test_lru_eviction(clock):
+    cache = ResultCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")  # b is now the least recently used
+    cache.put("c", 3)
+    assert [cache.get(key)[0] for key in ("a", "b", "c")] == [True, False, True]
+
+
+def _filled_cache():
+    cache = ResultCache()
+    for day in (None, "2015-09-21", "2015-10-14", "2015-10-15", "2016-01-01"):
+        cache.put(("departments_of", ("2610/11_min_1",), day), day)
+    return cache
+
+
+def _cached_days(cache):
+    days = (None, "2015-09-21", "2015-10-14", "2015-10-15", "2016-01-01")
+    return [day for day in days if cache.get(("departments_of", ("2610/11_min_1",), day))[0]]
+
+
+def test_invalidate_from_date():
+    cache = _filled_cache()
+    # Today's read and every read as of the effective date or later are dropped
+    assert cache.invalidate_from("2015-10-15") == 3
+    assert _cached_days(cache) == ["2015-09-21", "2015-10-14"]
+    assert cache.stats()["invalidated"] == 3
+
+
+def test_invalidate_everything():
+    cache = _filled_cache()
+    assert cache.invalidate_from(None) == 5
+    assert _cached_days(cache) == []
+
+
+def test_earliest_date():
+    rows = [{"date": "2015-10-15"}, {"date": " 2015-09-21 "}, {"date": "-1"}]
+    assert earliest_date(rows) == "2015-09-21"
+    assert earliest_date([]) is None
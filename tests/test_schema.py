@@ -0,0 +1,35 @@
+from orgchart.schema import NODE_LABELS, check_queries, unindexed_lookups
+
+
+def test_property_map_lookups():
+    assert unindexed_lookups("MATCH (m:minister {foo: $x}) RETURN m") == [("minister", "foo")]
+    assert unindexed_lookups("MATCH (m:minister {id: $x}) RETURN m") == []
+
+
+def test_where_lookups_on_node_variables():
+    assert unindexed_lookups("MATCH (m:minister) WHERE m.foo = $x RETURN m") == [("minister", "foo")]
+    assert unindexed_lookups("MATCH (m:minister) WHERE m.name = $x RETURN m") == []
+    # The variable keeps its label when the WHERE follows a later pattern
+    assert unindexed_lookups("""
+    MATCH (m:minister)
+    MATCH (m)-[r:HAS_DEPARTMENT]->(d:department)
+    WHERE m.foo = $x AND d.bar = $y AND r.end_date IS NULL
+    RETURN d
+    """) == [("department", "bar"), ("minister", "foo")]
+
+
+def test_where_lookups_on_relationship_variables():
+    assert unindexed_lookups("MATCH (m:minister {id: $id})-[r:HAS_DEPARTMENT]->(d) WHERE r.foo = $x RETURN d") == [
+        ("HAS_DEPARTMENT", "foo")]
+
+
+def test_interpolated_labels_are_checked_as_every_label():
+    assert unindexed_lookups("MATCH (n:{label}) WHERE n.foo = $x RETURN n") == [(label, "foo") for label in sorted(NODE_LABELS)]
+
+
+def test_removed_properties_are_not_filters():
+    assert unindexed_lookups("MATCH (n:minister) WHERE n.successor_id IS NOT NULL REMOVE n.foo") == []
+
+
+def test_repository_queries_are_indexed():
+    assert check_queries() == 0
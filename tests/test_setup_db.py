@@ -0,0 +1,44 @@
+import os
+from collections import Counter
+
+from orgchart.ingestion import relationship_rows
+from orgchart.setup_db import partition_rows
+
+
+def _assert_keys_in_one_bucket(buckets, key):
+    owners = {}
+    for number, bucket in enumerate(buckets):
+        for row in bucket:
+            assert owners.setdefault(row[key], number) == number
+
+
+def test_partitions_keep_each_start_node_in_one_bucket(data_dir):
+    rows = relationship_rows(os.path.join(data_dir, "2015-09-21", "min-dep.csv"), "min_id", "dep_id")
+    buckets = partition_rows(rows, "min_id", 4)
+    assert len(buckets) == 4
+    assert sorted(map(id, (row for bucket in buckets for row in bucket))) == sorted(map(id, rows))
+    _assert_keys_in_one_bucket(buckets, "min_id")
+
+    # Largest group first onto the smallest bucket: no bucket exceeds another by more than one group
+    largest = max(Counter(row["min_id"] for row in rows).values())
+    sizes = [len(bucket) for bucket in buckets]
+    assert max(sizes) - min(sizes) <= largest
+
+
+def test_partitions_balance_skewed_groups():
+    sizes = {"a": 5, "b": 3, "c": 3, "d": 2, "e": 1}
+    rows = [{"min_id": key} for key, size in sizes.items() for _ in range(size)]
+    buckets = partition_rows(rows, "min_id", 2)
+    assert [len(bucket) for bucket in buckets] == [7, 7]
+    _assert_keys_in_one_bucket(buckets, "min_id")
+
+
+def test_a_single_government_is_one_partition(data_dir):
+    # The documented gov-min behaviour: one start node cannot be split across workers
+    rows = relationship_rows(os.path.join(data_dir, "2015-09-21", "gov-min.csv"), "gov_id", "min_id")
+    assert [len(bucket) for bucket in partition_rows(rows, "gov_id", 4)] == [len(rows)]
+
+
+def test_no_empty_partitions():
+    assert partition_rows([], "min_id", 4) == []
+    assert len(partition_rows([{"min_id": "a"}, {"min_id": "b"}], "min_id", 8)) == 2
@@ -0,0 +1,64 @@
+import csv
+import os
+
+from orgchart.org_engine import OrgGraph
+from orgchart.snapshot_diff import diff_snapshots, gazette_prefix, graph_structure, load_active_structure, write_amendments
+from orgchart.update_orgchart import load_transactions
+
+
+def write_snapshot(path, prefix, day, ministers, departments, ended=()):
+    """Write a snapshot directory; ministers and departments map each name to its parent's name."""
+    os.makedirs(path)
+    ids = {"Government of Sri Lanka": f"{prefix}_gov_1"}
+    ids.update({name: f"{prefix}_min_{number}" for number, name in enumerate(ministers, start=1)})
+    ids.update({name: f"{prefix}_dep_{number}" for number, name in enumerate(departments, start=1)})
+
+    def write(file_name, header, rows):
+        with open(os.path.join(path, file_name), "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(rows)
+
+    write("government.csv", ["id", "name"], [[ids["Government of Sri Lanka"], "Government of Sri Lanka"]])
+    write("minister.csv", ["id", "name"], [[ids[name], name] for name in ministers])
+    write("department.csv", ["id", "name"], [[ids[name], name] for name in departments])
+    write("gov-min.csv", ["gov_id", "min_id", "start_date", "end_date", "active"],
+          [[ids[government], ids[name], day, "-1", "TRUE"] for name, government in ministers.items()])
+    write("min-dep.csv", ["min_id", "dep_id", "start_date", "end_date", "active"],
+          [[ids[minister], ids[name], day, "-1", "TRUE"] for name, minister in departments.items()]
+          + [[ids[minister], ids[name], "2015-01-01", day, "FALSE"] for name, minister in ended])
+    return path
+
+
+def test_replaying_the_diff_reaches_the_new_snapshot(tmp_path):
+    government = "Government of Sri Lanka"
+    old_dir = write_snapshot(tmp_path / "2015-09-21", "2610/11", "2015-09-21",
+                             {"Minister A": government, "Minister B": government, "Minister C": government},
+                             {"Dept 1": "Minister A", "Dept 2": "Minister A", "Dept 3": "Minister B", "Dept 4": "Minister C"})
+    # C is gone, D is new; Dept 2 moves to B and Dept 4 follows C's successor D.
+    # An ended relationship in the new snapshot is history, not a change
+    new_dir = write_snapshot(tmp_path / "2015-10-15", "2611/11", "2015-10-15",
+                             {"Minister A": government, "Minister B": government, "Minister D": government},
+                             {"Dept 1": "Minister A", "Dept 2": "Minister B", "Dept 3": "Minister B", "Dept 4": "Minister D"},
+                             ended=[("Dept 2", "Minister A")])
+
+    transactions = diff_snapshots(old_dir, new_dir, gazette_prefix(new_dir), "2015-10-15")
+    assert [(transaction["file_type"], transaction.get("child")) for transaction in transactions] == [
+        ("Add", "Minister D"), ("Move", "Dept 2"), ("Move", "Dept 4"), ("Terminate", "Minister C")]
+    assert [transaction["transaction_id"] for transaction in transactions] == [
+        "2611/11_tr_01", "2611/11_tr_02", "2611/11_tr_03", "2611/11_tr_04"]
+
+    # Round trip through the amendment files, as snapshot_diff.py --apply does
+    write_amendments(transactions, tmp_path / "diff")
+    graph = OrgGraph().load_snapshot(old_dir)
+    graph.replay(load_transactions(tmp_path / "diff"))
+    assert graph.unmatched == []
+    assert graph_structure(graph) == load_active_structure(new_dir)
+
+
+def test_identical_snapshots_have_no_diff(tmp_path):
+    government = "Government of Sri Lanka"
+    structure = ({"Minister A": government}, {"Dept 1": "Minister A"})
+    old_dir = write_snapshot(tmp_path / "old", "2610/11", "2015-09-21", *structure)
+    new_dir = write_snapshot(tmp_path / "new", "2611/11", "2015-10-15", *structure)
+    assert diff_snapshots(old_dir, new_dir, "2611/11", "2015-10-15") == []
@@ -0,0 +1,80 @@
+import os
+
+import pytest
+
+from orgchart import update_orgchart
+from orgchart.journal import COMMITTED, PREPARED, CommitJournal
+from orgchart.update_orgchart import execute_transactions, gazette_name, load_transactions
+from recording_driver import RecordingDriver
+
+
+@pytest.fixture
+def driver(monkeypatch):
+    driver = RecordingDriver()
+    monkeypatch.setattr(update_orgchart, "neo4j_interface", driver)
+    return driver
+
+
+@pytest.fixture
+def gazette_dir(data_dir):
+    return os.path.join(data_dir, "2015-10-15_2")
+
+
+@pytest.mark.parametrize("planned", [False, True])
+def test_applying_a_gazette_twice_writes_nothing_the_second_time(driver, gazette_dir, planned):
+    transactions = load_transactions(gazette_dir)
+    execute_transactions(load_transactions(gazette_dir), planned=planned, gazette=gazette_name(gazette_dir))
+    assert driver.transactions == 1
+    assert driver.commits[0]["gazette"] == "2015-10-15_2"
+    assert driver.commits[0]["transaction_ids"] == [transaction["transaction_id"] for transaction in transactions]
+    statements = len(driver.statements)
+    assert statements > 0
+
+    execute_transactions(load_transactions(gazette_dir), planned=planned, gazette=gazette_name(gazette_dir))
+    assert driver.transactions == 1
+    assert len(driver.statements) == statements
+
+
+def test_only_new_rows_run(driver, gazette_dir):
+    transactions = load_transactions(gazette_dir)
+    execute_transactions(transactions[:5], gazette="2015-10-15_2")
+    execute_transactions(load_transactions(gazette_dir), gazette="2015-10-15_2")
+    assert [commit["transaction_ids"] for commit in driver.commits] == [
+        [transaction["transaction_id"] for transaction in transactions[:5]],
+        [transaction["transaction_id"] for transaction in transactions[5:]],
+    ]
+
+
+def test_reapply_runs_every_row(driver, gazette_dir):
+    execute_transactions(load_transactions(gazette_dir), gazette="2015-10-15_2")
+    execute_transactions(load_transactions(gazette_dir), gazette="2015-10-15_2", reapply=True)
+    assert driver.transactions == 2
+    assert driver.commits[0]["transaction_ids"] == driver.commits[1]["transaction_ids"]
+
+
+def test_same_ids_of_another_gazette_run(driver, gazette_dir):
+    # transaction_ids are only unique within a gazette
+    execute_transactions(load_transactions(gazette_dir), gazette="2015-10-15_2")
+    execute_transactions(load_transactions(gazette_dir), gazette="2015-10-16")
+    assert driver.transactions == 2
+
+
+def test_skipping_needs_the_gazette(driver, gazette_dir):
+    with pytest.raises(ValueError):
+        execute_transactions(load_transactions(gazette_dir))
+
+
+def test_chunked_commits_journal_to_the_default_path(driver, gazette_dir, tmp_path, monkeypatch):
+    # Run from orgchart/ as the scripts are, so the default ../journals lands in tmp_path
+    (tmp_path / "orgchart").mkdir()
+    monkeypatch.chdir(tmp_path / "orgchart")
+    execute_transactions(load_transactions(gazette_dir), chunk_size=5, gazette="2015-10-15_2")
+    assert [len(commit["transaction_ids"]) for commit in driver.commits] == [5, 5, 3]
+    assert driver.transactions == 3
+    journal = CommitJournal(str(tmp_path / "journals" / "2015-10-15_2.jsonl"))
+    assert [entry["status"] for entry in journal.entries()] == [PREPARED, COMMITTED] * 3
+
+
+def test_chunked_commits_need_a_journal_or_gazette(driver, gazette_dir):
+    with pytest.raises(ValueError):
+        execute_transactions(load_transactions(gazette_dir), chunk_size=5, reapply=True)